@@ -1,5 +1,6 @@
 import time
 from coordinator import Provider
+from tracing import LatencyStats, commands_frame_field
 
 try:
     from radio import Radio
@@ -8,6 +9,13 @@ except (SystemError, ImportError):
     from .radio import Radio
     from .robot_commands import RobotCommands
 
+# how often to log the latency percentiles, in seconds
+LATENCY_REPORT_INTERVAL = 10
+# how many times per second to send the team's commands. Each send
+# takes the radio ~60ms (see Radio.MESSAGE_DELAY, which paces the
+# manual controller more conservatively)
+SEND_RATE = 16
+
 
 class Comms(Provider):
     """Comms class spins a thread to repeated send the commands stored in
@@ -22,6 +30,17 @@ class Comms(Provider):
 
         self._owned_fields = ['_blue_robot_status'] if team == 'blue' \
             else ['_yellow_robot_status']
+        # get the commands directly from the strategy of the same team
+        self._direct_in_fields = ['_blue_robot_commands'] if team == 'blue' \
+            else ['_yellow_robot_commands']
+        # along with the trace of the frame they were computed from
+        self._direct_in_fields.append(commands_frame_field(team))
+        self._latency_stats = LatencyStats()
+        self._last_latency_report_time = None
+        # commands are sent again until strategy sends new ones, but each
+        # frame's latency is only counted the first time
+        self._last_traced_frame_id = None
+        self._target_rate = SEND_RATE
 
         # self._receive_loop_sleep = Radio.MESSAGE_DELAY
         # self._messages_received = []
@@ -36,7 +55,7 @@ class Comms(Provider):
         for robot_id, commands in team_commands.items():
             # self.logger.info(commands)
             if self.gs.is_robot_lost(self._team, robot_id):
-                self.logger.debug(f"Robot {robot_id} is lost")
+                self.logger.debug("Robot %s is lost", robot_id)
                 commands.set_speeds(0, 0, 0)
             else:
                 # recalculate the speed the robot should be commanded at
@@ -45,6 +64,7 @@ class Comms(Provider):
         # send serialized message for whole team
         message = RobotCommands.get_serialized_team_command(team_commands)
         self._radio.send(message)
+        self._trace_latency()
         for robot_id, commands in team_commands.items():
             robot_status = self.gs.get_robot_status(self._team, robot_id)
             # simulate charge of capacitors according to commands
@@ -53,10 +73,26 @@ class Comms(Provider):
             # TODO: UNTESTED
             if commands.is_kicking:
                 robot_status.charge_level = 0
-        # sleep to avoid spamming the xbee radio
-        time.sleep(Radio.MESSAGE_DELAY)
+
+    def _trace_latency(self):
+        """Record the latency from vision to radio of the commands sent,
+        if they are from a new frame"""
+        frame_trace = getattr(self.gs, commands_frame_field(self._team))
+        if frame_trace is None or \
+                frame_trace['frame_id'] == self._last_traced_frame_id:
+            return
+        self._last_traced_frame_id = frame_trace['frame_id']
+        now = time.time()
+        self._latency_stats.add(dict(frame_trace, radio=now))
+        if self._last_latency_report_time is None:
+            self._last_latency_report_time = now
+        elif now - self._last_latency_report_time > LATENCY_REPORT_INTERVAL:
+            self._last_latency_report_time = now
+            self.logger.info("Latency:\n%s", self._latency_stats.report())
 
     def post_run(self):
+        if len(self._latency_stats):
+            self.logger.info("Latency:\n%s", self._latency_stats.report())
         if self._radio is not None:
             self._radio.close()
 
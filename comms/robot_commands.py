@@ -262,7 +262,8 @@ class RobotCommands:
                 trimmed_angle = np.arccos(inner_formula)
                 if not (0 <= trimmed_angle <= np.pi):
                     # not sure why this was ever triggering?
-                    self.logger.debug(f"how is trimmed angle: {trimmed_angle}")
+                    self.logger.debug("how is trimmed angle: %s",
+                                      trimmed_angle)
                     trimmed_angle = max(trimmed_angle, 0)
                     trimmed_angle = min(trimmed_angle, np.pi)
                 trimmed_angle = min(trimmed_angle, np.pi / 2)
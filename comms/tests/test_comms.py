@@ -0,0 +1,19 @@
+from comms import Comms
+from tracing import commands_frame_field
+
+
+def test_latency_counted_once_per_frame():
+    """ Tests commands resent from the same frame only count towards the
+    latency once.
+    """
+    comms = Comms('blue')
+    frame_trace = {'frame_id': 1, 'vision': 0, 'publish': .01,
+                   'strategy_start': .02, 'strategy_end': .03}
+    setattr(comms.gs, commands_frame_field('blue'), frame_trace)
+    comms._trace_latency()
+    comms._trace_latency()
+    assert len(comms._latency_stats) == 1
+    setattr(comms.gs, commands_frame_field('blue'),
+            dict(frame_trace, frame_id=2))
+    comms._trace_latency()
+    assert len(comms._latency_stats) == 2
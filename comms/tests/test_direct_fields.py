@@ -0,0 +1,37 @@
+import time
+from multiprocessing import Queue
+from coordinator import Provider, MAX_Q_SIZE
+
+
+def test_direct_reader_sees_changes_with_full_coordinator_queue():
+    """ Tests that commands sent directly to comms keep changing while the
+    coordinator queue is full, and reach the coordinator once it drains.
+    """
+    owner = Provider()
+    owner._owned_fields = ['_blue_robot_commands']
+    reader = Provider()
+    q = Queue(MAX_Q_SIZE)
+    owner._direct_out_qs['_blue_robot_commands'] = [q]
+    reader._direct_in_qs['_blue_robot_commands'] = q
+    owner.commands_out_q.put('not read by the coordinator yet')
+    # wait for the feeder thread so that the queue is really full
+    time.sleep(.1)
+
+    owner.gs._blue_robot_commands = {'A': 1}
+    owner._send_result_back_to_coordinator()
+    time.sleep(.1)
+    reader._update_direct_in_fields()
+    assert reader.gs._blue_robot_commands == {'A': 1}
+
+    owner.gs._blue_robot_commands = {'B': 2}
+    owner._send_result_back_to_coordinator()
+    time.sleep(.1)
+    reader._update_direct_in_fields()
+    assert reader.gs._blue_robot_commands == {'B': 2}
+
+    # once there is room the coordinator gets the latest value
+    assert owner.commands_out_q.get(timeout=1) == \
+        'not read by the coordinator yet'
+    owner._send_result_back_to_coordinator()
+    version, _ = owner.commands_out_q.get(timeout=1)['_blue_robot_commands']
+    assert version == 2
@@ -4,9 +4,14 @@ Only modify it as last resort, or if you have debugging time available.
 """
 from multiprocessing import Queue
 from multiprocessing import Process, Event
+from multiprocessing.connection import wait
 import traceback
+import pickle
+import queue
+import random
+import numpy as np
 import logging
-from logging.handlers import SocketHandler
+from logging.handlers import SocketHandler, QueueHandler, QueueListener
 import signal
 import sys
 import time
@@ -15,6 +20,151 @@ from queue import Empty, Full
 
 # Do not make this large or bad things will happen
 MAX_Q_SIZE = 1
+# How long the game loop waits for provider data before checking for a stop
+GAME_LOOP_TIMEOUT = .1
+# How long to wait for each provider to finish writing its trace
+TRACE_JOIN_TIMEOUT = 2
+# Most non-warning log records a single line of code may log per second
+LOG_RATE_LIMIT = 10
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drops log records below WARNING from a call site (file + line) that has
+    already logged LOG_RATE_LIMIT records in the last second, so that logging
+    from an inner loop can't flood the handlers. The number of dropped
+    records is noted on the next record that gets through.
+    """
+    def __init__(self, rate_limit=LOG_RATE_LIMIT):
+        super().__init__()
+        self._rate_limit = rate_limit
+        # (pathname, lineno): [window start time, # logged, # dropped]
+        self._call_sites = dict()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        call_site = self._call_sites.get((record.pathname, record.lineno))
+        if call_site is None or record.created - call_site[0] >= 1:
+            dropped = call_site[2] if call_site is not None else 0
+            call_site = [record.created, 0, dropped]
+            self._call_sites[(record.pathname, record.lineno)] = call_site
+        if call_site[1] >= self._rate_limit:
+            call_site[2] += 1
+            return False
+        call_site[1] += 1
+        if call_site[2]:
+            record.msg = f"{record.msg} ({call_site[2]} similar dropped)"
+            call_site[2] = 0
+        return True
+
+
+def start_queue_logging(logger, handlers):
+    """
+    Makes the logger put its records on an in-process queue, and starts a
+    background thread passing them on to the given handlers, so the file
+    and socket I/O never happens in the loop that logs.
+    Records are rate limited per call site before they are queued.
+    The root logger's handlers (e.g. robocup.log, see main.py) are also
+    written to from the background thread, rather than by propagating
+    every record to them straight from the loop.
+
+    Returns:
+        The QueueListener, pass it to stop_queue_logging() when done.
+    """
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    handlers = list(handlers) + logging.getLogger().handlers
+    listener = QueueListener(log_queue, *handlers,
+                             respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def stop_queue_logging(logger, listener):
+    """
+    Flushes the remaining records to the handlers and closes them (except
+    for the root logger's), and takes the queue handler off the logger
+    again, so that starting queue logging for the same logger later in this
+    process doesn't log everything twice.
+    """
+    listener.stop()
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler) and \
+                handler.queue is listener.queue:
+            logger.removeHandler(handler)
+    logger.propagate = True
+    root_handlers = logging.getLogger().handlers
+    for handler in listener.handlers:
+        if handler not in root_handlers:
+            handler.close()
+
+
+class TickScheduler(object):
+    """
+    Paces a loop at a target rate. Deadlines are kept on a fixed grid from
+    the first tick, so sleeping a bit too long on one tick is made up on the
+    next one instead of adding up (drift correction). A tick that is already
+    late is counted as an overrun, and the missed deadlines are skipped
+    rather than run back to back.
+    """
+    def __init__(self, rate):
+        assert(rate > 0)
+        self.period = 1 / rate
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self._next_tick = None
+
+    def wait_for_tick(self):
+        """
+        Sleeps until the next tick is due. Call once before every tick.
+        """
+        now = time.monotonic()
+        if self._next_tick is None:
+            self._next_tick = now
+        delay = self._next_tick - now
+        if delay >= 0:
+            time.sleep(delay)
+        else:
+            # the last tick ran over its slot. Run right away, and if whole
+            # periods were missed start again from the next free slot
+            self.overruns += 1
+            missed = int(-delay / self.period)
+            self.skipped_ticks += missed
+            self._next_tick += missed * self.period
+        self._next_tick += self.period
+        self.ticks += 1
+
+
+def put_latest(q, item):
+    """
+    A non-blocking helper to .put() a dict of changed fields to a queue,
+    ignoring any exceptions. If the queue is full the queued item is taken
+    out and the new fields are merged into it, since the reader never saw it.
+
+    Returns:
+        Whether the item made it into the queue.
+    """
+    try:
+        q.put_nowait(item)
+    except Full:
+        # There are race conditions here, so if the final put ends up
+        # failing we just ignore the failure and move on.
+        try:
+            old_item = q.get_nowait()
+            old_item.update(item)
+            item = old_item
+        except Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except Full:
+            return False
+    return True
 
 
 class Provider(object):
@@ -27,14 +177,34 @@ class Provider(object):
         Sets up queues for reading data in and out of this provider
         """
         from gamestate import GameState
+        from tracing import NullTracer
         self.data_in_q = Queue(MAX_Q_SIZE)
         self.commands_out_q = Queue(MAX_Q_SIZE)
         self.gs = GameState()
         self.logger = None
+        self._log_listener = None
+
+        # Shared memory holding the latest positions, commands and status,
+        # set by the coordinator before the provider is started
+        self._shared_gamestate = None
+        # Version of the shared gamestate last copied into self.gs
+        self._shared_gamestate_version = None
+        # Owned field: (version, pickled value), the version goes up every
+        # time the value changes, whether or not it was delivered
+        self._owned_versions = dict()
+        # Owned field: version the coordinator last received
+        self._coordinator_versions = dict()
+        # Direct queue: {field: version last put on that queue}
+        self._direct_versions = dict()
+        # Field: version of the fields last received from the coordinator
+        self._received_versions = dict()
 
         # Convenience variables for assess the performance of the provider
         self.last_run_time = None
         self.delta_time = 0
+        # Records a timeline of the provider loop, replaced by the
+        # coordinator with a ChromeTracer when tracing is turned on
+        self._tracer = NullTracer()
 
         # This specifies the fields in the gamestate dict for which this
         # provider is the source of truth. These fields will be stored
@@ -42,6 +212,22 @@ class Provider(object):
         # in new gamestate packets.
         self._owned_fields = []
 
+        # Owned fields that are also sent straight to the providers that
+        # read them directly, skipping the hop through the coordinator
+        # (e.g. strategy -> comms robot commands).
+        self._direct_out_fields = []
+        # Fields this provider reads directly from the provider that owns
+        # them. Once a direct channel is connected these are kept locally
+        # like owned fields, and only updated from that channel.
+        self._direct_in_fields = []
+        # Set up by the coordinator before the provider is started
+        self._direct_out_qs = dict()  # field: [queue, ...]
+        self._direct_in_qs = dict()  # field: queue
+
+        # How many times per second run() should be called. If None the
+        # provider runs whenever new data arrives (or at least once a second)
+        self._target_rate = None
+
     def run(self):
         """
         Handle provider specific logic. This function is continuously
@@ -53,47 +239,119 @@ class Provider(object):
         """
         raise NotImplementedError("Need to implement run() in child classes.")
 
-    def _update_gamestate(self):
+    def _update_gamestate(self, block=True):
         """
         Get the latest gamestate from coordinator. DON'T call this method from
         outside the provider.
+
+        Args:
+            block (bool): Whether to wait (up to a second) for the coordinator
+                to publish something new
         """
-        # Save a copy of all of the fields this provider owns
+        # Save a copy of all of the fields this provider owns, or gets
+        # directly from their owner
+        local_fields = self._owned_fields + list(self._direct_in_qs)
         owned_field_values = dict()
-        for field in self._owned_fields:
+        for field in local_fields:
             owned_field_values[field] = getattr(self.gs, field)
 
-        # Get a new gamestate copy from the coordinator
+        # Get the changed fields that aren't in shared memory from the
+        # coordinator, as field: (version, pickled value)
         try:
-            self.gs = self.data_in_q.get(timeout=1)
-            # Send logger messages from gs to the calling provider's logger
-            self.gs.logger = self.logger
+            changed_fields = self.data_in_q.get(block, timeout=1)
+            self._apply_received_fields(changed_fields)
         except Empty:
             pass
+        # Copy the latest positions, commands and status out of shared memory
+        if self._shared_gamestate is not None:
+            self._shared_gamestate_version = self._shared_gamestate.read_into(
+                self.gs,
+                exclude=local_fields,
+                since=self._shared_gamestate_version)
+        # Send logger messages from gs to the calling provider's logger
+        self.gs.logger = self.logger
 
         # Restore the fields that this provider owns
         for key, value in owned_field_values.items():
             setattr(self.gs, key, value)
 
+        self._update_direct_in_fields()
+        # positions may have been replaced without going through gamestate
+        self.gs.mark_world_changed()
+
+    def _update_direct_in_fields(self):
+        """
+        Apply the latest fields sent directly by their owners, if any.
+        """
+        for q in self._direct_in_qs.values():
+            try:
+                direct_fields = q.get_nowait()
+            except Empty:
+                continue
+            self._apply_received_fields(direct_fields)
+
+    def _apply_received_fields(self, fields):
+        """
+        Unpickle fields received as field: (version, pickled value) into
+        self.gs, skipping the versions that were already applied (the
+        coordinator sends everything again after a push fails).
+        """
+        for field, (version, value) in fields.items():
+            if self._received_versions.get(field) == version:
+                continue
+            setattr(self.gs, field, pickle.loads(value))
+            self._received_versions[field] = version
+
     def _send_result_back_to_coordinator(self):
         """
-        Send the gamestate from the provider back to the coordinator.
+        Send the owned fields the coordinator (and direct readers) haven't
+        received yet, tagged with a version number that goes up every time
+        the field changes. Fields that don't make it into a full queue are
+        sent again on the next call.
         Do not call this method from outside the provider.
         """
-        if self._owned_fields == []:
+        for field in self._owned_fields:
+            value = pickle.dumps(getattr(self.gs, field),
+                                 pickle.HIGHEST_PROTOCOL)
+            version, sent_value = self._owned_versions.get(field, (0, None))
+            if value != sent_value:
+                self._owned_versions[field] = (version + 1, value)
+        # Send to the direct readers first, they are the latency critical ones
+        for field, qs in self._direct_out_qs.items():
+            version, value = self._owned_versions[field]
+            for q in qs:
+                direct_versions = self._direct_versions.setdefault(q, dict())
+                if direct_versions.get(field) == version:
+                    continue
+                if put_latest(q, {field: (version, value)}):
+                    direct_versions[field] = version
+                else:
+                    self._tracer.instant('direct queue full', field=field)
+        changed_fields = {
+            field: (version, value)
+            for field, (version, value) in self._owned_versions.items()
+            if self._coordinator_versions.get(field) != version
+        }
+        if not changed_fields:
             return
         try:
-            self.commands_out_q.put_nowait(self.gs)
+            self.commands_out_q.put_nowait(changed_fields)
         except Full:
-            pass
+            # Fields are only marked as received once they make it into the
+            # queue, so they will be sent again next time
+            self._tracer.instant('commands_out_q full',
+                                 fields=list(changed_fields))
+            return
+        for field, (version, _) in changed_fields.items():
+            self._coordinator_versions[field] = version
 
     def _update_times(self):
         """
         Called every time run() completes. We record stuff here
         to monitor how our providers are performing.
         """
-        t = time.time()
-        if self.last_run_time:
+        t = self.gs.current_time()
+        if self.last_run_time is not None:
             self.delta_time = t - self.last_run_time
         self.last_run_time = t
 
@@ -103,20 +361,38 @@ class Provider(object):
         Usually this is called from Coordinator.start_game()
         """
         self.create_logger()
+        scheduler = None
+        if self._target_rate is not None:
+            scheduler = TickScheduler(self._target_rate)
         try:
             self.pre_run()
             self._send_result_back_to_coordinator()
             while not stop_event.is_set():
-                self._update_gamestate()
-                self.run()
+                if scheduler is not None:
+                    scheduler.wait_for_tick()
+                # With a fixed rate just take whatever is newest
+                with self._tracer.span('_update_gamestate'):
+                    self._update_gamestate(block=scheduler is None)
+                with self._tracer.span('run'):
+                    self.run()
                 self._update_times()
-                self._send_result_back_to_coordinator()
+                with self._tracer.span('_send_result_back_to_coordinator'):
+                    self._send_result_back_to_coordinator()
         except Exception as e:
             traceback.print_exc()
             self.logger.error(e, exc_info=True)
             print("(See Logger for more info)")
 
+        if scheduler is not None:
+            self.logger.info("Ran %d ticks at %s Hz, %d overruns "
+                             "(%d ticks skipped)", scheduler.ticks,
+                             self._target_rate, scheduler.overruns,
+                             scheduler.skipped_ticks)
+
         self.post_run()
+        self._tracer.close()
+        if self._log_listener is not None:
+            stop_queue_logging(self.logger, self._log_listener)
         self.destroy()
 
     def pre_run(self):
@@ -142,6 +418,9 @@ class Provider(object):
         """
         self.destroy_queue(self.data_in_q)
         self.destroy_queue(self.commands_out_q)
+        for qs in self._direct_out_qs.values():
+            for q in qs:
+                self.destroy_queue(q)
 
     def destroy_queue(self, q):
         """
@@ -159,12 +438,12 @@ class Provider(object):
         if logger_name is None:
             logger_name = self.__class__.__name__
         self.logger = logging.getLogger(logger_name)
-        self.logger.addHandler(
-            logging.FileHandler('logs/%s.log' % logger_name, mode='w'))
         self.logger.setLevel(1)
-        socket_handler = SocketHandler('127.0.0.1', 19996)
-        self.logger.addHandler(socket_handler)
-        self.logger.info("Created logger: %s" % logger_name)
+        self._log_listener = start_queue_logging(self.logger, [
+            logging.FileHandler('logs/%s.log' % logger_name, mode='w'),
+            SocketHandler('127.0.0.1', 19996),
+        ])
+        self.logger.info("Created logger: %s", logger_name)
 
 
 class DisableSignals(object):
@@ -191,11 +470,18 @@ class Coordinator(object):
     parties including vision, refbox data, XBEE processes and
     strategy processes.
     """
-    def __init__(self, providers):
+    def __init__(self, providers, trace_path=None):
         """
         Collects the objects to coordinate
+
+        Args:
+            providers (list): The providers to run
+            trace_path (str): If given, a Chrome trace of all of the
+                processes is saved there when the game stops
         """
-        from gamestate import GameState
+        from gamestate import GameState, SharedGameState
+        from gamestate.shared_gamestate import SHARED_FIELDS
+        from tracing import ChromeTracer, NullTracer
         # A list of all of the provider that need to be synchronised
         self.providers = providers
 
@@ -209,17 +495,68 @@ class Coordinator(object):
         # The source of truth gamestate object
         self.gamestate = GameState()
 
+        # Positions, commands and status are published to the providers
+        # through shared memory, the remaining owned fields through queues.
+        # Must be created before the processes so they can inherit it.
+        self._shared_gamestate = SharedGameState(self.logger)
+        self._shared_fields = SHARED_FIELDS
+        self._shared_fields_changed = True
+        for provider in self.providers:
+            provider._shared_gamestate = self._shared_gamestate
+
+        # Connect the fields that go directly from one provider to another
+        self.connect_direct_fields()
+
+        # The other fields are forwarded pickled as they came from their
+        # owner, and only to the providers that haven't seen that version yet.
+        # Field: (version, pickled value)
+        self._queued_fields = dict()
+        # Provider index: {field: version last pushed to that provider}
+        self._pushed_versions = [dict() for _ in self.providers]
+
         # This event is used to signal to the child processes when to stop
         self.stop_event = Event()
 
+        # Every process records its own part of the timeline, merged into
+        # trace_path at the end
+        self._trace_path = trace_path
+        self._tracer = NullTracer()
+        if trace_path is not None:
+            self._tracer = ChromeTracer(f'{trace_path}.coordinator.part',
+                                        'Coordinator')
+            for i, provider in enumerate(self.providers):
+                name = provider.__class__.__name__
+                provider._tracer = ChromeTracer(
+                    f'{trace_path}.{i}.{name}.part', name)
+
+    def connect_direct_fields(self):
+        """
+        Gives every provider reading a field directly its own queue from each
+        provider that owns that field and sends it directly. Fields without a
+        matching owner keep going through the coordinator as usual.
+        """
+        for reader in self.providers:
+            for field in reader._direct_in_fields:
+                for owner in self.providers:
+                    if owner is reader or \
+                            field not in owner._owned_fields or \
+                            field not in owner._direct_out_fields:
+                        continue
+                    q = Queue(MAX_Q_SIZE)
+                    owner._direct_out_qs.setdefault(field, []).append(q)
+                    reader._direct_in_qs[field] = q
+                    self.logger.info("Sending %s directly from %s to %s",
+                                     field, owner.__class__.__name__,
+                                     reader.__class__.__name__)
+
     def create_logger(self):
         self.logger = logging.getLogger('coordinator')
-        self.logger.addHandler(
-            logging.FileHandler('coordinator.log', mode='a'))
-        self.logger.info("Initializing Coordinator")
         self.logger.setLevel(1)
-        socket_handler = SocketHandler('0.0.0.0', 19996)
-        self.logger.addHandler(socket_handler)
+        self._log_listener = start_queue_logging(self.logger, [
+            logging.FileHandler('coordinator.log', mode='a'),
+            SocketHandler('0.0.0.0', 19996),
+        ])
+        self.logger.info("Initializing Coordinator")
         self.logger.info("Created logger for coordinator")
 
     def start_game(self):
@@ -244,6 +581,26 @@ class Coordinator(object):
         self.logger.info("Starting main game loop")
         self.game_loop()
 
+        if self._trace_path is not None:
+            self.save_trace()
+        stop_queue_logging(self.logger, self._log_listener)
+
+    def save_trace(self):
+        """
+        Waits for the providers to write the rest of their trace, and merges
+        all of the parts into a single file.
+        """
+        from tracing import merge_traces
+        for proc in self.processes:
+            proc.join(TRACE_JOIN_TIMEOUT)
+        self._tracer.close()
+        part_paths = [self._tracer.path] + \
+            [provider._tracer.path for provider in self.providers]
+        num_events = merge_traces(part_paths, self._trace_path)
+        self.logger.info("Saved %d trace events to %s", num_events,
+                         self._trace_path)
+        print(f"Saved trace to {self._trace_path}")
+
     def stop_game(self):
         """
         Sets the stop signal. Called from a signal handler in main.py.
@@ -254,62 +611,91 @@ class Coordinator(object):
     def game_loop(self):
         """
         This is the main loop of the game that runs continuously in the main
-        process.
+        process. It sleeps until a provider sends data back, and then
+        publishes the new gamestate right away.
         This should only be called from self.start_game()
         """
+        # Wait directly on the pipes underneath the commands_out_q queues
+        # (the same trick concurrent.futures uses for its result queue)
+        readers = {provider.commands_out_q._reader: provider
+                   for provider in self.providers}
+        self.publish_new_gamestate()
         while not self.stop_event.is_set():
+            ready = wait(list(readers), timeout=GAME_LOOP_TIMEOUT)
+            if not ready:
+                continue
+            for reader in ready:
+                provider = readers[reader]
+                with self._tracer.span('get_data_from_provider',
+                                       provider=provider.__class__.__name__):
+                    self.get_data_from_provider(provider)
+            with self._tracer.span('publish_new_gamestate'):
+                self.publish_new_gamestate()
             sys.stdout.flush()
-            self.publish_new_gamestate()
-            for provider in self.providers:
-                self.get_data_from_provider(provider)
 
     def get_data_from_provider(self, provider):
         """
-        Gets and integrates updated gamestate data from a provider's returned
-        gamestate
+        Gets and integrates the changed fields a provider sent back, as
+        field: (version, pickled value)
         """
-        provider_gs = self.get_from_provider_ignore_exceptions(provider)
-        if provider_gs:
-            for field in provider._owned_fields:
-                setattr(self.gamestate, field, getattr(provider_gs, field))
+        changed_fields = self.get_from_provider_ignore_exceptions(provider)
+        if changed_fields:
+            for field, (version, value) in changed_fields.items():
+                if field in self._shared_fields:
+                    setattr(self.gamestate, field, pickle.loads(value))
+                    self._shared_fields_changed = True
+                else:
+                    self._queued_fields[field] = (version, value)
 
     def publish_new_gamestate(self):
         """
-        Pushes the current gamestate to the data_in_q of the providers that
-        need it
-        """
-        for provider in self.providers:
-            self.push_to_provider_ignore_exceptions(provider, self.gamestate)
+        Writes the current positions, commands and status to shared memory,
+        and pushes the other fields that changed to the data_in_q of the
+        providers that haven't received them yet
+        """
+        if self._shared_fields_changed:
+            # stamp the new frame, to trace its latency through the providers
+            self.gamestate._frame_id += 1
+            self.gamestate._frame_publish_time = time.time()
+            self._shared_gamestate.write(self.gamestate)
+            self._shared_fields_changed = False
+        for provider, pushed_versions in zip(self.providers,
+                                             self._pushed_versions):
+            changed_fields = {
+                field: (version, value)
+                for field, (version, value) in self._queued_fields.items()
+                if pushed_versions.get(field) != version and
+                field not in provider._owned_fields and
+                field not in provider._direct_in_qs
+            }
+            # Push even if nothing changed, to let the provider know that
+            # there is a new version of the shared gamestate
+            if self.push_to_provider_ignore_exceptions(provider,
+                                                       changed_fields):
+                for field, (version, _) in changed_fields.items():
+                    pushed_versions[field] = version
+            else:
+                # Whatever was queued may have been lost, so send everything
+                # again next time
+                pushed_versions.clear()
+                self._tracer.instant('data_in_q full',
+                                     provider=provider.__class__.__name__)
 
     def push_to_provider_ignore_exceptions(self, provider, item):
         """
-        A non-blocking helper method to .put() to a provider's
-        data_in_q queue and ignore any exceptions.
+        A non-blocking helper method to .put() a dict of changed fields to a
+        provider's data_in_q queue and ignore any exceptions.
 
         Args:
             q (Provider): The provider in question
+            item (dict): The changed fields to push
 
         Returns:
-            The item from the queue, or None.
+            Whether the item made it into the queue.
         """
         if not provider:
-            return None
-        q = provider.data_in_q
-        try:
-            q.put_nowait(item)
-        except Full:
-            # If the queue is full we try to remove the current item
-            # in the queue and replace it with our new item.
-            # There are race conditions here, so if the final put ends up
-            # failing we just ignore the failure and move on.
-            try:
-                q.get_nowait()
-            except Empty:
-                pass
-            try:
-                q.put_nowait(item)
-            except Full:
-                pass
+            return False
+        return put_latest(provider.data_in_q, item)
 
     def get_from_provider_ignore_exceptions(self, provider):
         """
@@ -331,3 +717,149 @@ class Coordinator(object):
             # self.logger.warning("Get from provider had empty queue")
             return None
         return item
+
+
+class InlineCoordinator(object):
+    """
+    Runs all of the providers in this process, taking turns over one shared
+    GameState, instead of a process per provider. Nothing is pickled or
+    queued, so starting is instant and the whole stack can be profiled at
+    once. Meant for the simulator, strategy and visualization: a provider
+    that blocks in run() holds up all of the others.
+
+    Providers keep the same pre_run/run/post_run contract, and run at their
+    _target_rate (every round if they don't have one).
+    """
+    def __init__(self, providers, clock=None):
+        """
+        Args:
+            providers (list): The providers to run, in order
+            clock: Clock for the shared GameState, defaults to the system
+                clock
+        """
+        from gamestate import GameState, SystemClock
+        self.providers = providers
+        self.clock = SystemClock() if clock is None else clock
+        self.gamestate = GameState(self.clock)
+        for provider in self.providers:
+            provider.gs = self.gamestate
+        # time.monotonic() when each provider is due to run next
+        self._next_run_times = [None for _ in self.providers]
+        self.steps = 0
+        self._is_stopped = False
+        self.logger = logging.getLogger('coordinator')
+
+    def start_game(self):
+        """
+        Runs the providers until stop_game is called (or is_done()).
+        """
+        for provider in self.providers:
+            provider.create_logger()
+            self.gamestate.logger = provider.logger
+            provider.pre_run()
+        try:
+            while not self._is_stopped and not self.is_done():
+                self.step()
+        finally:
+            for provider in self.providers:
+                self.gamestate.logger = provider.logger
+                provider.post_run()
+                provider._tracer.close()
+                stop_queue_logging(provider.logger, provider._log_listener)
+
+    def is_done(self):
+        """
+        Whether the game is over without being stopped.
+        """
+        return False
+
+    def step(self):
+        """
+        Runs every provider that is due once, then sleeps until the next one
+        is due.
+        """
+        now = time.monotonic()
+        for i, provider in enumerate(self.providers):
+            next_run_time = self._next_run_times[i]
+            if next_run_time is not None and next_run_time > now:
+                continue
+            self.run_provider(provider)
+            if provider._target_rate is not None:
+                period = 1 / provider._target_rate
+                if next_run_time is None or next_run_time + period < now:
+                    # first run, or fell behind: don't try to catch up
+                    next_run_time = now
+                self._next_run_times[i] = next_run_time + period
+        self.steps += 1
+        if None not in self._next_run_times:
+            delay = min(self._next_run_times) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def run_provider(self, provider):
+        """
+        Runs a provider once, with the shared gamestate logging to it.
+        """
+        self.gamestate.logger = provider.logger
+        with provider._tracer.span('run'):
+            provider.run()
+        provider._update_times()
+
+    def stop_game(self):
+        """
+        Stops the game after the current step. Called from a signal handler
+        in main.py.
+        """
+        self._is_stopped = True
+
+
+class LockstepCoordinator(InlineCoordinator):
+    """
+    Runs simulated games deterministically and as fast as the CPU allows.
+    Every step each provider (e.g. Simulator and Strategy) runs once in
+    order, and then the simulated clock is advanced by a fixed dt.
+    Runs with the same providers, seed and dt always play out the same.
+    """
+    def __init__(self, providers, dt=1/60, seed=0, duration=None):
+        """
+        Args:
+            providers (list): The providers to step, in order
+            dt (float): Simulated seconds per step
+            seed (int): Seed for the random number generators
+            duration (float): Simulated seconds to run for, or None to run
+                until stop_game() is called
+        """
+        from gamestate import SimulatedClock
+        super().__init__(providers, SimulatedClock())
+        self.dt = dt
+        self.seed = seed
+        self.duration = duration
+        # count steps rather than compare float times
+        self._num_steps = None
+        if duration is not None:
+            self._num_steps = int(round(duration / dt))
+
+    def start_game(self):
+        """
+        Steps the providers until the duration is up or stop_game is called.
+        """
+        random.seed(self.seed)
+        np.random.seed(self.seed)
+        start_time = time.time()
+        super().start_game()
+        self.logger.info("Simulated %.1fs in %d steps, in %.1fs",
+                         self.clock.time(), self.steps,
+                         time.time() - start_time)
+
+    def is_done(self):
+        return self._num_steps is not None and \
+            self.steps >= self._num_steps
+
+    def step(self):
+        """
+        Runs every provider once, then moves the clock forward by dt.
+        """
+        for provider in self.providers:
+            self.run_provider(provider)
+        self.clock.advance(self.dt)
+        self.steps += 1
@@ -1,2 +1,12 @@
 # pylint: disable=import-error
 from .gamestate import GameState  # noqa
+from .shared_gamestate import SharedGameState  # noqa
+from .clock import SystemClock, SimulatedClock  # noqa
+from .world_snapshot import WorldSnapshot  # noqa
+from .ball_trajectory import BallTrajectory  # noqa
+from .robot_grid import RobotGrid  # noqa
+from .legality_grid import FieldGrid, LegalityGrid  # noqa
+from .field_geometry import FieldGeometry  # noqa
+from .collision import Segments  # noqa
+from .occupancy_grid import OccupancyGrid  # noqa
+from .clearance_field import ClearanceField  # noqa
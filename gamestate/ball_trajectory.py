@@ -0,0 +1,111 @@
+"""
+Closed form prediction of a rolling ball's trajectory.
+
+The ball is modelled as slowing down at a constant rate along the direction
+of its current velocity until it stops, so its position at any time (and
+when it stops or leaves a rectangle) can be found directly, for any number
+of times at once, instead of stepping the prediction forward.
+"""
+import numpy as np
+
+
+class BallTrajectory(object):
+    """
+    Trajectory of a ball starting at position with velocity, slowing down
+    by deceleration (mm/s^2). Times are in seconds from the start.
+    """
+    def __init__(self, position, velocity, deceleration):
+        self.position = np.array(position, dtype=float)
+        velocity = np.array(velocity, dtype=float)
+        self.speed = float(np.linalg.norm(velocity))
+        self.deceleration = deceleration
+        if self.speed:
+            self.direction = velocity / self.speed
+            self.stop_time = self.speed / deceleration
+        else:
+            self.direction = np.zeros(2)
+            self.stop_time = 0.0
+        # how far the ball rolls before it stops
+        self.stop_distance = self.speed * self.stop_time / 2
+        self.stop_position = self.position + \
+            self.direction * self.stop_distance
+
+    def distances_at(self, times):
+        """Distance the ball has rolled at each time"""
+        t = np.clip(np.asarray(times, dtype=float), 0, self.stop_time)
+        return self.speed * t - 0.5 * self.deceleration * t ** 2
+
+    def positions_at(self, times):
+        """
+        Position of the ball at a time, or an (n, 2) array of positions for
+        an array of n times
+        """
+        return self.position + np.multiply.outer(self.distances_at(times),
+                                                 self.direction)
+
+    def time_at_distance(self, distance):
+        """
+        First time at which the ball has rolled distance, or inf if it stops
+        before getting that far
+        """
+        if distance > self.stop_distance:
+            return np.inf
+        if distance <= 0:
+            return 0.0
+        # solve speed * t - deceleration * t^2 / 2 = distance
+        discriminant = max(self.speed ** 2 -
+                           2 * self.deceleration * distance, 0)
+        return (self.speed - np.sqrt(discriminant)) / self.deceleration
+
+    def starts_inside(self, min_x, max_x, min_y, max_y):
+        """Whether the ball starts inside the rectangle (edges included)"""
+        x, y = self.position
+        return min_x <= x <= max_x and min_y <= y <= max_y
+
+    def exit_distance(self, min_x, max_x, min_y, max_y):
+        """
+        Distance the ball can roll before leaving the rectangle (edges
+        included), or 0 if it starts outside of it
+        """
+        if not self.starts_inside(min_x, max_x, min_y, max_y):
+            return 0.0
+        x, y = self.position
+        distances = [np.inf]
+        for value, low, high, d in ((x, min_x, max_x, self.direction[0]),
+                                    (y, min_y, max_y, self.direction[1])):
+            if d > 0:
+                distances.append((high - value) / d)
+            elif d < 0:
+                distances.append((low - value) / d)
+        return min(distances)
+
+    def exit_time(self, min_x, max_x, min_y, max_y):
+        """
+        Time at which the ball leaves the rectangle (edges included), 0 if
+        it starts outside of it, or inf if it stops inside of it
+        """
+        distance = self.exit_distance(min_x, max_x, min_y, max_y)
+        if distance >= self.stop_distance and distance > 0:
+            return np.inf
+        return self.time_at_distance(distance)
+
+    def sample(self, delta_time, bounds=None):
+        """
+        Sample the trajectory every delta_time seconds until the ball has
+        stopped (the last two samples are the stopping position) or, if
+        bounds (min_x, max_x, min_y, max_y) are given, until the first
+        sample outside of them. Samples nothing if the ball starts outside.
+
+        Returns:
+            (times, positions) arrays of shape (n,) and (n, 2)
+        """
+        num_steps = int(np.ceil(self.stop_time / delta_time - 1e-9))
+        times = delta_time * np.arange(num_steps + 2)
+        if bounds is not None:
+            if not self.starts_inside(*bounds):
+                return times[:0], np.empty((0, 2))
+            exit_distance = self.exit_distance(*bounds)
+            outside = np.flatnonzero(self.distances_at(times) > exit_distance)
+            if len(outside):
+                times = times[:outside[0] + 1]
+        return times, self.positions_at(times)
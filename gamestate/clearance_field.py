@@ -0,0 +1,121 @@
+"""
+Distance to the nearest robot of each team over the whole field.
+
+Analysis that asks how far points are from the nearest robot (whether a
+position is open, how close the opponents are to a pass target...) scans
+every robot for every point. A ClearanceField instead finds the nearest
+robot of each team to the center of every cell of the field once per
+WorldSnapshot, with a distance transform of the cells the robots are in
+(see distance_transform), and lookups interpolate between the four cell
+centers around each point. The distance at each cell center is to the exact
+position of the robot found, but the robots are rounded to their cells to
+find it, so lookups are only within ClearanceField.tolerance of the exact
+distances. Callers that need exact answers only use them to skip the points
+that are clearly far from or close to every robot (see
+GameState.is_position_open_batch). Distances to the rules come from a
+LegalityGrid (see LegalityGrid.distances).
+"""
+import math
+import numpy as np
+
+try:
+    from legality_grid import FieldGrid, distance_transform
+except (SystemError, ImportError):
+    from .legality_grid import FieldGrid, distance_transform
+
+CLEARANCE_RESOLUTION = 100  # mm
+
+
+class ClearanceField(FieldGrid):
+    """
+    Distance from the center of each cell of the field to the nearest
+    robot of each team, and of either team, for one WorldSnapshot. Each of
+    those transforms is only done on its first lookup.
+
+    Attributes:
+        version: the world version of the snapshot the field is for
+        tolerance: how far lookups at points on the field can be from the
+            exact distances (a cell diagonal for rounding the robots to
+            cells, and half of one for the interpolation)
+    """
+    def __init__(self, gs, resolution=CLEARANCE_RESOLUTION):
+        super().__init__(gs.FIELD_MIN_X, gs.FIELD_MAX_X,
+                         gs.FIELD_MIN_Y, gs.FIELD_MAX_Y, resolution)
+        self._snapshot = gs.get_world_snapshot()
+        self.version = self._snapshot.version
+        self.tolerance = resolution * 1.5 * math.sqrt(2)
+        self._centers = self.cell_centers()
+        # team (None for either): (distances, nearest robot rows)
+        self._fields = dict()
+
+    def _team_mask(self, team):
+        """Boolean mask of the team's rows (every row if team is None)"""
+        if team is None:
+            return np.ones(len(self._snapshot), dtype=bool)
+        return self._snapshot.team_mask(team)
+
+    def _team_field(self, team):
+        """
+        Flat arrays of the distance from each cell center to the nearest
+        robot of the team, and of that robot's row in the snapshot (-1 if
+        the team has no robot on the field)
+        """
+        field = self._fields.get(team)
+        if field is None:
+            positions = self._snapshot.positions
+            rows = np.flatnonzero(self._team_mask(team))
+            i, j, inside = self.cell_indices(positions[rows])
+            if inside.any():
+                robots = np.full(self.shape, -1)
+                robots[i[inside], j[inside]] = rows[inside]
+                blocked = robots >= 0
+                _, nearest_i, nearest_j = distance_transform(
+                    blocked, return_indices=True)
+                nearest = robots[nearest_i, nearest_j].ravel()
+                delta = self._centers - positions[nearest]
+                distances = np.hypot(delta[:, 0], delta[:, 1])
+            else:
+                nearest = np.full(self.shape[0] * self.shape[1], -1)
+                distances = np.full(len(nearest), np.inf)
+            field = (distances, nearest)
+            self._fields[team] = field
+        return field
+
+    def robot_distances(self, points, team=None, exclude=None):
+        """
+        Interpolated distance from each row of an (N, 2+) array of points
+        to the center of the nearest robot of the team (or of either team
+        if team is None), leaving out the robot with the (team, robot_id)
+        key exclude. inf if there is no such robot.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2:
+            # (an empty list of points)
+            points = points.reshape(-1, 2)
+        snapshot = self._snapshot
+        others = self._team_mask(team)
+        excluded = snapshot.index.get(exclude)
+        if excluded is not None:
+            others[excluded] = False
+        distances, nearest = self._team_field(team)
+        indices, weights = self.bilinear_weights(points)
+        corners = distances[indices]
+        # where the left out robot is the nearest, use the next nearest one
+        if excluded is not None:
+            mine = nearest[indices] == excluded
+            delta = self._centers[indices[mine]][:, np.newaxis] - \
+                snapshot.positions[others][np.newaxis]
+            corners[mine] = np.min(np.hypot(delta[..., 0], delta[..., 1]),
+                                   axis=1, initial=np.inf)
+        with np.errstate(invalid='ignore'):
+            result = (corners * weights).sum(axis=1)
+        result[np.isinf(corners).any(axis=1)] = np.inf
+        # robots off the field aren't in the transform
+        _, _, inside = self.cell_indices(snapshot.positions)
+        outside = others & ~inside
+        if outside.any():
+            delta = points[:, np.newaxis, :2] - \
+                snapshot.positions[outside][np.newaxis]
+            np.minimum(result, np.hypot(delta[..., 0], delta[..., 1]).min(
+                axis=1), out=result)
+        return result
@@ -0,0 +1,31 @@
+"""
+Clocks that the GameState timestamps its data with.
+
+Real games use the system clock. Simulated games can use a clock that only
+moves forward when it is told to, so they run the same every time and as
+fast as the CPU allows (see LockstepCoordinator).
+"""
+import time
+
+
+class SystemClock(object):
+    """Wall clock time in seconds, as in time.time()"""
+    is_simulated = False
+
+    def time(self):
+        return time.time()
+
+
+class SimulatedClock(object):
+    """Clock that stands still until advance() is called"""
+    is_simulated = True
+
+    def __init__(self, start_time=0.0):
+        self._time = start_time
+
+    def time(self):
+        return self._time
+
+    def advance(self, delta_time):
+        assert(delta_time >= 0)
+        self._time += delta_time
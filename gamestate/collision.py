@@ -0,0 +1,117 @@
+"""
+Closed form collision checks for robots moving along straight segments.
+
+Path checks used to step along each segment every robot radius and check
+the robots and legality rules at every step, which is slow and can miss an
+obstacle that only clips the segment between two steps. Here the distance
+along a segment at which a robot center first touches a circle (another
+robot inflated by the clearance, or the area around the ball) or a box
+(an inflated defense area), or leaves a box (the field), is solved for
+directly, for many segments and obstacles at once.
+"""
+import numpy as np
+
+
+class Segments(object):
+    """
+    Straight segments from starts to ends ((m, 2+) arrays, either can also
+    be a single point for all of them). Contacts are distances along each
+    segment from its start, inf where there is none.
+    """
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=float)[..., :2].reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float)[..., :2].reshape(-1, 2)
+        if starts.shape != ends.shape:
+            starts, ends = np.broadcast_arrays(starts, ends)
+        self.starts = starts
+        delta = ends - starts
+        self.lengths = np.hypot(delta[:, 0], delta[:, 1])
+        # (zero for segments without length)
+        self.directions = np.divide(delta, self.lengths[:, np.newaxis],
+                                    out=np.zeros_like(delta),
+                                    where=self.lengths[:, np.newaxis] > 0)
+        # shared by every check, (m, 1) or (m, 1, 2) to broadcast over
+        # obstacles
+        self._still = (self.lengths == 0)[:, np.newaxis]
+        self._lengths = self.lengths[:, np.newaxis]
+        self._starts = starts[:, np.newaxis]
+        # axes a segment doesn't move along get a huge (but finite, so
+        # never nan) inverse, which puts them always or never in range
+        self._inverse = 1 / np.where(self.directions == 0, 1e-200,
+                                     self.directions)[:, np.newaxis]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def circle_contacts(self, centers, radius):
+        """
+        (m, n) array of the distance along each segment at which it first
+        comes within radius of each of the (n, 2) centers (edge included).
+        Segments starting within radius touch at 0 if they head closer to
+        the center (or have no length), and not at all if they head away,
+        since they can only get farther from it.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        offsets = self._starts - centers
+        # |offset + s * direction|^2 = radius^2 is s^2 + 2 b s + c = 0
+        b = (offsets * self.directions[:, np.newaxis]).sum(axis=2)
+        discriminant = b * b - (offsets * offsets).sum(axis=2) + \
+            radius * radius
+        # the first root, which is negative when starting inside
+        entry = np.maximum(-b - np.sqrt(np.maximum(discriminant, 0)), 0)
+        hit = (discriminant >= 0) & ((b < 0) | self._still) & \
+            (entry <= self._lengths)
+        return np.where(hit, entry, np.inf)
+
+    def _slabs(self, box_min, box_max):
+        """
+        (m, k, 2) distances at which each axis of each segment enters and
+        leaves the range of each of k boxes
+        """
+        to_min = (box_min - self._starts) * self._inverse
+        to_max = (box_max - self._starts) * self._inverse
+        return np.minimum(to_min, to_max), np.maximum(to_min, to_max)
+
+    def box_contacts(self, box_min, box_max):
+        """
+        (m, k) array of the distance along each segment at which it first
+        touches each of the axis aligned boxes from the rows of box_min to
+        box_max ((k, 2) arrays, edges included). Like with circles, segments
+        starting inside touch at 0 unless they head towards the nearest
+        edge, since then they can only get farther into the open.
+        """
+        box_min = np.asarray(box_min, dtype=float).reshape(-1, 2)
+        box_max = np.asarray(box_max, dtype=float).reshape(-1, 2)
+        enter, leave = self._slabs(box_min, box_max)
+        enter = enter.max(axis=2)
+        leave = leave.min(axis=2)
+        hit = (enter <= leave) & (leave >= 0) & \
+            (enter <= self._lengths)
+        # (m, k, 4) distances from the start to each edge, and how fast
+        # they change along the segment
+        depths = np.concatenate((self._starts - box_min,
+                                 box_max - self._starts), axis=2)
+        rates = np.hstack((self.directions, -self.directions))
+        nearest = depths == depths.min(axis=2)[..., np.newaxis]
+        leaving = (depths >= 0).all(axis=2) & \
+            (nearest & (rates[:, np.newaxis] < 0)).any(axis=2)
+        return np.where(hit & ~leaving, np.maximum(enter, 0), np.inf)
+
+    def box_exits(self, box_min, box_max):
+        """
+        (m,) array of the distance along each segment at which it leaves
+        the axis aligned box from box_min to box_max (the edges are inside).
+        Segments starting outside leave at 0 unless they head into the box,
+        in which case it's where they leave again after getting in. Bounds
+        can be infinite, e.g. for half planes.
+        """
+        box_min = np.asarray(box_min, dtype=float).reshape(1, 2)
+        box_max = np.asarray(box_max, dtype=float).reshape(1, 2)
+        inside = ((self.starts >= box_min) &
+                  (self.starts <= box_max)).all(axis=1)
+        enter, leave = self._slabs(box_min, box_max)
+        enter = enter.max(axis=2)[:, 0]
+        leave = leave.min(axis=2)[:, 0]
+        heading_in = (enter <= leave) & (leave >= 0) & (self.lengths > 0)
+        exit = np.where(leave < self.lengths, leave, np.inf)
+        return np.where(inside | heading_in, exit, 0.0)
@@ -0,0 +1,87 @@
+"""
+Goals, defense areas and penalty marks for one side assignment.
+
+These only change when the teams switch sides (or the field dimensions
+change), but used to be rebuilt from the refbox message on every call, from
+inside the loops of the legality checks and positioning searches.
+"""
+import numpy as np
+
+TEAMS = ('blue', 'yellow')
+
+# Field dimensions (mm) of each SSL division
+DIVISION_DIMENSIONS = {
+    'A': {
+        'field_x_length': 12000,
+        'field_y_length': 9000,
+        'center_circle_radius': 500,
+        'goal_width': 1800,
+        'defense_area_x_length': 1800,
+        'defense_area_y_length': 3600,
+        # distance from the center of the goal
+        'penalty_mark_distance': 8000,
+    },
+    'B': {
+        'field_x_length': 9000,
+        'field_y_length': 6000,
+        'center_circle_radius': 495,
+        'goal_width': 1000,
+        'defense_area_x_length': 1000,
+        'defense_area_y_length': 2000,
+        'penalty_mark_distance': 6000,
+    },
+}
+DEFAULT_DIVISION = 'B'
+
+
+class FieldGeometry(object):
+    """
+    Positions on the field for a side assignment, given the field
+    dimensions (a dict like those in DIVISION_DIMENSIONS).
+
+    Attributes (dicts of team: value):
+        defense_goals: (top post, bottom post) of the goal the team defends
+        defense_goal_centers: center of the goal the team defends
+        defense_area_corners: bottom left corner of the team's defense area
+        defense_area_boxes: (bottom left, top right) corners of the team's
+            defense area
+        penalty_marks: where the ball goes for a penalty kick on the goal
+            the team defends
+
+    The arrays are read only, since they are shared between callers.
+    """
+    def __init__(self, dimensions, is_blue_defense_side_left):
+        self.dimensions = dimensions
+        self.is_blue_defense_side_left = is_blue_defense_side_left
+        max_x = dimensions['field_x_length'] / 2
+        left_team = 'blue' if is_blue_defense_side_left else 'yellow'
+        self.defense_goals = dict()
+        self.defense_goal_centers = dict()
+        self.defense_area_corners = dict()
+        self.defense_area_boxes = dict()
+        self.penalty_marks = dict()
+        for team in TEAMS:
+            # direction from the team's goal towards the center of the field
+            direction = 1 if team == left_team else -1
+            goal_x = -direction * max_x
+            self.defense_goals[team] = (
+                _read_only([goal_x, dimensions['goal_width'] / 2]),
+                _read_only([goal_x, -dimensions['goal_width'] / 2]))
+            self.defense_goal_centers[team] = _read_only([goal_x, 0])
+            area_x_length = dimensions['defense_area_x_length']
+            area_min_x = goal_x if direction == 1 else goal_x - area_x_length
+            area_min_y = -dimensions['defense_area_y_length'] / 2
+            self.defense_area_corners[team] = _read_only([area_min_x,
+                                                          area_min_y])
+            self.defense_area_boxes[team] = (
+                self.defense_area_corners[team],
+                _read_only([area_min_x + area_x_length, -area_min_y]))
+            self.penalty_marks[team] = _read_only(
+                [goal_x + direction * dimensions['penalty_mark_distance'],
+                 0])
+
+
+def _read_only(values):
+    array = np.array(values, dtype=float)
+    array.flags.writeable = False
+    return array
@@ -1,6 +1,4 @@
-import time
 import numpy as np
-from collections import deque
 
 # import RobotCommands from the comms folder
 # (expected to run from root directory, use try/except if run from here)
@@ -12,9 +10,15 @@ from refbox import SSL_Referee  # pylint: disable=import-error
 try:
     from gamestate_field import Field
     from gamestate_analysis import Analysis
+    from clock import SystemClock
+    from position_history import PositionHistory
+    from world_snapshot import WorldSnapshot
 except (SystemError, ImportError):
     from .gamestate_field import Field
     from .gamestate_analysis import Analysis
+    from .clock import SystemClock
+    from .position_history import PositionHistory
+    from .world_snapshot import WorldSnapshot
 
 # RAW DATA PROCESSING CONSTANTS
 BALL_POS_HISTORY_LENGTH = 200
@@ -32,10 +36,14 @@ class GameState(Field, Analysis):
        Since using python, data types are specified in the comments below.
        Fundamental physics and game rules functions available from gamestate.
     """
-    def __init__(self):
+    def __init__(self, clock=None):
         # NOTE: Fields starting with _underscore are "private" so
         # should be accessed through getter and setter methods
 
+        # Clock used to timestamp data, defaults to the system clock
+        # (a SimulatedClock lets simulations run faster than real time)
+        self._clock = SystemClock() if clock is None else clock
+
         # Thread keeps track of game status/events
         self._is_playing = False
         self._game_thread = None
@@ -44,12 +52,30 @@ class GameState(Field, Analysis):
 
         # Raw Position Data - updated by vision provider
         # (either vision or simulator)
-        # queue of (time, pos) where positions are in the form np.array([x, y])
-        # most recent data is at the front of queue
-        self._ball_position = deque([], BALL_POS_HISTORY_LENGTH)
+        # history of (time, pos) where positions are in the form
+        # np.array([x, y]), most recent first (see PositionHistory)
+        self._ball_position = PositionHistory(BALL_POS_HISTORY_LENGTH, 2)
         # robot positions are np.array([x, y, w]) where w = rotation
-        self._blue_robot_positions = dict()  # Robot ID: queue of (time, pos)
-        self._yellow_robot_positions = dict()  # Robot ID: queue of (time, pos)
+        self._blue_robot_positions = dict()  # Robot ID: PositionHistory
+        self._yellow_robot_positions = dict()  # Robot ID: PositionHistory
+        # incremented whenever the positions above change, so that analysis
+        # can share one WorldSnapshot until the next change
+        self._world_version = 0
+        self._world_snapshot = None
+        # analysis results for the current world version and refbox message
+        # (see memoize)
+        self._memo = dict()
+        self._memo_world_version = None
+        self._memo_refbox_string = None
+        # rasterized legality rules (see get_legality_grid)
+        self._legality_grids = dict()
+        # rasterized robots and rules for planning (see get_occupancy_grid)
+        self._occupancy_grids = dict()
+        # distances to the robots (see get_clearance_field)
+        self._clearance_field = None
+        # goals and defense areas for the side assignment
+        # (see get_field_geometry)
+        self._field_geometry = None
 
         # Commands Data (desired robot actions) - updated by strategy
         self._blue_robot_commands = dict()  # Robot ID: commands object
@@ -59,6 +85,19 @@ class GameState(Field, Analysis):
         self._blue_robot_status = dict()  # Robot ID: status object
         self._yellow_robot_status = dict()  # Robot ID: status object
 
+        # Frame Tracing - for measuring latency through the providers
+        # (see tracing/latency.py)
+        # time the latest positions were received - updated by vision provider
+        self._vision_time = None
+        # increasing id + time of the positions, stamped by the coordinator
+        # whenever it publishes new positions/commands/status
+        self._frame_id = 0
+        self._frame_publish_time = None
+        # frame trace dict of the frame the commands were computed from
+        # - updated by strategy
+        self._blue_commands_frame = None
+        self._yellow_commands_frame = None
+
         # UI Inputs - updated by visualizer
         self.viz_inputs = {
             "simulator_events_count": 0,  # flag for simulator to handle
@@ -88,6 +127,11 @@ class GameState(Field, Analysis):
         # Initialize to a default message for when we do not care
         # about the refbox
         self._latest_refbox_message_string = b'\x08\x8f\xbb\xb7\x83\x86\xf5\xe7\x02\x10\r \x00(\x010\x9e\xb6\xe3\x9b\x82\xf5\xe7\x02:\x12\n\x00\x10\x00\x18\x00(\x000\x048\x80\xc6\x86\x8f\x01@\x00B\x12\n\x00\x10\x00\x18\x00(\x000\x048\x80\xc6\x86\x8f\x01@\x00P\x00'  # noqa
+        # The message above decoded, along with values derived from it.
+        # Only refreshed when the message string is replaced, since decoding
+        # on every call showed up as a large part of strategy run time.
+        self._refbox_cache_string = None
+        self._refbox_cache = None
         # TODO - functions to get data from refbox message?
         # Game status/events
         self.game_clock = None
@@ -111,13 +155,19 @@ class GameState(Field, Analysis):
             return self.get_latest_refbox_message().yellow
 
     def get_goalie_id(self, team):
-        return self.get_team_info(team).goalie
+        return self._get_refbox_cache()['goalie_ids'][team]
 
     def is_goalie(self, team, robot_id):
         return robot_id == self.get_goalie_id(team)
 
     def is_blue_defense_side_left(self):
-        return not self.get_latest_refbox_message().blueTeamOnPositiveHalf
+        return self._get_refbox_cache()['is_blue_defense_side_left']
+
+    def get_refbox_command(self):
+        """
+        Returns the current refbox command (an SSL_Referee.Command value)
+        """
+        return self._get_refbox_cache()['command']
 
     # RAW DATA GET/SET FUNCTIONS
     # returns latest refbox message
@@ -125,59 +175,90 @@ class GameState(Field, Analysis):
         """
         Returns latest refbox message as an object.
         See referee.proto for specifications.
+        The object is shared by all callers until a new message arrives, so
+        treat it as read only.
         """
-        if self._latest_refbox_message_string is None:
-            raise Exception("Refbox message must be populated")
-        refbox_message = SSL_Referee()
-        refbox_message.ParseFromString(self._latest_refbox_message_string)
-        # print(f"{self._latest_refbox_message_string}\n")
-        return refbox_message
-
-    def update_game_info_from_refbox_message(self, prev_msg_string):
-        msg = SSL_Referee()
-        msg.ParseFromString(self._latest_refbox_message_string)
-        prev_msg = SSL_Referee()
-        prev_msg.ParseFromString(prev_msg_string)
+        return self._get_refbox_cache()['message']
+
+    def _get_refbox_cache(self):
+        """
+        Returns the decoded refbox message and values derived from it,
+        decoding the message string again only if it has been replaced
+        (by update_latest_refbox_message or a provider update).
+        """
+        if self._latest_refbox_message_string is not \
+                self._refbox_cache_string:
+            if self._latest_refbox_message_string is None:
+                raise Exception("Refbox message must be populated")
+            refbox_message = SSL_Referee()
+            refbox_message.ParseFromString(
+                self._latest_refbox_message_string)
+            self._refbox_cache = {
+                'message': refbox_message,
+                'command': refbox_message.command,
+                'goalie_ids': {
+                    'blue': refbox_message.blue.goalie,
+                    'yellow': refbox_message.yellow.goalie,
+                },
+                'is_blue_defense_side_left':
+                    not refbox_message.blueTeamOnPositiveHalf,
+            }
+            self._refbox_cache_string = self._latest_refbox_message_string
+        return self._refbox_cache
+
+    def update_game_info_from_refbox_message(self, prev_command):
+        msg = self.get_latest_refbox_message()
         if msg.command == SSL_Referee.NORMAL_START \
-           and prev_msg.command != SSL_Referee.NORMAL_START:
+           and prev_command != SSL_Referee.NORMAL_START:
             self.game_info["most_recent_start_pos"] = self.get_ball_position()
             self.game_info["most_recent_start_time"] = msg.stage_time_left
 
     def update_latest_refbox_message(self, message):
-        prev_msg_string = self._latest_refbox_message_string
+        prev_command = self.get_refbox_command()
         self._latest_refbox_message_string = message
-        self.update_game_info_from_refbox_message(prev_msg_string)
+        self.update_game_info_from_refbox_message(prev_command)
 
     # returns position ball was last seen at, or (0, 0) if unseen
     def get_ball_position(self):
         if len(self._ball_position) == 0:
             # print("getting ball position but ball never seen?!?")
             return np.array([0, 0])
-        timestamp, pos = self._ball_position[0]
-        return pos
+        return self._ball_position.latest_position()
 
     def clear_ball_position(self):
-        self._ball_position = deque([], BALL_POS_HISTORY_LENGTH)
+        self._ball_position.clear()
+        self.mark_world_changed()
+
+    def current_time(self):
+        """The current time according to the gamestate's clock"""
+        return self._clock.time()
+
+    def is_clock_simulated(self):
+        """
+        Whether time only moves when the clock is advanced (in lockstep),
+        in which case work should be bounded by counts, not wall time, to
+        keep runs repeatable.
+        """
+        return self._clock.is_simulated
 
     def update_ball_position(self, pos, timestamp=None):
         if timestamp is None:
-            timestamp = time.time()
+            timestamp = self.current_time()
         assert(len(pos) == 2 and type(pos) == np.ndarray)
-        pos = pos.copy().astype(float)
-        self._ball_position.appendleft((timestamp, pos))
+        self._ball_position.append(timestamp, pos)
+        self.mark_world_changed()
 
     def get_ball_last_update_time(self):
         if len(self._ball_position) == 0:
             # print("getting ball update time but ball never seen?!?")
             return None
-        timestamp, pos = self._ball_position[0]
-        return timestamp
+        return self._ball_position.latest_time()
 
     def is_ball_lost(self):
         last_update_time = self.get_ball_last_update_time()
         if last_update_time is None:
             return True
-        return time.time() - last_update_time > BALL_LOST_TIME
+        return self.current_time() - last_update_time > BALL_LOST_TIME
 
     def get_team_positions(self, team):
         if team == 'blue':
@@ -200,8 +281,7 @@ class GameState(Field, Analysis):
             # print("team: {}, id: {}".format(team, robot_id))
             # traceback.print_stack()
             return np.array([0, 0, 0])
-        timestamp, pos = robot_positions[robot_id][0]
-        return pos
+        return robot_positions[robot_id].latest_position()
 
     def get_robot_direction(self, team, robot_id):
         x, y, w = self.get_robot_position(team, robot_id)
@@ -219,18 +299,56 @@ class GameState(Field, Analysis):
                     all_robot_positions.append((key, robot_pos))
         return all_robot_positions
 
+    def mark_world_changed(self):
+        """
+        Invalidates the world snapshot. Called by the position update methods,
+        and must be called after replacing the position fields directly
+        (as providers do when they receive a new gamestate).
+        """
+        self._world_version += 1
+
+    def get_world_snapshot(self):
+        """
+        Returns a WorldSnapshot of the current robot and ball positions,
+        which is only rebuilt after the positions change. Treat as read only.
+        """
+        snapshot = self._world_snapshot
+        if snapshot is None or snapshot.version != self._world_version:
+            snapshot = WorldSnapshot(self, self._world_version)
+            self._world_snapshot = snapshot
+        return snapshot
+
+    def memoize(self, key, compute, *args):
+        """
+        Returns compute(*args), reusing the value stored under the same key
+        until the positions or the refbox message change. Only use for
+        results that depend on nothing else (e.g. not the current time),
+        and treat the returned values as read only.
+        """
+        if self._memo_world_version != self._world_version or \
+                self._memo_refbox_string is not \
+                self._latest_refbox_message_string:
+            self._memo = dict()
+            self._memo_world_version = self._world_version
+            self._memo_refbox_string = self._latest_refbox_message_string
+        if key not in self._memo:
+            self._memo[key] = compute(*args)
+        return self._memo[key]
+
     def update_robot_position(self, team, robot_id, pos):
         assert(len(pos) == 3 and type(pos) == np.ndarray)
-        pos = pos.copy().astype(float)
         robot_positions = self.get_team_positions(team)
         if robot_id not in robot_positions:
             # assert(len(robot_positions) <= 6)
-            robot_positions[robot_id] = deque([], ROBOT_POS_HISTORY_LENGTH)
-        robot_positions[robot_id].appendleft((time.time(), pos))
+            robot_positions[robot_id] = PositionHistory(
+                ROBOT_POS_HISTORY_LENGTH, 3)
+        robot_positions[robot_id].append(self.current_time(), pos)
+        self.mark_world_changed()
 
     def remove_robot(self, team, robot_id):
         team_positions = self.get_team_positions(team)
         del team_positions[robot_id]
+        self.mark_world_changed()
         team_commands = self.get_team_commands(team)
         if robot_id in team_commands:
             del team_commands[robot_id]
@@ -243,9 +361,9 @@ class GameState(Field, Analysis):
         if robot_id not in robot_positions:
             # print("getting update time of robot never seen?!?")
             return None
-        timestamp, pos = robot_positions[robot_id][0]
+        timestamp = robot_positions[robot_id].latest_time()
         # remove lost robots after a while
-        if time.time() - timestamp > ROBOT_REMOVE_TIME:
+        if self.current_time() - timestamp > ROBOT_REMOVE_TIME:
             self.remove_robot(team, robot_id)
         return timestamp
 
@@ -254,7 +372,7 @@ class GameState(Field, Analysis):
         last_update_time = self.get_robot_last_update_time(team, robot_id)
         if last_update_time is None:
             return True
-        return time.time() - last_update_time > ROBOT_LOST_TIME
+        return self.current_time() - last_update_time > ROBOT_LOST_TIME
 
     def get_team_commands(self, team):
         if team == 'blue':
@@ -2,6 +2,15 @@
 import numpy as np
 from refbox import SSL_Referee
 
+try:
+    from ball_trajectory import BallTrajectory
+    from occupancy_grid import OccupancyGrid, PLANNER_RESOLUTION
+    from clearance_field import ClearanceField, CLEARANCE_RESOLUTION
+except (SystemError, ImportError):
+    from .ball_trajectory import BallTrajectory
+    from .occupancy_grid import OccupancyGrid, PLANNER_RESOLUTION
+    from .clearance_field import ClearanceField, CLEARANCE_RESOLUTION
+
 
 class Analysis(object):
     """
@@ -95,72 +104,170 @@ class Analysis(object):
         """
         if ball_pos is None:
             ball_pos = self.get_ball_position()
+        return bool(self.balls_in_dribbler(team, robot_id,
+                                           np.array([ball_pos]))[0])
+
+    def balls_in_dribbler(self, team, robot_id, ball_positions):
+        """
+        for each row of ball positions, if it is in position to be dribbled
+        """
         robot_pos = self.get_robot_position(team, robot_id)
         ideal_pos = self.dribbler_pos(team, robot_id)
-        # print("id {}, ball {} want {}".format(robot_id, ball_pos, ideal_pos))
         # TODO: kicking version of this function incorporates breakbeam sensor?
         MAX_DIST = self.ROBOT_RADIUS + 32  # fairly lenient constants,
         DRIBBLE_ZONE_RADIUS = 60
-        in_zone = np.linalg.norm(ball_pos - ideal_pos) < DRIBBLE_ZONE_RADIUS
-        close_enough = np.linalg.norm(ball_pos - robot_pos[:2]) < MAX_DIST
-        return in_zone and close_enough
+        in_zone = np.linalg.norm(ball_positions - ideal_pos, axis=1) < \
+            DRIBBLE_ZONE_RADIUS
+        close_enough = np.linalg.norm(ball_positions - robot_pos[:2],
+                                      axis=1) < MAX_DIST
+        return in_zone & close_enough
 
     def ball_in_dribbler(self, team, robot_id):
-        positions = self._ball_position
+        """
+        if ball has been in position to be dribbled for a while
+        """
+        return self.memoize(('ball_in_dribbler', team, robot_id),
+                            self._ball_in_dribbler, team, robot_id)
+
+    def _ball_in_dribbler(self, team, robot_id):
+        history = self._ball_position
         MIN_TIME_INTERVAL = 1
-        i = 0
-        if len(positions) <= 1:
+        if len(history) <= 1:
             return False
-        if not self.ball_in_dribbler_single_frame(team, robot_id, positions[0][1]):  # noqa
-            return False
-        # look back from 0 (most recent) until big enough interval
-        while i < len(positions) - 1 and \
-                positions[0][0] - positions[i][0] < MIN_TIME_INTERVAL:
-            ball_pos = positions[i][1]
-            i += 1
-            if not self.ball_in_dribbler_single_frame(team, robot_id, ball_pos):  # noqa
-                return False
-        return True
+        # ball must have been in the dribbler in every frame from the most
+        # recent one until MIN_TIME_INTERVAL ago (or as far back as we know)
+        num_frames = max(history.lookback_index(MIN_TIME_INTERVAL), 1)
+        return bool(self.balls_in_dribbler(
+            team, robot_id, history.positions(num_frames)).all())
 
-    def is_position_open(self, pos, team, robot_id, buffer_dist=0):
+    def is_position_open(self, pos, team, robot_id, buffer_dist=0,
+                         use_clearance_field=False):
         """
         return whether robot can be in a location without colliding
         with another robot
         """
-        for key, robot_pos in self.get_all_robot_positions():
-            if key == (team, robot_id):
-                continue
-            if self.robot_overlap(pos, robot_pos, buffer_dist).any():
+        if use_clearance_field:
+            return bool(self.is_position_open_batch(
+                [pos], team, robot_id, buffer_dist, use_clearance_field)[0])
+        radius = self.ROBOT_RADIUS * 2 + buffer_dist
+        for key in self.robots_within(pos, radius):
+            if key != (team, robot_id):
                 return False
         return True
 
+    def is_position_open_batch(self, points, team, robot_id, buffer_dist=0,
+                               use_clearance_field=False):
+        """
+        is_position_open for each row of an (N, 2+) array of points,
+        as a boolean mask. With use_clearance_field, the points on the field
+        that are clearly open or not by the ClearanceField are decided from
+        it, and only the rest are checked against the nearby robots. The
+        field is built once per tick, so this only pays off for callers
+        that check many points.
+        """
+        if use_clearance_field:
+            field = self.get_clearance_field()
+            radius = self.ROBOT_RADIUS * 2 + buffer_dist
+            distances = field.robot_distances(points, exclude=(team, robot_id))
+            is_open = distances > radius
+            _, _, inside = field.cell_indices(points)
+            unsure = np.flatnonzero(
+                (np.abs(distances - radius) <= field.tolerance) | ~inside)
+            if len(unsure):
+                is_open[unsure] = self.is_position_open_batch(
+                    np.asarray(points, dtype=float)[unsure], team, robot_id,
+                    buffer_dist)
+            return is_open
+        snapshot = self.get_world_snapshot()
+        nearby = snapshot.grid.query_radius_batch(
+            points, self.ROBOT_RADIUS * 2 + buffer_dist)
+        others = snapshot.others_mask(team, robot_id)
+        return ~nearby[:, others].any(axis=1)
+
+    def get_occupancy_grid(self, team, robot_id, clearance,
+                           allow_illegal=False,
+                           resolution=PLANNER_RESOLUTION):
+        """
+        Returns the OccupancyGrid the robot plans on, which is shared with
+        the other robots of the team and only rebuilt (from the last one)
+        when the legality rules change or a robot moves to another cell.
+        """
+        key = OccupancyGrid.map_key(self, team, robot_id, clearance,
+                                    allow_illegal, resolution)
+        # grids only differ between teams and goalie vs. other robots
+        cache_key = (team, self.is_goalie(team, robot_id), clearance,
+                     allow_illegal, resolution)
+        grid = self._occupancy_grids.get(cache_key)
+        if grid is None or grid.key != key:
+            grid = OccupancyGrid(self, team, robot_id, clearance,
+                                 allow_illegal, resolution, previous=grid)
+            self._occupancy_grids[cache_key] = grid
+        return grid
+
+    def get_clearance_field(self, resolution=CLEARANCE_RESOLUTION):
+        """
+        Returns the ClearanceField of the current positions, which is shared
+        by every caller until the positions change. Treat as read only.
+        """
+        field = self._clearance_field
+        if field is None or field.version != self._world_version or \
+                field.resolution != resolution:
+            field = ClearanceField(self, resolution)
+            self._clearance_field = field
+        return field
+
+    def first_robot_contact(self, segments, team, robot_id, buffer_dist=0):
+        """
+        Distance along each of the collision.Segments at which the robot
+        would first stop being at an open position (as in
+        is_position_open), or inf if it never does
+        """
+        snapshot = self.get_world_snapshot()
+        centers = snapshot.positions[snapshot.others_mask(team, robot_id)]
+        if not len(centers):
+            return np.full(len(segments), np.inf)
+        return segments.circle_contacts(
+            centers, self.ROBOT_RADIUS * 2 + buffer_dist).min(axis=1)
+
     def robot_at_position(self, pos):
         """
         return robot team and id occupying a current position, if any
         """
-        for (team, robot_id), robot_pos in self.get_all_robot_positions():
-            if self.overlap(pos, robot_pos, self.ROBOT_RADIUS).any():
-                return (team, robot_id)
+        overlapping = self.robots_within(pos, self.ROBOT_RADIUS)
+        if overlapping:
+            return overlapping[0]
         return None
 
+    def robots_within(self, pos, radius):
+        """
+        return (team, robot_id) of robots centered within radius of a
+        position, in get_all_robot_positions order
+        """
+        snapshot = self.get_world_snapshot()
+        rows = snapshot.grid.query_radius(pos, radius)
+        return [snapshot.keys[i] for i in rows]
+
     def get_ball_velocity(self):
         """
         Here we find ball velocity at most recent timestamp from position data
         """
+        return self.memoize('ball_velocity',
+                            self._compute_ball_velocity).copy()
+
+    def _compute_ball_velocity(self):
         # TOOD: smooth out this value by averaging?
         # prev_velocity = self.ball_velocity
-        positions = self._ball_position
+        history = self._ball_position
         MIN_TIME_INTERVAL = .05
-        i = 0
-        if len(positions) <= 1:
+        if len(history) <= 1:
             return np.array([0, 0])
         # look back from 0 (most recent) until big enough interval
-        while i < len(positions) - 1 and \
-                positions[0][0] - positions[i][0] < MIN_TIME_INTERVAL:
-            i += 1
+        i = history.lookback_index(MIN_TIME_INTERVAL)
         # use those two points as reference for calculation
-        time1, pos1 = positions[i]
-        time2, pos2 = positions[0]
+        times = history.times(i + 1)
+        positions = history.positions(i + 1)
+        time1, pos1 = times[i], positions[i]
+        time2, pos2 = times[0], positions[0]
         delta_pos = pos2 - pos1
         delta_time = time2 - time1
         midpoint_velocity = delta_pos / delta_time
@@ -181,31 +288,23 @@ class Analysis(object):
         # print("after adjust: {}".format(velocity_now))
         return velocity_now
 
+    def get_ball_trajectory(self):
+        """
+        BallTrajectory of the ball from its current position and velocity,
+        if nothing touches it. Treat as read only.
+        """
+        return self.memoize('ball_trajectory', self._ball_trajectory)
+
+    def _ball_trajectory(self):
+        return BallTrajectory(self.get_ball_position(),
+                              self.get_ball_velocity(),
+                              self.BALL_DECCELERATION)
+
     def predict_ball_pos(self, delta_time):
-        velocity_initial = self.get_ball_velocity()
-        # print(f"{velocity_initial}")
-        if not velocity_initial.any():
-            return (self.get_ball_position())
-        accel_direction = -velocity_initial / np.linalg.norm(velocity_initial)
-        accel = accel_direction * self.BALL_DECCELERATION
-        # truncate if we're going past the time where the ball would stop
-        velocity_final = accel * delta_time + velocity_initial
-        if ((velocity_initial * velocity_final) < 0).any():
-            assert(((velocity_initial * velocity_final) <= 0).all())
-            # We need to use two cases here because one coordinate of initial
-            # velocity can be zero which
-            # would cause us to divide by zero if we use that axis.
-            if not accel[0] == 0:
-                time_to_stop = -1 * velocity_initial[0] / accel[0]
-            else:
-                time_to_stop = -1 * velocity_initial[1] / accel[1]
-            # print("dt: {} TTS: {}".format(delta_time, time_to_stop))
-            delta_time = time_to_stop
-        predicted_pos_change = \
-            0.5 * accel * delta_time ** 2 + velocity_initial * delta_time
-        # print("dt: {} PPC: {}".format(delta_time, predicted_pos_change))
-        predicted_pos = predicted_pos_change + self.get_ball_position()
-        return predicted_pos
+        """
+        where the ball will be in delta_time seconds, if nothing touches it
+        """
+        return self.get_ball_trajectory().positions_at(delta_time)
 
     def is_ball_in_play(self):
         '''
@@ -235,7 +334,7 @@ class Analysis(object):
         start_ball_pos = self.get_ball_position()
         start_x = start_ball_pos[0]
         start_y = start_ball_pos[1]
-        final_ball_pos = self.predict_ball_pos(10)
+        final_ball_pos = self.get_ball_trajectory().positions_at(10)
         final_x = final_ball_pos[0]
         final_y = final_ball_pos[1]
         defense_goal = self.get_defense_goal(team)
@@ -255,9 +354,6 @@ class Analysis(object):
 
     def is_ball_behind_goalie(self, team):
         ball_pos = self.get_ball_position()
-        goal_posts_pos = self.get_defense_goal(team)
-        center_of_goal = np.array(
-            [goal_posts_pos[0][0],
-             (goal_posts_pos[0][1] + goal_posts_pos[1][1]) / 2])
+        center_of_goal = self.get_defense_goal_center(team)
         ball_dist_from_goal_center = np.linalg.norm(ball_pos - center_of_goal)
         return ball_dist_from_goal_center <= 600
@@ -2,48 +2,124 @@
 import numpy as np
 from refbox import SSL_Referee  # pylint: disable=import-error
 
+try:
+    from legality_grid import LegalityGrid, DEFAULT_RESOLUTION
+    from field_geometry import FieldGeometry, DIVISION_DIMENSIONS, \
+        DEFAULT_DIVISION
+except (SystemError, ImportError):
+    from .legality_grid import LegalityGrid, DEFAULT_RESOLUTION
+    from .field_geometry import FieldGeometry, DIVISION_DIMENSIONS, \
+        DEFAULT_DIVISION
+
+_DEFAULT_DIMENSIONS = DIVISION_DIMENSIONS[DEFAULT_DIVISION]
+
 
 class Field(object):
     """
     Part of the Gamestate class we've separated out for readability
     """
     # FIELD + ROBOT DIMENSIONS (mm)
+    # (defaults for our division, see set_division to play in another one)
+    DIVISION = DEFAULT_DIVISION
     FIELD_SCALE = 1  # useful if using a miniature field
-    FIELD_X_LENGTH = 9000 * FIELD_SCALE
-    FIELD_Y_LENGTH = 6000 * FIELD_SCALE
+    FIELD_X_LENGTH = _DEFAULT_DIMENSIONS['field_x_length'] * FIELD_SCALE
+    FIELD_Y_LENGTH = _DEFAULT_DIMENSIONS['field_y_length'] * FIELD_SCALE
     FIELD_MIN_X = -FIELD_X_LENGTH / 2
     FIELD_MAX_X = FIELD_X_LENGTH / 2
     FIELD_MIN_Y = -FIELD_Y_LENGTH / 2
     FIELD_MAX_Y = FIELD_Y_LENGTH / 2
-    CENTER_CIRCLE_RADIUS = 495 * FIELD_SCALE
-    GOAL_WIDTH = 1000 * FIELD_SCALE
-    DEFENSE_AREA_X_LENGTH = 1000 * FIELD_SCALE
-    DEFENSE_AREA_Y_LENGTH = 2000 * FIELD_SCALE
+    CENTER_CIRCLE_RADIUS = \
+        _DEFAULT_DIMENSIONS['center_circle_radius'] * FIELD_SCALE
+    GOAL_WIDTH = _DEFAULT_DIMENSIONS['goal_width'] * FIELD_SCALE
+    DEFENSE_AREA_X_LENGTH = \
+        _DEFAULT_DIMENSIONS['defense_area_x_length'] * FIELD_SCALE
+    DEFENSE_AREA_Y_LENGTH = \
+        _DEFAULT_DIMENSIONS['defense_area_y_length'] * FIELD_SCALE
+    PENALTY_MARK_DISTANCE = \
+        _DEFAULT_DIMENSIONS['penalty_mark_distance'] * FIELD_SCALE
+    # refbox commands under which legality depends on the ball position
+    # (keep in sync with follows_ball_rules)
+    BALL_DEPENDENT_COMMANDS = (SSL_Referee.STOP,
+                               SSL_Referee.PREPARE_PENALTY_BLUE)
+
+    def set_division(self, division):
+        """
+        Use the field dimensions of an SSL division ('A' or 'B') instead of
+        the defaults. Must be called on every provider's gamestate before
+        the game starts.
+        """
+        dimensions = DIVISION_DIMENSIONS[division]
+        scale = self.FIELD_SCALE
+        self.DIVISION = division
+        self.FIELD_X_LENGTH = dimensions['field_x_length'] * scale
+        self.FIELD_Y_LENGTH = dimensions['field_y_length'] * scale
+        self.FIELD_MIN_X = -self.FIELD_X_LENGTH / 2
+        self.FIELD_MAX_X = self.FIELD_X_LENGTH / 2
+        self.FIELD_MIN_Y = -self.FIELD_Y_LENGTH / 2
+        self.FIELD_MAX_Y = self.FIELD_Y_LENGTH / 2
+        self.CENTER_CIRCLE_RADIUS = dimensions['center_circle_radius'] * scale
+        self.GOAL_WIDTH = dimensions['goal_width'] * scale
+        self.DEFENSE_AREA_X_LENGTH = \
+            dimensions['defense_area_x_length'] * scale
+        self.DEFENSE_AREA_Y_LENGTH = \
+            dimensions['defense_area_y_length'] * scale
+        self.PENALTY_MARK_DISTANCE = \
+            dimensions['penalty_mark_distance'] * scale
+        # everything derived from the old dimensions is out of date
+        self._field_geometry = None
+        self._legality_grids = dict()
+        self._occupancy_grids = dict()
+        self.mark_world_changed()
+
+    def get_field_geometry(self):
+        """
+        Returns the FieldGeometry for the current field dimensions and side
+        assignment, which is only rebuilt when the teams switch sides.
+        Treat as read only.
+        """
+        blue_side_left = self.is_blue_defense_side_left()
+        geometry = self._field_geometry
+        if geometry is None or \
+                geometry.is_blue_defense_side_left != blue_side_left:
+            dimensions = {
+                'field_x_length': self.FIELD_X_LENGTH,
+                'field_y_length': self.FIELD_Y_LENGTH,
+                'center_circle_radius': self.CENTER_CIRCLE_RADIUS,
+                'goal_width': self.GOAL_WIDTH,
+                'defense_area_x_length': self.DEFENSE_AREA_X_LENGTH,
+                'defense_area_y_length': self.DEFENSE_AREA_Y_LENGTH,
+                'penalty_mark_distance': self.PENALTY_MARK_DISTANCE,
+            }
+            geometry = FieldGeometry(dimensions, blue_side_left)
+            self._field_geometry = geometry
+        return geometry
 
     def defense_area_corner(self, team):
         """
         returns bottom left corner of defense area
         """
-        if team == "blue" and self.is_blue_defense_side_left() or \
-           team == "yellow" and not self.is_blue_defense_side_left():
-            min_x = self.FIELD_MIN_X
-        else:
-            min_x = self.FIELD_MAX_X - self.DEFENSE_AREA_X_LENGTH
-        min_y = -self.DEFENSE_AREA_Y_LENGTH / 2
-        return np.array([min_x, min_y])
+        return self.get_field_geometry().defense_area_corners[team]
 
     def is_in_defense_area(self, pos, team):
-        min_x, min_y = self.defense_area_corner(team)
+        (min_x, min_y), (max_x, max_y) = \
+            self.get_field_geometry().defense_area_boxes[team]
         # account for buffer of robot radius
         radius = self.ROBOT_RADIUS
-        # defense area is a box centered at y = 0
-        dx_min, dy_min = min_x - radius, min_y - radius
-        dx_max = min_x + self.DEFENSE_AREA_X_LENGTH + radius
-        dy_max = min_y + self.DEFENSE_AREA_Y_LENGTH + radius
-        in_x = dx_min <= pos[0] <= dx_max
-        in_y = dy_min <= pos[1] <= dy_max
+        in_x = min_x - radius <= pos[0] <= max_x + radius
+        in_y = min_y - radius <= pos[1] <= max_y + radius
         return in_x and in_y
 
+    def is_in_defense_area_batch(self, points, team):
+        """
+        is_in_defense_area for each row of an (N, 2+) array of points
+        """
+        points = _as_points(points)
+        min_corner, max_corner = \
+            self.get_field_geometry().defense_area_boxes[team]
+        min_corner = min_corner - self.ROBOT_RADIUS
+        max_corner = max_corner + self.ROBOT_RADIUS
+        return ((points >= min_corner) & (points <= max_corner)).all(axis=1)
+
     def is_in_field(self, pos):
         return ((self.FIELD_MIN_X <= pos[0] <= self.FIELD_MAX_X) and
                 (self.FIELD_MIN_Y <= pos[1] <= self.FIELD_MAX_Y))
@@ -52,14 +128,29 @@ class Field(object):
         # TODO: account for robot radius
         # TODO: during free kicks must be away from opponent area
         # + ALL OTHER RULES
-        latest_refbox_message = self.get_latest_refbox_message()
+        if not self.follows_ball_rules(pos, team, robot_id):
+            return False
+        in_d_area = self.is_in_defense_area(pos, team)
+        ot = self.other_team(team)
+        in_own_defense_area = in_d_area and not self.is_goalie(team, robot_id)
+        in_other_defense_area = self.is_in_defense_area(pos, ot)
+        return (self.is_in_field(pos) and
+                not in_own_defense_area and
+                not in_other_defense_area)
+
+    def follows_ball_rules(self, pos, team, robot_id):
+        """
+        Whether a position keeps away from the ball as far as the current
+        refbox command asks (always True under other commands)
+        """
+        command = self.get_refbox_command()
         # TODO: Also avoid ball during other team ball placement,
         # defend free kick, etc.
-        if latest_refbox_message.command == SSL_Referee.STOP:
+        if command == SSL_Referee.STOP:
             dist = np.linalg.norm(pos[:2] - self.get_ball_position())
             if dist <= 500 + self.ROBOT_RADIUS:
                 return False
-        if latest_refbox_message.command == SSL_Referee.PREPARE_PENALTY_BLUE:
+        if command == SSL_Referee.PREPARE_PENALTY_BLUE:
             penalty_range = 1000
             if self.is_goalie(team, robot_id):
                 pass
@@ -71,13 +162,107 @@ class Field(object):
                 ball_x, _ = self.get_ball_position()
                 if pos[0] > ball_x - penalty_range:
                     return False
-        in_d_area = self.is_in_defense_area(pos, team)
-        ot = self.other_team(team)
-        in_own_defense_area = in_d_area and not self.is_goalie(team, robot_id)
-        in_other_defense_area = self.is_in_defense_area(pos, ot)
-        return (self.is_in_field(pos) and
-                not in_own_defense_area and
-                not in_other_defense_area)
+        return True
+
+    def is_in_field_batch(self, points):
+        """
+        is_in_field for each row of an (N, 2+) array of points
+        """
+        points = _as_points(points)
+        x, y = points[:, 0], points[:, 1]
+        return ((self.FIELD_MIN_X <= x) & (x <= self.FIELD_MAX_X) &
+                (self.FIELD_MIN_Y <= y) & (y <= self.FIELD_MAX_Y))
+
+    def is_pos_legal_batch(self, points, team, robot_id):
+        """
+        is_pos_legal for each row of an (N, 2+) array of points,
+        as a boolean mask
+        """
+        points = _as_points(points)
+        return self.is_in_legal_area_batch(points, team, robot_id) & \
+            self.follows_ball_rules_batch(points, team, robot_id)
+
+    def is_in_legal_area_batch(self, points, team, robot_id):
+        """
+        The rules of is_pos_legal_batch that don't depend on the ball: in the
+        field and out of the defense areas the robot can't enter
+        """
+        points = _as_points(points)
+        legal = self.is_in_field_batch(points) & \
+            ~self.is_in_defense_area_batch(points, self.other_team(team))
+        if not self.is_goalie(team, robot_id):
+            legal &= ~self.is_in_defense_area_batch(points, team)
+        return legal
+
+    def follows_ball_rules_batch(self, points, team, robot_id):
+        """
+        follows_ball_rules for each row of an (N, 2+) array of points, as a
+        boolean mask
+        """
+        points = _as_points(points)
+        legal = np.ones(len(points), dtype=bool)
+        command = self.get_refbox_command()
+        if command == SSL_Referee.STOP:
+            delta = points - self.get_ball_position()
+            legal &= np.hypot(delta[:, 0], delta[:, 1]) > \
+                500 + self.ROBOT_RADIUS
+        if command == SSL_Referee.PREPARE_PENALTY_BLUE:
+            penalty_range = 1000
+            ball_x, _ = self.get_ball_position()
+            if self.is_blue_defense_side_left():
+                legal &= points[:, 0] >= ball_x + penalty_range
+            else:
+                legal &= points[:, 0] <= ball_x - penalty_range
+        return legal
+
+    def first_illegal_distance(self, segments, team, robot_id):
+        """
+        Distance along each of the collision.Segments at which the robot
+        would first break the rules of is_pos_legal, or inf if the whole
+        segment is legal. The rules are solved for exactly instead of
+        checked point by point.
+        """
+        contacts = segments.box_exits((self.FIELD_MIN_X, self.FIELD_MIN_Y),
+                                      (self.FIELD_MAX_X, self.FIELD_MAX_Y))
+        boxes = self.get_field_geometry().defense_area_boxes
+        areas = [boxes[self.other_team(team)]]
+        if not self.is_goalie(team, robot_id):
+            areas.append(boxes[team])
+        box_min, box_max = np.swapaxes(areas, 0, 1)
+        np.minimum(contacts, segments.box_contacts(
+            box_min - self.ROBOT_RADIUS,
+            box_max + self.ROBOT_RADIUS).min(axis=1), out=contacts)
+        command = self.get_refbox_command()
+        if command == SSL_Referee.STOP:
+            np.minimum(contacts, segments.circle_contacts(
+                self.get_ball_position(),
+                500 + self.ROBOT_RADIUS)[:, 0], out=contacts)
+        if command == SSL_Referee.PREPARE_PENALTY_BLUE:
+            penalty_range = 1000
+            ball_x, _ = self.get_ball_position()
+            if self.is_blue_defense_side_left():
+                legal_min, legal_max = ball_x + penalty_range, np.inf
+            else:
+                legal_min, legal_max = -np.inf, ball_x - penalty_range
+            np.minimum(contacts, segments.box_exits(
+                (legal_min, -np.inf), (legal_max, np.inf)), out=contacts)
+        return contacts
+
+    def get_legality_grid(self, team, robot_id,
+                          resolution=DEFAULT_RESOLUTION):
+        """
+        Returns a LegalityGrid of where the robot can legally be, which is
+        only rebuilt when the side assignment changes (the rules about the
+        ball are checked when looking positions up).
+        """
+        key = LegalityGrid.rules_key(self, team, robot_id, resolution)
+        # grids only differ between teams and goalie vs. other robots
+        cache_key = key[:2] + (resolution,)
+        grid = self._legality_grids.get(cache_key)
+        if grid is None or grid.key != key:
+            grid = LegalityGrid(self, team, robot_id, resolution)
+            self._legality_grids[cache_key] = grid
+        return grid
 
     def random_position(self):
         """
@@ -92,19 +277,29 @@ class Field(object):
 
     # returns the top and bottom goalposts for a team
     def get_defense_goal(self, team):
-        if (self.is_blue_defense_side_left() and team == 'blue') or \
-           (not self.is_blue_defense_side_left() and team == 'yellow'):
-            top_post = np.array([self.FIELD_MIN_X, self.GOAL_WIDTH/2])
-            bottom_post = np.array([self.FIELD_MIN_X, -self.GOAL_WIDTH/2])
-            return (top_post, bottom_post)
-        else:
-            top_post = np.array([self.FIELD_MAX_X, self.GOAL_WIDTH/2])
-            bottom_post = np.array([self.FIELD_MAX_X, -self.GOAL_WIDTH/2])
-            return (top_post, bottom_post)
+        return self.get_field_geometry().defense_goals[team]
 
     def get_attack_goal(self, team):
-        if team == 'yellow':
-            return self.get_defense_goal('blue')
-        else:
-            assert team == 'blue'
-            return self.get_defense_goal('yellow')
+        assert team in ('blue', 'yellow')
+        return self.get_defense_goal(self.other_team(team))
+
+    def get_defense_goal_center(self, team):
+        return self.get_field_geometry().defense_goal_centers[team]
+
+    def get_attack_goal_center(self, team):
+        return self.get_defense_goal_center(self.other_team(team))
+
+    def get_penalty_mark(self, team):
+        """
+        returns where the ball is placed for a penalty on the team's goal
+        """
+        return self.get_field_geometry().penalty_marks[team]
+
+
+def _as_points(points):
+    """(N, 2) float array of the x, y columns of an (N, 2+) array"""
+    points = np.asarray(points, dtype=float)
+    if points.ndim != 2:
+        # (an empty list of points)
+        points = points.reshape(-1, 2)
+    return points[:, :2]
@@ -0,0 +1,242 @@
+"""
+Rasterized legality of robot positions, for fast repeated lookups.
+
+The field bounds and defense areas only change with the side assignment,
+but planners check them for thousands of points per tick. A LegalityGrid
+evaluates them once for the center of every cell of a fine grid over the
+field, so that each lookup is an array index. Lookups are only exact to
+within a cell of the borders of those regions. The rules about the ball
+(e.g. keeping away from it during a stoppage) move with it, so they are
+solved for exactly at each lookup instead of being rasterized. A coarse
+grid can also give how far points are from the nearest illegal position,
+from a distance transform of the whole grid (see distance_transform).
+"""
+import math
+import numpy as np
+
+DEFAULT_RESOLUTION = 20  # mm
+
+
+class FieldGrid(object):
+    """
+    Square cells of resolution (mm) covering a rectangle, indexed [x, y]
+    from the (min_x, min_y) corner.
+    """
+    def __init__(self, min_x, max_x, min_y, max_y, resolution):
+        self.min_x = min_x
+        self.min_y = min_y
+        self.resolution = resolution
+        self.shape = (int(math.ceil((max_x - min_x) / resolution)),
+                      int(math.ceil((max_y - min_y) / resolution)))
+
+    def cell_centers(self):
+        """(nx * ny, 2) array of cell centers, ordered like a flattened grid"""
+        xs = self.min_x + (np.arange(self.shape[0]) + .5) * self.resolution
+        ys = self.min_y + (np.arange(self.shape[1]) + .5) * self.resolution
+        grid_x, grid_y = np.meshgrid(xs, ys, indexing='ij')
+        return np.stack((grid_x.ravel(), grid_y.ravel()), axis=1)
+
+    def cell_index(self, pos):
+        """(x index, y index) of the cell containing pos, or None if outside"""
+        i = int((pos[0] - self.min_x) // self.resolution)
+        j = int((pos[1] - self.min_y) // self.resolution)
+        if 0 <= i < self.shape[0] and 0 <= j < self.shape[1]:
+            return i, j
+        return None
+
+    def cell_indices(self, points):
+        """
+        x indices, y indices and an inside mask for each row of an (N, 2+)
+        array of points (indices of points outside the grid are clipped)
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2:
+            # (an empty list of points)
+            points = points.reshape(-1, 2)
+        i = np.floor((points[:, 0] - self.min_x) / self.resolution)
+        j = np.floor((points[:, 1] - self.min_y) / self.resolution)
+        inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & \
+            (j < self.shape[1])
+        i = np.clip(i, 0, self.shape[0] - 1).astype(int)
+        j = np.clip(j, 0, self.shape[1] - 1).astype(int)
+        return i, j, inside
+
+    def bilinear_weights(self, points):
+        """
+        Flat indices of the 4 cells whose centers surround each row of an
+        (N, 2+) array of points, and the weight of each for bilinear
+        interpolation, as (N, 4) arrays. Points beyond the outer cell
+        centers get the values of the nearest ones.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2:
+            # (an empty list of points)
+            points = points.reshape(-1, 2)
+        u = (points[:, 0] - self.min_x) / self.resolution - .5
+        v = (points[:, 1] - self.min_y) / self.resolution - .5
+        i = np.clip(np.floor(u), 0, max(self.shape[0] - 2, 0))
+        j = np.clip(np.floor(v), 0, max(self.shape[1] - 2, 0))
+        s = np.clip(u - i, 0, 1)[:, np.newaxis]
+        t = np.clip(v - j, 0, 1)[:, np.newaxis]
+        corner = (i * self.shape[1] + j).astype(int)[:, np.newaxis]
+        indices = corner + [0, 1, self.shape[1], self.shape[1] + 1]
+        weights = np.hstack(((1 - s) * (1 - t), (1 - s) * t,
+                             s * (1 - t), s * t))
+        return indices, weights
+
+    def interpolate(self, values, points):
+        """
+        Bilinear interpolation of an array of values at the cell centers
+        (shaped like the grid) at each row of an (N, 2+) array of points
+        """
+        indices, weights = self.bilinear_weights(points)
+        return (values.ravel()[indices] * weights).sum(axis=1)
+
+
+def distance_transform(blocked, resolution=1, return_indices=False):
+    """
+    Euclidean distance from the center of each cell of a 2d boolean array
+    to the center of the nearest True cell (0 for those, inf if there are
+    none), in units of resolution. With return_indices, also returns the
+    x and y indices of that nearest cell for each cell.
+
+    Exact, in two separable passes (Felzenszwalb and Huttenlocher): the
+    nearest True cell along each column, then for each row the lower
+    envelope of the parabolas (x - i)^2 + (column distance at i)^2. Both are
+    linear in the cells, apart from a binary search of each row's envelope
+    that keeps the second pass vectorized.
+    """
+    blocked = np.asarray(blocked, dtype=bool)
+    nx, ny = blocked.shape
+    if not blocked.any():
+        distances = np.full(blocked.shape, np.inf)
+        if return_indices:
+            return distances, np.zeros(blocked.shape, dtype=int), \
+                np.zeros(blocked.shape, dtype=int)
+        return distances
+    # nearest True cell with the same x index
+    j = np.arange(ny, dtype=float)
+    previous = np.maximum.accumulate(
+        np.where(blocked, j, -np.inf), axis=1)
+    following = np.minimum.accumulate(
+        np.where(blocked, j, np.inf)[:, ::-1], axis=1)[:, ::-1]
+    nearest_j = np.where(j - previous <= following - j, previous, following)
+    along = np.abs(j - nearest_j)
+    nearest_j = np.where(np.isfinite(along), nearest_j, 0).astype(int)
+    # then the x index of the best column for each cell
+    squared, nearest_i = _lower_envelope(along ** 2)
+    distances = np.sqrt(squared) * resolution
+    if return_indices:
+        return distances, nearest_i, nearest_j[nearest_i, np.arange(ny)]
+    return distances
+
+
+def _lower_envelope(f):
+    """
+    For each column of an (n, m) array f of squared distances (inf where
+    there is nothing), the minimum over i of (x - i)^2 + f[i] at every x,
+    and the i it is reached at, as two (n, m) arrays. At least one
+    column must have something.
+    """
+    n, m = f.shape
+    lanes = np.arange(m)
+    # the parabolas on each column's envelope, and where each one starts
+    parabolas = np.zeros((n, m), dtype=int)
+    starts = np.full((n + 1, m), np.inf)
+    top = np.full(m, -1)
+    crossing = np.empty(m)
+    finite = np.isfinite(f)
+    for i in np.flatnonzero(finite.any(axis=1)):
+        adding = np.flatnonzero(finite[i])
+        # drop the parabolas the new one is below from where they start
+        active = adding[top[adding] >= 0]
+        while len(active):
+            last = parabolas[top[active], active]
+            crossing[active] = ((f[i, active] + i * i) -
+                                (f[last, active] + last * last)) / \
+                (2. * (i - last))
+            active = active[crossing[active] <= starts[top[active], active]]
+            top[active] -= 1
+            active = active[top[active] >= 0]
+        top[adding] += 1
+        parabolas[top[adding], adding] = i
+        starts[top[adding], adding] = np.where(
+            top[adding] == 0, -np.inf, crossing[adding])
+        starts[top[adding] + 1, adding] = np.inf
+    # the parabola of each x is the last one starting at or before it,
+    # searching every column's starts laid end to end
+    size = top.max() + 1
+    offsets = lanes * (n + 2)
+    starts = np.where(np.arange(size)[:, np.newaxis] <= top, starts[:size],
+                      np.inf)
+    starts = np.clip(starts, -1, n) + offsets
+    x = np.arange(n)[:, np.newaxis]
+    index = np.searchsorted(starts.T.ravel(), x + offsets, side='right') - 1
+    nearest = parabolas[index - lanes * size, lanes]
+    return (x - nearest) ** 2 + f[nearest, lanes], nearest
+
+
+class LegalityGrid(FieldGrid):
+    """
+    Whether the center of each cell is a legal position for a robot, as far
+    as the rules that don't depend on the ball go. Covers the field plus a
+    cell on each side, everything further out is illegal. Lookups also
+    apply the gamestate's current rules about the ball.
+    """
+    def __init__(self, gs, team, robot_id, resolution=DEFAULT_RESOLUTION):
+        super().__init__(gs.FIELD_MIN_X - resolution,
+                         gs.FIELD_MAX_X + resolution,
+                         gs.FIELD_MIN_Y - resolution,
+                         gs.FIELD_MAX_Y + resolution, resolution)
+        self.key = self.rules_key(gs, team, robot_id, resolution)
+        self.mask = gs.is_in_legal_area_batch(
+            self.cell_centers(), team, robot_id).reshape(self.shape)
+        self.mask.flags.writeable = False
+        self._distances = None
+        self._gs = gs
+        self._team = team
+        self._robot_id = robot_id
+
+    @staticmethod
+    def rules_key(gs, team, robot_id, resolution=DEFAULT_RESOLUTION):
+        """
+        Everything the rasterized rules depend on, besides the position.
+        The grid needs to be rebuilt when this changes.
+        """
+        return (team, gs.is_goalie(team, robot_id),
+                gs.is_blue_defense_side_left(), resolution)
+
+    def is_legal(self, pos):
+        """Whether an [x, y(, w)] position is legal"""
+        index = self.cell_index(pos)
+        return index is not None and bool(self.mask[index]) and \
+            self._gs.follows_ball_rules(pos, self._team, self._robot_id)
+
+    def are_legal(self, points):
+        """Boolean mask of which rows of an (N, 2+) array are legal"""
+        i, j, inside = self.cell_indices(points)
+        legal = self.mask[i, j] & inside
+        if self._gs.get_refbox_command() in self._gs.BALL_DEPENDENT_COMMANDS:
+            legal &= self._gs.follows_ball_rules_batch(
+                points, self._team, self._robot_id)
+        return legal
+
+    def distances(self):
+        """
+        Distance from the center of each cell to the nearest illegal cell
+        center (0 for illegal cells), worked out on first use, as far as
+        the rules that don't depend on the ball go. Cells past the field
+        are illegal, so it is always finite. Use a coarse grid (see
+        GameState.get_legality_grid), since this is computed per cell.
+        """
+        if self._distances is None:
+            self._distances = distance_transform(~self.mask, self.resolution)
+            self._distances.flags.writeable = False
+        return self._distances
+
+    def boundary_distances(self, points):
+        """
+        Interpolated distance from each row of an (N, 2+) array of points
+        to where the rules that don't depend on the ball stop the robot
+        """
+        return self.interpolate(self.distances(), points)
@@ -0,0 +1,195 @@
+"""
+Coarse raster of where a robot center can go, for grid path planning.
+
+A cell is blocked when any of it is illegal (see LegalityGrid) or its
+center is within a clearance of another robot. The grid only depends on
+the legality rules, which cell the ball is in (while the rules depend on
+it) and which cell each robot is in, so it is built once for all the
+robots of a team and kept until one of those changes (see
+GameState.get_occupancy_grid). When it does change, the new grid is built
+from the old one: the legal cells are kept while the rules are the same,
+and only the robots that moved to another cell are rasterized again. Each
+robot takes itself back out of the raster when planning, and only has to
+stay clear of robot contact (rather than the full clearance) around its own
+start and goal, so that a robot which is already close to another one can
+still get away from it.
+"""
+import math
+import numpy as np
+
+try:
+    from legality_grid import FieldGrid, LegalityGrid
+except (SystemError, ImportError):
+    from .legality_grid import FieldGrid, LegalityGrid
+
+PLANNER_RESOLUTION = 100  # mm
+
+
+class OccupancyGrid(FieldGrid):
+    """
+    Robots within clearance (and within contact) of the center of each cell
+    of the field, for one team's planning. Robots are taken to be at the
+    center of their cell.
+
+    Attributes:
+        key: map_key the grid was built for
+        legal: (nx, ny) boolean array of legal cells (all of them if the
+            grid allows illegal positions)
+        counts: (nx, ny) number of robots within clearance of each cell
+        contacts: (nx, ny) number of robots within contact of each cell
+    """
+    def __init__(self, gs, team, robot_id, clearance, allow_illegal=False,
+                 resolution=PLANNER_RESOLUTION, previous=None):
+        """
+        Args:
+            previous: An earlier grid with the same team, goalie, clearance,
+                allow_illegal and resolution, to reuse the parts of that
+                haven't changed
+        """
+        super().__init__(gs.FIELD_MIN_X, gs.FIELD_MAX_X,
+                         gs.FIELD_MIN_Y, gs.FIELD_MAX_Y, resolution)
+        self.key = self.map_key(gs, team, robot_id, clearance, allow_illegal,
+                                resolution)
+        self.clearance = clearance
+        # (robots can be up to half a cell diagonal from where they're put)
+        self.contact = gs.ROBOT_RADIUS * 2 + resolution / math.sqrt(2)
+        if previous is not None and previous.key[0] == self.key[0]:
+            self.legal = previous.legal
+        else:
+            self.legal = self._legal_cells(gs, team, robot_id, allow_illegal)
+        self._rasterize_robots(previous)
+        for array in (self.legal, self.counts, self.contacts):
+            array.flags.writeable = False
+
+    def _legal_cells(self, gs, team, robot_id, allow_illegal):
+        """(nx, ny) boolean array of the cells that are legal all over"""
+        legal = np.ones(self.shape, dtype=bool)
+        if not allow_illegal:
+            # paths cross the whole of a cell, so its center and corners
+            # all need to be legal
+            legal &= gs.is_pos_legal_batch(
+                self.cell_centers(), team, robot_id).reshape(self.shape)
+            corners = self.cell_corners()
+            corners_legal = gs.is_pos_legal_batch(
+                corners, team, robot_id).reshape(np.add(self.shape, 1))
+            legal &= corners_legal[:-1, :-1] & corners_legal[1:, :-1] \
+                & corners_legal[:-1, 1:] & corners_legal[1:, 1:]
+        return legal
+
+    def _rasterize_robots(self, previous=None):
+        """
+        Count the robots within clearance and contact of each cell, starting
+        from the counts of the previous grid if there is one, so that only
+        the robots that came, left or moved to another cell are redone.
+        """
+        # (team, robot_id): cell the robot was put in
+        self._cells = dict(zip(self.key[1], self.key[2]))
+        if previous is None:
+            previous_cells = dict()
+            self.counts = np.zeros(self.shape, dtype=int)
+            self.contacts = np.zeros(self.shape, dtype=int)
+            # (team, robot_id): flat indices of the cells it blocks
+            self._discs = dict()
+            self._contact_discs = dict()
+        else:
+            previous_cells = previous._cells
+            self.counts = previous.counts.copy()
+            self.contacts = previous.contacts.copy()
+            self._discs = dict(previous._discs)
+            self._contact_discs = dict(previous._contact_discs)
+        for key, cell in previous_cells.items():
+            if self._cells.get(key) != cell:
+                self.counts.flat[self._discs.pop(key)] -= 1
+                self.contacts.flat[self._contact_discs.pop(key)] -= 1
+        for key, cell in self._cells.items():
+            if previous_cells.get(key) == cell:
+                continue
+            pos = (np.array([self.min_x, self.min_y]) +
+                   (np.array(cell) + .5) * self.resolution)
+            self._discs[key] = self.disc(pos, self.clearance)
+            self._contact_discs[key] = self.disc(pos, self.contact)
+            self.counts.flat[self._discs[key]] += 1
+            self.contacts.flat[self._contact_discs[key]] += 1
+
+    @staticmethod
+    def map_key(gs, team, robot_id, clearance, allow_illegal=False,
+                resolution=PLANNER_RESOLUTION):
+        """
+        Everything the grid depends on, as (the legality rules with the cell
+        of the ball if they depend on it, robot keys, the cell of each
+        robot). The grid needs rebuilding when it changes.
+        """
+        origin = (gs.FIELD_MIN_X, gs.FIELD_MIN_Y)
+        rules = None
+        if not allow_illegal:
+            command = gs.get_refbox_command()
+            ball_cell = None
+            if command in gs.BALL_DEPENDENT_COMMANDS:
+                ball = np.floor(
+                    (gs.get_ball_position() - origin) / resolution)
+                ball_cell = tuple(ball.astype(int).tolist())
+            rules = LegalityGrid.rules_key(gs, team, robot_id, resolution) \
+                + (command, ball_cell)
+        snapshot = gs.get_world_snapshot()
+        cells = np.floor((snapshot.positions - origin) / resolution)
+        return ((rules, team, gs.is_goalie(team, robot_id), clearance,
+                 resolution), snapshot.keys,
+                tuple(map(tuple, cells.astype(int).tolist())))
+
+    def cell_corners(self):
+        """((nx + 1) * (ny + 1), 2) array of the corners of the cells"""
+        xs = self.min_x + np.arange(self.shape[0] + 1) * self.resolution
+        ys = self.min_y + np.arange(self.shape[1] + 1) * self.resolution
+        grid_x, grid_y = np.meshgrid(xs, ys, indexing='ij')
+        return np.stack((grid_x.ravel(), grid_y.ravel()), axis=1)
+
+    def snap(self, points):
+        """Centers of the cells containing each row of an (N, 2+) array"""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        origin = (self.min_x, self.min_y)
+        cells = np.floor((points - origin) / self.resolution)
+        return origin + (cells + .5) * self.resolution
+
+    def disc(self, pos, radius):
+        """Flat indices of the cells centered within radius of pos"""
+        i_min = max(int(math.ceil(
+            (pos[0] - radius - self.min_x) / self.resolution - .5)), 0)
+        i_max = min(int(math.floor(
+            (pos[0] + radius - self.min_x) / self.resolution - .5)),
+            self.shape[0] - 1)
+        j_min = max(int(math.ceil(
+            (pos[1] - radius - self.min_y) / self.resolution - .5)), 0)
+        j_max = min(int(math.floor(
+            (pos[1] + radius - self.min_y) / self.resolution - .5)),
+            self.shape[1] - 1)
+        if i_min > i_max or j_min > j_max:
+            return np.empty(0, dtype=int)
+        i, j = np.meshgrid(np.arange(i_min, i_max + 1),
+                           np.arange(j_min, j_max + 1), indexing='ij')
+        x = self.min_x + (i + .5) * self.resolution
+        y = self.min_y + (j + .5) * self.resolution
+        inside = np.hypot(x - pos[0], y - pos[1]) <= radius
+        return (i * self.shape[1] + j)[inside]
+
+    def blocked_for(self, team, robot_id, start, goal):
+        """
+        Flat boolean array of the cells the robot can't plan through from
+        the cell of start to the cell of goal, without the robot itself.
+        Within clearance of the start and goal only robot contact counts,
+        and their cells are always open.
+        """
+        counts = self.counts.ravel().copy()
+        contacts = self.contacts.ravel().copy()
+        own = (team, robot_id)
+        if own in self._discs:
+            counts[self._discs[own]] -= 1
+            contacts[self._contact_discs[own]] -= 1
+        legal = self.legal.ravel()
+        blocked = (counts > 0) | ~legal
+        ends = self.snap([start[:2], goal[:2]])
+        for pos in ends:
+            near = self.disc(pos, self.clearance)
+            blocked[near] = (contacts[near] > 0) | ~legal[near]
+        i, j, inside = self.cell_indices(ends)
+        blocked[(i * self.shape[1] + j)[inside]] = False
+        return blocked
@@ -0,0 +1,93 @@
+"""
+Fixed size history of timestamped positions for the ball and each robot.
+"""
+import numpy as np
+
+
+class PositionHistory(object):
+    """
+    The most recent timestamped positions of one object, most recent first.
+    Stored as preallocated ring buffers of timestamps and of position rows
+    (x, y) or (x, y, w), so appending doesn't allocate and windows of the
+    history can be read as arrays.
+    """
+    def __init__(self, capacity, dims):
+        self._times = np.zeros(capacity)
+        self._positions = np.zeros((capacity, dims))
+        # index of the most recent entry, older entries follow it
+        self._start = 0
+        self._length = 0
+
+    @classmethod
+    def from_arrays(cls, capacity, times, positions):
+        """
+        Creates a history from arrays of timestamps and positions, most
+        recent first (as returned by times() and positions()).
+        """
+        history = cls(capacity, positions.shape[1])
+        n = min(len(times), capacity)
+        history._times[:n] = times[:n]
+        history._positions[:n] = positions[:n]
+        history._length = n
+        return history
+
+    def __len__(self):
+        return self._length
+
+    def capacity(self):
+        return len(self._times)
+
+    def append(self, timestamp, pos):
+        """
+        Adds a position as the most recent one, dropping the oldest one if
+        the history is full.
+        """
+        self._start = (self._start - 1) % len(self._times)
+        self._times[self._start] = timestamp
+        self._positions[self._start] = pos
+        self._length = min(self._length + 1, len(self._times))
+
+    def clear(self):
+        self._start = 0
+        self._length = 0
+
+    def latest_time(self):
+        assert(self._length > 0)
+        return self._times[self._start]
+
+    def latest_position(self):
+        assert(self._length > 0)
+        return self._positions[self._start].copy()
+
+    def _indices(self, n):
+        if n is None or n > self._length:
+            n = self._length
+        return (self._start + np.arange(n)) % len(self._times)
+
+    def times(self, n=None):
+        """Returns the n (default all) most recent timestamps"""
+        return self._times[self._indices(n)]
+
+    def positions(self, n=None):
+        """Returns the n (default all) most recent positions, one per row"""
+        return self._positions[self._indices(n)]
+
+    def lookback_index(self, interval):
+        """
+        Returns the index of the most recent entry at least interval seconds
+        older than the latest one, or of the oldest entry if there is none.
+        """
+        times = self.times()
+        older = np.flatnonzero(times[0] - times >= interval)
+        return int(older[0]) if len(older) else self._length - 1
+
+    def __getstate__(self):
+        # only pickle the entries in use, in order
+        return {'capacity': len(self._times),
+                'times': self.times(),
+                'positions': self.positions()}
+
+    def __setstate__(self, state):
+        history = PositionHistory.from_arrays(
+            state['capacity'], state['times'], state['positions'])
+        self.__dict__.update(history.__dict__)
@@ -0,0 +1,88 @@
+"""
+Uniform grid spatial index over robot centers, for radius queries.
+
+Planners check thousands of points per tick for nearby robots, and most of
+those points have no robot anywhere near them. Bucketing the robots by grid
+cell lets those queries return after a few dict lookups, and only measure
+distances to the robots in the cells around the query point.
+"""
+import math
+import numpy as np
+
+# a bit bigger than the usual query radius (two robot radii + a buffer),
+# so most queries only look at the 3x3 cells around the point
+DEFAULT_CELL_SIZE = 500
+
+
+class RobotGrid(object):
+    """
+    Buckets the rows of an (n, 2) array of robot positions by grid cell.
+    Query results are row indices into that array, in increasing order.
+    The positions must not change while the grid is in use.
+    """
+    def __init__(self, positions, cell_size=DEFAULT_CELL_SIZE):
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        self._cells = dict()  # (cell x, cell y): list of rows
+        cells = np.floor(self.positions / cell_size).astype(int)
+        for row, cell in enumerate(map(tuple, cells.tolist())):
+            self._cells.setdefault(cell, []).append(row)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def candidates(self, pos, radius):
+        """
+        Rows in the cells overlapping the square around pos that contains
+        the circle of radius (unsorted, and some may be farther than radius)
+        """
+        x, y = float(pos[0]), float(pos[1])
+        min_x = math.floor((x - radius) / self.cell_size)
+        max_x = math.floor((x + radius) / self.cell_size)
+        min_y = math.floor((y - radius) / self.cell_size)
+        max_y = math.floor((y + radius) / self.cell_size)
+        rows = []
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._cells):
+            # big radius, cheaper to go through the occupied cells
+            for (cell_x, cell_y), cell_rows in self._cells.items():
+                if min_x <= cell_x <= max_x and min_y <= cell_y <= max_y:
+                    rows.extend(cell_rows)
+            return rows
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                rows.extend(self._cells.get((cell_x, cell_y), ()))
+        return rows
+
+    def query_radius(self, pos, radius):
+        """Rows of the robots centered within radius of pos (inclusive)"""
+        rows = self.candidates(pos, radius)
+        if not rows:
+            return np.empty(0, dtype=int)
+        rows = np.array(sorted(rows))
+        delta = self.positions[rows] - np.asarray(pos, dtype=float)[:2]
+        return rows[np.hypot(delta[:, 0], delta[:, 1]) <= radius]
+
+    def query_radius_batch(self, points, radius):
+        """
+        (N, n) boolean mask of which robots are centered within radius of
+        each of N points (inclusive). Robots outside the bounding box of all
+        the points are skipped, and the rest are compared with every point
+        at once, which is faster in numpy than grouping the points by cell
+        for the number of robots on a field.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2:
+            # (an empty list of points)
+            points = points.reshape(-1, 2)
+        points = points[:, :2]
+        mask = np.zeros((len(points), len(self.positions)), dtype=bool)
+        if not len(points) or not len(self.positions):
+            return mask
+        low = points.min(axis=0) - radius
+        high = points.max(axis=0) + radius
+        rows = np.flatnonzero(((self.positions >= low) &
+                               (self.positions <= high)).all(axis=1))
+        if len(rows):
+            delta = points[:, np.newaxis] - self.positions[rows][np.newaxis]
+            mask[:, rows] = np.hypot(delta[..., 0], delta[..., 1]) <= radius
+        return mask
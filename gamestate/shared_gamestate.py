@@ -0,0 +1,318 @@
+"""
+Shared memory mirror of the parts of the GameState that change every tick.
+
+The coordinator writes positions, commands and status into fixed-layout
+numpy buffers that live in shared memory, and every provider copies the
+latest version out of them, instead of pickling the whole GameState through
+each provider's queue. A sequence counter (seqlock) lets readers detect
+when they raced with a write and retry.
+"""
+import time
+import numpy as np
+from multiprocessing.sharedctypes import RawArray
+
+from comms import RobotCommands, RobotStatus  # pylint: disable=import-error
+
+try:
+    from gamestate import BALL_POS_HISTORY_LENGTH, ROBOT_POS_HISTORY_LENGTH
+    from position_history import PositionHistory
+except (SystemError, ImportError):
+    from .gamestate import BALL_POS_HISTORY_LENGTH, ROBOT_POS_HISTORY_LENGTH
+    from .position_history import PositionHistory
+
+TEAMS = ('blue', 'yellow')
+# robot ids are sent in 4 bits to the firmware, so they are always < 16
+MAX_ROBOTS = 16
+# longer waypoint lists keep their first waypoints and the final destination
+# (with a warning, planners can return paths of any length)
+MAX_WAYPOINTS = 32
+
+# GameState fields that are transported through shared memory
+SHARED_FIELDS = (
+    '_ball_position',
+    '_blue_robot_positions',
+    '_yellow_robot_positions',
+    '_blue_robot_commands',
+    '_yellow_robot_commands',
+    '_blue_robot_status',
+    '_yellow_robot_status',
+    '_vision_time',
+)
+
+# Buffer name: (ctypes typecode, shape)
+_LAYOUT = {
+    # incremented before and after every write, so it is odd mid-write
+    'seq': ('q', (1,)),
+    # (frame id, publish time) stamped by the coordinator on every write
+    'frame': ('d', (2,)),
+    # time the positions were received by the vision provider, nan if None
+    'vision_time': ('d', (1,)),
+    'ball_count': ('q', (1,)),
+    # rows of (time, x, y), most recent first
+    'ball': ('d', (BALL_POS_HISTORY_LENGTH, 3)),
+    # number of history rows per robot, 0 if the robot is not in gamestate
+    'robot_count': ('q', (len(TEAMS), MAX_ROBOTS)),
+    # rows of (time, x, y, w), most recent first
+    'robots': ('d', (len(TEAMS), MAX_ROBOTS, ROBOT_POS_HISTORY_LENGTH, 4)),
+    # (has commands, is_dribbling, is_charging, is_kicking, # of waypoints)
+    'command_flags': ('q', (len(TEAMS), MAX_ROBOTS, 5)),
+    # (x, y, w speeds, speed limit, prev waypoint x, y, w - nan if None)
+    'command_values': ('d', (len(TEAMS), MAX_ROBOTS, 7)),
+    'waypoints': ('d', (len(TEAMS), MAX_ROBOTS, MAX_WAYPOINTS, 3)),
+    'status_present': ('q', (len(TEAMS), MAX_ROBOTS)),
+    'charge_level': ('d', (len(TEAMS), MAX_ROBOTS)),
+}
+
+# which buffers each shared field is stored in
+_FIELD_BUFFERS = {
+    '_ball_position': ('ball_count', 'ball'),
+    '_blue_robot_positions': ('robot_count', 'robots'),
+    '_yellow_robot_positions': ('robot_count', 'robots'),
+    '_blue_robot_commands': ('command_flags', 'command_values', 'waypoints'),
+    '_yellow_robot_commands': ('command_flags', 'command_values',
+                               'waypoints'),
+    '_blue_robot_status': ('status_present', 'charge_level'),
+    '_yellow_robot_status': ('status_present', 'charge_level'),
+    '_vision_time': ('vision_time',),
+}
+
+
+def _field_team(field):
+    return TEAMS.index(field.split('_')[1])
+
+
+def _none_to_nan(value):
+    return np.nan if value is None else value
+
+
+def _nan_to_none(value):
+    return None if np.isnan(value) else float(value)
+
+
+class SharedGameState(object):
+    """
+    Fixed-layout shared memory buffers for the SHARED_FIELDS of a GameState.
+    Must be created before the provider processes are started so that they
+    inherit the same memory. Only the coordinator should call write().
+    """
+    def __init__(self, logger=None):
+        """
+        Args:
+            logger: Where write() warns about waypoints it had to drop
+        """
+        self.logger = logger
+        # (team index, robot id) of the robots whose waypoints are truncated
+        self._truncated_robots = set()
+        self._raw = {
+            name: RawArray(typecode, int(np.prod(shape)))
+            for name, (typecode, shape) in _LAYOUT.items()
+        }
+        self._create_views()
+
+    def _create_views(self):
+        self._arrays = {
+            name: np.frombuffer(self._raw[name], dtype=typecode).reshape(
+                _LAYOUT[name][1])
+            for name, (typecode, _) in _LAYOUT.items()
+        }
+
+    def __getstate__(self):
+        # numpy views can't be pickled into shared memory, only the raw arrays
+        # (which multiprocessing allows while starting a process)
+        return {'_raw': self._raw}
+
+    def __setstate__(self, state):
+        self.logger = None
+        self._truncated_robots = set()
+        self._raw = state['_raw']
+        self._create_views()
+
+    def version(self):
+        """Returns the sequence number of the latest completed write"""
+        return int(self._arrays['seq'][0])
+
+    def write(self, gs, fields=SHARED_FIELDS):
+        """
+        Copy the given shared fields of the gamestate into shared memory,
+        along with its frame id and publish time.
+        """
+        seq = self._arrays['seq']
+        seq[0] += 1
+        try:
+            self._arrays['frame'][:] = (
+                gs._frame_id, _none_to_nan(gs._frame_publish_time))
+            for field in fields:
+                if field == '_vision_time':
+                    self._arrays['vision_time'][0] = \
+                        _none_to_nan(gs._vision_time)
+                elif field == '_ball_position':
+                    self._write_ball(gs._ball_position)
+                elif field.endswith('_positions'):
+                    self._write_robots(_field_team(field),
+                                       getattr(gs, field))
+                elif field.endswith('_commands'):
+                    self._write_commands(_field_team(field),
+                                         getattr(gs, field))
+                else:
+                    assert field.endswith('_status')
+                    self._write_status(_field_team(field),
+                                       getattr(gs, field))
+        finally:
+            seq[0] += 1
+
+    def read_into(self, gs, exclude=(), since=None):
+        """
+        Copy the latest shared fields into the gamestate, except for the
+        fields in exclude, along with the frame id and publish time. Skips
+        the copy if nothing was written since the given version.
+        Returns the version that was read.
+        """
+        fields = [f for f in SHARED_FIELDS if f not in exclude]
+        buffers = {'frame'}
+        for field in fields:
+            buffers.update(_FIELD_BUFFERS[field])
+        seq = self._arrays['seq']
+        while True:
+            start = int(seq[0])
+            if start == since:
+                return since
+            if start % 2:
+                # writer is in the middle of an update
+                time.sleep(0)
+                continue
+            copies = {name: self._arrays[name].copy() for name in buffers}
+            if int(seq[0]) == start:
+                break
+        frame_id, publish_time = copies['frame']
+        gs._frame_id = int(frame_id)
+        gs._frame_publish_time = _nan_to_none(publish_time)
+        for field in fields:
+            if field == '_vision_time':
+                value = _nan_to_none(copies['vision_time'][0])
+            elif field == '_ball_position':
+                value = self._read_ball(copies)
+            elif field.endswith('_positions'):
+                value = self._read_robots(_field_team(field), copies)
+            elif field.endswith('_commands'):
+                value = self._read_commands(_field_team(field), copies)
+            else:
+                value = self._read_status(_field_team(field), copies)
+            setattr(gs, field, value)
+        return start
+
+    def _write_ball(self, ball_position):
+        n = len(ball_position)
+        self._arrays['ball_count'][0] = n
+        if n:
+            ball = self._arrays['ball']
+            ball[:n, 0] = ball_position.times()
+            ball[:n, 1:] = ball_position.positions()
+
+    def _read_ball(self, copies):
+        n = int(copies['ball_count'][0])
+        ball = copies['ball']
+        return PositionHistory.from_arrays(BALL_POS_HISTORY_LENGTH,
+                                           ball[:n, 0], ball[:n, 1:])
+
+    def _write_robots(self, team_index, robot_positions):
+        counts = self._arrays['robot_count'][team_index]
+        robots = self._arrays['robots'][team_index]
+        counts[:] = 0
+        for robot_id, history in robot_positions.items():
+            assert(0 <= robot_id < MAX_ROBOTS)
+            n = len(history)
+            counts[robot_id] = n
+            if not n:
+                continue
+            robots[robot_id, :n, 0] = history.times()
+            robots[robot_id, :n, 1:] = history.positions()
+
+    def _read_robots(self, team_index, copies):
+        counts = copies['robot_count'][team_index]
+        robots = copies['robots'][team_index]
+        robot_positions = dict()
+        for robot_id in np.flatnonzero(counts):
+            n = int(counts[robot_id])
+            robot_positions[int(robot_id)] = PositionHistory.from_arrays(
+                ROBOT_POS_HISTORY_LENGTH, robots[robot_id, :n, 0],
+                robots[robot_id, :n, 1:])
+        return robot_positions
+
+    def _write_commands(self, team_index, team_commands):
+        flags = self._arrays['command_flags'][team_index]
+        values = self._arrays['command_values'][team_index]
+        waypoints = self._arrays['waypoints'][team_index]
+        flags[:] = 0
+        for robot_id, commands in team_commands.items():
+            assert(0 <= robot_id < MAX_ROBOTS)
+            robot_waypoints = commands.waypoints
+            if len(robot_waypoints) > MAX_WAYPOINTS:
+                self._warn_truncated(team_index, robot_id,
+                                     len(robot_waypoints))
+                robot_waypoints = robot_waypoints[:MAX_WAYPOINTS - 1] + \
+                    robot_waypoints[-1:]
+            else:
+                self._truncated_robots.discard((team_index, robot_id))
+            n = len(robot_waypoints)
+            flags[robot_id] = (1, commands.is_dribbling, commands.is_charging,
+                               commands.is_kicking, n)
+            prev_waypoint = commands._prev_waypoint
+            if prev_waypoint is None:
+                prev_waypoint = (np.nan, np.nan, np.nan)
+            values[robot_id] = (commands._x, commands._y, commands._w,
+                                commands._speed_limit, *prev_waypoint)
+            if n:
+                waypoints[robot_id, :n] = np.array(robot_waypoints,
+                                                   dtype=float)
+
+    def _warn_truncated(self, team_index, robot_id, num_waypoints):
+        """
+        Warns once each time a robot's waypoints start being truncated, so
+        that a long path doesn't log on every write.
+        """
+        if (team_index, robot_id) in self._truncated_robots:
+            return
+        self._truncated_robots.add((team_index, robot_id))
+        if self.logger is not None:
+            self.logger.warning(
+                "Only sharing %d of the %d waypoints of %s robot %d",
+                MAX_WAYPOINTS, num_waypoints, TEAMS[team_index], robot_id)
+
+    def _read_commands(self, team_index, copies):
+        flags = copies['command_flags'][team_index]
+        values = copies['command_values'][team_index]
+        waypoints = copies['waypoints'][team_index]
+        team_commands = dict()
+        for robot_id in np.flatnonzero(flags[:, 0]):
+            _, is_dribbling, is_charging, is_kicking, n = flags[robot_id]
+            x, y, w, speed_limit, *prev_waypoint = values[robot_id]
+            commands = RobotCommands()
+            commands.is_dribbling = bool(is_dribbling)
+            commands.is_charging = bool(is_charging)
+            commands.is_kicking = bool(is_kicking)
+            commands.set_speeds(x, y, w)
+            commands.set_speed_limit(speed_limit)
+            commands.waypoints = list(waypoints[robot_id, :n])
+            if not np.isnan(prev_waypoint).any():
+                commands._prev_waypoint = np.array(prev_waypoint)
+            team_commands[int(robot_id)] = commands
+        return team_commands
+
+    def _write_status(self, team_index, team_status):
+        present = self._arrays['status_present'][team_index]
+        charge_level = self._arrays['charge_level'][team_index]
+        present[:] = 0
+        for robot_id, status in team_status.items():
+            assert(0 <= robot_id < MAX_ROBOTS)
+            present[robot_id] = 1
+            charge_level[robot_id] = status.charge_level
+
+    def _read_status(self, team_index, copies):
+        present = copies['status_present'][team_index]
+        charge_level = copies['charge_level'][team_index]
+        team_status = dict()
+        for robot_id in np.flatnonzero(present):
+            status = RobotStatus()
+            status.charge_level = float(charge_level[robot_id])
+            team_status[int(robot_id)] = status
+        return team_status
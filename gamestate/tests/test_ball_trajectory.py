@@ -0,0 +1,47 @@
+# pylint: disable=import-error
+import numpy as np
+from ..ball_trajectory import BallTrajectory
+
+DECELERATION = 350
+BOUNDS = (-4500, 4500, -3000, 3000)
+
+
+def test_positions_at():
+    """Tests the ball slows down along its velocity and stays stopped"""
+    trajectory = BallTrajectory([0, 0], [300, 400], DECELERATION)
+    assert np.isclose(trajectory.stop_time, 500 / DECELERATION)
+    positions = trajectory.positions_at([0, 1, trajectory.stop_time, 10])
+    assert positions.shape == (4, 2)
+    assert np.allclose(positions[0], [0, 0])
+    assert np.allclose(positions[1], np.array([.6, .8]) * (500 - 175))
+    assert np.allclose(positions[2], trajectory.stop_position)
+    assert np.allclose(positions[3], trajectory.stop_position)
+    assert np.allclose(trajectory.positions_at(1), positions[1])
+    still = BallTrajectory([10, 20], [0, 0], DECELERATION)
+    assert np.allclose(still.positions_at(5), [10, 20])
+    assert still.exit_time(*BOUNDS) == np.inf
+
+
+def test_exit_time():
+    """Tests when the ball leaves the field"""
+    trajectory = BallTrajectory([4000, 0], [2000, 0], DECELERATION)
+    exit_time = trajectory.exit_time(*BOUNDS)
+    assert np.isclose(trajectory.positions_at(exit_time)[0], 4500)
+    assert trajectory.exit_time(-100, 100, -100, 100) == 0
+    slow = BallTrajectory([4000, 0], [100, 0], DECELERATION)
+    assert slow.exit_time(*BOUNDS) == np.inf
+
+
+def test_sample():
+    """Tests sampling stops once the ball stops or leaves the bounds"""
+    trajectory = BallTrajectory([0, 0], [1000, 0], DECELERATION)
+    times, positions = trajectory.sample(.1, BOUNDS)
+    assert np.allclose(times, np.arange(len(times)) * .1)
+    assert times[-2] >= trajectory.stop_time > times[-3]
+    assert np.allclose(positions[-1], positions[-2])
+    times, positions = BallTrajectory([4400, 0], [3000, 0],
+                                      DECELERATION).sample(.1, BOUNDS)
+    assert len(times) == 2 and positions[-1][0] > 4500
+    times, _ = BallTrajectory([5000, 0], [0, 0],
+                              DECELERATION).sample(.1, BOUNDS)
+    assert len(times) == 0
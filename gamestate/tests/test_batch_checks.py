@@ -0,0 +1,37 @@
+# pylint: disable=import-error
+import numpy as np
+from refbox import SSL_Referee
+from ..gamestate import GameState
+
+
+def make_gamestate(command):
+    rng = np.random.RandomState(0)
+    gs = GameState()
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.command = command
+    msg.blue.goalie = 1
+    gs._latest_refbox_message_string = msg.SerializeToString()
+    for team in ('blue', 'yellow'):
+        for robot_id in range(6):
+            position = np.append(rng.uniform(-4500, 4500, 2), 0)
+            gs.update_robot_position(team, robot_id, position)
+    gs.update_ball_position(np.array([-3000, 500]))
+    return gs
+
+
+def test_batch_checks_match_single_checks():
+    """Tests the batch checks agree with checking one point at a time,
+    for the refbox commands with extra rules and for the goalie"""
+    points = np.random.RandomState(1).uniform(-5000, 5000, (300, 2))
+    for command in (SSL_Referee.STOP, SSL_Referee.PREPARE_PENALTY_BLUE,
+                    SSL_Referee.NORMAL_START):
+        gs = make_gamestate(command)
+        for robot_id in (0, 1):
+            legal = gs.is_pos_legal_batch(points, 'blue', robot_id)
+            is_open = gs.is_position_open_batch(points, 'blue', robot_id,
+                                                buffer_dist=50)
+            for i, point in enumerate(points):
+                assert legal[i] == gs.is_pos_legal(point, 'blue', robot_id)
+                assert is_open[i] == gs.is_position_open(point, 'blue',
+                                                         robot_id, 50)
@@ -0,0 +1,76 @@
+# pylint: disable=import-error
+import numpy as np
+from ..gamestate import GameState
+from ..legality_grid import distance_transform
+
+
+def test_distance_transform_matches_brute_force():
+    """Tests distances and nearest cells against every blocked cell"""
+    random = np.random.RandomState(0)
+    for shape, density in [((40, 25), .02), ((30, 30), .5), ((1, 5), .5),
+                           ((92, 62), .001)]:
+        blocked = random.rand(*shape) < density
+        cells = np.argwhere(blocked)
+        i, j = np.indices(shape)
+        expected = np.hypot(i[..., np.newaxis] - cells[:, 0],
+                            j[..., np.newaxis] - cells[:, 1]).min(axis=2)
+        distances, nearest_i, nearest_j = distance_transform(
+            blocked, 20, return_indices=True)
+        assert np.allclose(distances, expected * 20)
+        assert blocked[nearest_i, nearest_j].all()
+        assert np.allclose(np.hypot(i - nearest_i, j - nearest_j), expected)
+    assert np.isinf(distance_transform(np.zeros((3, 3), dtype=bool))).all()
+
+
+def test_robot_distances_match_exact_scans():
+    """Tests lookups are within the field's tolerance of the exact
+    distances, and open positions match the exact checks
+    """
+    gs = GameState()
+    random = np.random.RandomState(1)
+    for team in ('blue', 'yellow'):
+        for robot_id in range(6):
+            gs.update_robot_position(team, robot_id, np.array(
+                [random.uniform(-4000, 4000), random.uniform(-2800, 2800), 0]))
+    # (off the field)
+    gs.update_robot_position('yellow', 7, np.array([5000, 3500, 0]))
+    points = np.column_stack((random.uniform(-4500, 4500, 5000),
+                              random.uniform(-3000, 3000, 5000)))
+    field = gs.get_clearance_field()
+    assert gs.get_clearance_field() is field
+    snapshot = gs.get_world_snapshot()
+    for team in ('blue', 'yellow', None):
+        for exclude in (None, ('blue', 2), ('yellow', 7)):
+            mask = np.ones(len(snapshot), dtype=bool)
+            if exclude is not None:
+                mask = snapshot.others_mask(*exclude)
+            if team is not None:
+                mask &= snapshot.team_mask(team)
+            delta = points[:, np.newaxis] - snapshot.positions[mask]
+            expected = np.hypot(delta[..., 0], delta[..., 1]).min(axis=1)
+            distances = field.robot_distances(points, team, exclude)
+            assert (np.abs(distances - expected) <= field.tolerance).all()
+    for buffer_dist in (0, 100, 500):
+        assert (gs.is_position_open_batch(
+            points, 'blue', 2, buffer_dist, use_clearance_field=True) ==
+            gs.is_position_open_batch(points, 'blue', 2, buffer_dist)).all()
+    assert gs.is_position_open(snapshot.positions[0] + [300, 0], 'blue', 0,
+                               use_clearance_field=True) == \
+        gs.is_position_open(snapshot.positions[0] + [300, 0], 'blue', 0)
+    gs.update_robot_position('blue', 0, np.array([0, 0, 0]))
+    assert gs.get_clearance_field() is not field
+
+
+def test_robot_distances_without_robots():
+    """Tests lookups are inf when there is no robot to be near"""
+    gs = GameState()
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    field = gs.get_clearance_field()
+    points = [[0, 0], [1000, 1000]]
+    assert np.isinf(field.robot_distances(points, 'yellow')).all()
+    assert np.isinf(field.robot_distances(points, None, ('blue', 1))).all()
+    assert np.allclose(field.robot_distances(points, 'blue'),
+                       [0, np.hypot(1000, 1000)], atol=field.tolerance)
+    assert len(field.robot_distances([], 'blue')) == 0
+    assert gs.is_position_open_batch(points, 'blue', 1,
+                                     use_clearance_field=True).all()
@@ -0,0 +1,17 @@
+# pylint: disable=import-error
+import numpy as np
+from ..gamestate import GameState, ROBOT_LOST_TIME
+from ..clock import SimulatedClock
+
+
+def test_simulated_clock():
+    """Tests that gamestate timestamps follow the simulated clock"""
+    clock = SimulatedClock()
+    gs = GameState(clock)
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    assert gs.get_robot_last_update_time('blue', 1) == 0
+    clock.advance(ROBOT_LOST_TIME / 2)
+    assert not gs.is_robot_lost('blue', 1)
+    clock.advance(ROBOT_LOST_TIME)
+    assert gs.is_robot_lost('blue', 1)
+    assert gs.current_time() == ROBOT_LOST_TIME * 1.5
@@ -0,0 +1,156 @@
+# pylint: disable=import-error
+import numpy as np
+from refbox import SSL_Referee
+from ..collision import Segments
+from ..gamestate import GameState
+
+
+def sampled_contacts(starts, ends, is_blocked, num_samples=4001):
+    """First sampled distance along each segment that is blocked"""
+    contacts = []
+    for start, end in zip(starts, ends):
+        fractions = np.linspace(0, 1, num_samples)
+        points = start + fractions[:, np.newaxis] * (end - start)
+        blocked = np.flatnonzero(is_blocked(points))
+        contacts.append(np.inf if not len(blocked) else
+                        fractions[blocked[0]] * np.linalg.norm(end - start))
+    return np.array(contacts)
+
+
+def random_segments(n, seed=0):
+    random = np.random.RandomState(seed)
+    return random.uniform(-1000, 1000, (n, 2)), \
+        random.uniform(-1000, 1000, (n, 2))
+
+
+def test_circle_contacts_match_sampling():
+    """Tests circle contacts against points sampled along segments"""
+    starts, ends = random_segments(300)
+    center = np.array([[100, -50]])
+    contacts = Segments(starts, ends).circle_contacts(center, 300)[:, 0]
+
+    def inside(points):
+        return np.hypot(*(points - center).T) <= 300
+    expected = sampled_contacts(starts, ends, inside)
+    # starting inside and heading away never touches
+    heading_in = ((ends - starts) * (center - starts)).sum(axis=1) > 0
+    starts_inside = inside(starts)
+    expected[starts_inside & ~heading_in] = np.inf
+    expected[starts_inside & heading_in] = 0
+    hit = np.isfinite(expected)
+    assert (np.isfinite(contacts) == hit).all()
+    assert np.allclose(contacts[hit], expected[hit], atol=1)
+
+
+def test_circle_contacts_between_samples():
+    """Tests a circle that only clips a segment is found, for every center"""
+    contacts = Segments([[0, 0], [0, 10]], [1000, 0]).circle_contacts(
+        [[500, 100], [500, 500], [0, 0]], 100)
+    assert np.isclose(contacts[0, 0], 500)
+    assert np.isinf(contacts[:, 1]).all()
+    # leaving a circle it starts in, or getting closer to its center
+    assert np.isinf(contacts[0, 2]) and contacts[1, 2] == 0
+    assert Segments([50, 0], [-1000, 0]).circle_contacts(
+        [[0, 0]], 100)[0, 0] == 0
+
+
+def test_box_contacts_and_exits_match_sampling():
+    """Tests box entry and exit distances against sampled points"""
+    starts, ends = random_segments(300, seed=1)
+    starts[:20, 0] = ends[:20, 0]  # vertical segments
+    box_min, box_max = np.array([-200, -400]), np.array([300, 100])
+
+    def inside(points):
+        return ((points >= box_min) & (points <= box_max)).all(axis=1)
+    segments = Segments(starts, ends)
+    # (see test_leaving_boxes for segments starting on the other side)
+    for contacts, expected, compared in (
+            (segments.box_contacts(box_min, box_max)[:, 0],
+             sampled_contacts(starts, ends, inside), ~inside(starts)),
+            (segments.box_exits(box_min, box_max),
+             sampled_contacts(starts, ends, lambda p: ~inside(p)),
+             inside(starts))):
+        hit = np.isfinite(expected) & compared
+        assert (np.isfinite(contacts) == np.isfinite(expected))[
+            compared].all()
+        assert np.allclose(contacts[hit], expected[hit], atol=1)
+    # half planes
+    half_plane = Segments([0, 0], [[-1000, 0], [1000, 0]]).box_exits(
+        (-500, -np.inf), (np.inf, np.inf))
+    assert half_plane.tolist() == [500, np.inf]
+    # several boxes at once
+    contacts = Segments([0, 0], [1000, 0]).box_contacts(
+        [[100, -10], [500, 20]], [[200, 10], [600, 30]])
+    assert contacts.tolist() == [[100, np.inf]]
+
+
+def test_leaving_boxes():
+    """Tests segments starting on the wrong side of boxes can get out"""
+    ends = [[500, 0], [-500, 0], [80, 0], [80, 500]]
+    # towards the nearest edge, deeper in, not moving, or another edge
+    contacts = Segments([80, 0], ends).box_contacts(
+        [[-100, -100], [200, -10]], [[100, 100], [300, 10]])
+    assert contacts.tolist() == [[np.inf, 120], [0, np.inf], [0, np.inf],
+                                 [0, np.inf]]
+    # getting into the field and across it, staying out or heading away
+    exits = Segments([1200, 0], [[0, 0], [-1500, 0], [1200, 0], [1500, 0],
+                                 [1200, 1000]]).box_exits(
+        (-1000, -500), (1000, 500))
+    assert exits.tolist() == [np.inf, 2200, 0, 0, 0]
+    # getting to the legal side of a half plane, even if not all the way
+    exits = Segments([-900, 0], [[0, 0], [-600, 0], [-1000, 0]]).box_exits(
+        (-500, -np.inf), (np.inf, np.inf))
+    assert exits.tolist() == [np.inf, np.inf, 0]
+
+
+def test_first_illegal_distance_matches_rules():
+    """Tests the exact rule distances against is_pos_legal_batch"""
+    gs = GameState()
+    gs.update_ball_position(np.array([2000, 500]))
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.command = SSL_Referee.STOP
+    gs._latest_refbox_message_string = msg.SerializeToString()
+    random = np.random.RandomState(2)
+    starts = random.uniform(-4000, 4000, (200, 2))
+    ends = random.uniform(-5000, 5000, (200, 2))
+    distances = gs.first_illegal_distance(Segments(starts, ends), 'blue', 1)
+    expected = sampled_contacts(
+        starts, ends, lambda p: ~gs.is_pos_legal_batch(p, 'blue', 1))
+    # (illegal starts can be left freely, see test_illegal_starts)
+    compared = gs.is_pos_legal_batch(starts, 'blue', 1)
+    hit = np.isfinite(expected) & compared
+    assert (np.isfinite(distances) == np.isfinite(expected))[compared].all()
+    assert np.allclose(distances[hit], expected[hit], atol=5)
+
+
+def test_illegal_starts():
+    """Tests robots on illegal positions can head back to legal ones"""
+    gs = GameState()
+    box_min, box_max = gs.get_field_geometry().defense_area_boxes['blue']
+    # just inside the edge of the defense area facing the field
+    if gs.is_blue_defense_side_left():
+        start, outwards = [box_max[0] - 10, 0], [1, 0]
+    else:
+        start, outwards = [box_min[0] + 10, 0], [-1, 0]
+    ends = np.array(start) + [np.multiply(outwards, 1000),
+                              np.multiply(outwards, -100)]
+    distances = gs.first_illegal_distance(Segments(start, ends), 'blue', 1)
+    assert np.isinf(distances[0]) and distances[1] == 0
+    outside = [0, gs.FIELD_MAX_Y + 100]
+    distances = gs.first_illegal_distance(
+        Segments(outside, [[0, 0], [0, gs.FIELD_MAX_Y + 500]]), 'blue', 1)
+    assert np.isinf(distances[0]) and distances[1] == 0
+
+
+def test_first_robot_contact():
+    """Tests the distance to the first robot ignores the robot itself"""
+    gs = GameState()
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    gs.update_robot_position('yellow', 1, np.array([1000, 0, 0]))
+    gs.update_robot_position('yellow', 2, np.array([2000, 0, 0]))
+    contact = gs.first_robot_contact(Segments([0, 0], [3000, 0]), 'blue', 1,
+                                     buffer_dist=10)
+    assert np.isclose(contact[0], 1000 - gs.ROBOT_RADIUS * 2 - 10)
+    assert np.isinf(gs.first_robot_contact(Segments([0, 0], [0, 3000]),
+                                           'blue', 1))
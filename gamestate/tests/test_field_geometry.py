@@ -0,0 +1,54 @@
+# pylint: disable=import-error
+import numpy as np
+from refbox import SSL_Referee
+from ..gamestate import GameState
+
+
+def set_blue_on_positive_half(gs, blue_on_positive_half):
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.blueTeamOnPositiveHalf = blue_on_positive_half
+    gs._latest_refbox_message_string = msg.SerializeToString()
+
+
+def test_geometry_reused_until_sides_switch():
+    """Tests the geometry is only rebuilt when blueTeamOnPositiveHalf does"""
+    gs = GameState()
+    set_blue_on_positive_half(gs, False)
+    geometry = gs.get_field_geometry()
+    assert gs.get_field_geometry() is geometry
+    assert (gs.get_defense_goal_center('blue') == [-4500, 0]).all()
+    assert (gs.get_attack_goal_center('blue') == [4500, 0]).all()
+    set_blue_on_positive_half(gs, False)
+    assert gs.get_field_geometry() is geometry
+    set_blue_on_positive_half(gs, True)
+    assert gs.get_field_geometry() is not geometry
+    top, bottom = gs.get_defense_goal('blue')
+    assert (top == [4500, 500]).all() and (bottom == [4500, -500]).all()
+    assert (gs.defense_area_corner('blue') == [3500, -1000]).all()
+    assert (gs.get_penalty_mark('blue') == [-1500, 0]).all()
+
+
+def test_division_a_dimensions():
+    """Tests set_division resizes the field, goals and defense areas"""
+    gs = GameState()
+    set_blue_on_positive_half(gs, False)
+    gs.set_division('A')
+    assert gs.FIELD_MAX_X == 6000 and gs.FIELD_MAX_Y == 4500
+    top, _ = gs.get_defense_goal('blue')
+    assert (top == [-6000, 900]).all()
+    assert (gs.defense_area_corner('yellow') == [4200, -1800]).all()
+    assert (gs.get_penalty_mark('yellow') == [-2000, 0]).all()
+    assert gs.is_in_field([5500, 4000]) and gs.is_in_defense_area(
+        [-4500, 1500], 'blue')
+    # the default dimensions are untouched
+    assert GameState().FIELD_MAX_X == 4500
+
+
+def test_defense_area_batch_matches():
+    """Tests the batch defense area check agrees with the single one"""
+    gs = GameState()
+    points = np.random.RandomState(0).uniform(-5000, 5000, (500, 2))
+    for team in ('blue', 'yellow'):
+        expected = [gs.is_in_defense_area(p, team) for p in points]
+        assert (gs.is_in_defense_area_batch(points, team) == expected).all()
@@ -0,0 +1,60 @@
+# pylint: disable=import-error
+import numpy as np
+from refbox import SSL_Referee
+from ..gamestate import GameState
+
+
+def set_command(gs, command):
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.command = command
+    gs._latest_refbox_message_string = msg.SerializeToString()
+
+
+def test_grid_matches_rules():
+    """Tests lookups agree with the rules except right at region borders"""
+    gs = GameState()
+    gs.update_ball_position(np.array([1000, 0]))
+    set_command(gs, SSL_Referee.STOP)
+    grid = gs.get_legality_grid('blue', 3)
+    points = np.random.RandomState(0).uniform(-5000, 5000, (2000, 2))
+    legal = grid.are_legal(points)
+    assert (legal == [grid.is_legal(p) for p in points]).all()
+    expected = gs.is_pos_legal_batch(points, 'blue', 3)
+    assert (legal != expected).mean() < .01
+    # a cell away from any border
+    assert not grid.is_legal([1000, 100]) and grid.is_legal([0, 2000, 0])
+    assert not grid.is_legal([9000, 0]) and len(grid.are_legal([])) == 0
+
+
+def test_grid_reused_as_ball_moves():
+    """Tests the grid is kept through ball moves, but lookups follow them"""
+    gs = GameState()
+    grid = gs.get_legality_grid('blue', 3)
+    gs.update_ball_position(np.array([1000, 0]))
+    assert gs.get_legality_grid('blue', 3) is grid
+    assert gs.get_legality_grid('yellow', 3) is not grid
+    set_command(gs, SSL_Referee.STOP)
+    assert gs.get_legality_grid('blue', 3) is grid
+    assert not grid.is_legal([1000, 300])
+    gs.update_ball_position(np.array([2000, 0]))
+    assert gs.get_legality_grid('blue', 3) is grid
+    assert grid.is_legal([1000, 300])
+    assert list(grid.are_legal([[1000, 300], [2000, 300]])) == [True, False]
+
+
+def test_boundary_distances():
+    """Tests distances to the rules, interpolated between cell centers"""
+    gs = GameState()
+    grid = gs.get_legality_grid('blue', 3, resolution=100)
+    distances = grid.distances()
+    assert (distances[~grid.mask] == 0).all()
+    assert (distances[grid.mask] > 0).all()
+    # (cell centers are 50 from the field's cell borders, and the nearest
+    # illegal ones are just past the sides at y = +-3050)
+    center = grid.boundary_distances([[0, 0], [0, 1000], [0, 4000]])
+    assert np.isclose(center[0], 3000) and np.isclose(center[1], 2050)
+    assert center[2] == 0
+    # halfway between two cell centers is the average of both
+    half = grid.boundary_distances([[0, 2000], [0, 2050], [0, 2100]])
+    assert np.isclose(half[1], (half[0] + half[2]) / 2)
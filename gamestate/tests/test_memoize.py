@@ -0,0 +1,40 @@
+# pylint: disable=import-error
+import numpy as np
+from refbox import SSL_Referee
+from ..gamestate import GameState
+
+
+def test_memoize_until_positions_change():
+    """Tests memoized values are reused until the positions change"""
+    gs = GameState()
+    calls = []
+
+    def compute(x):
+        calls.append(x)
+        return x * 2
+    assert gs.memoize('double', compute, 3) == 6
+    assert gs.memoize('double', compute, 4) == 6
+    assert calls == [3]
+    gs.update_ball_position(np.array([0, 0]))
+    assert gs.memoize('double', compute, 4) == 8
+    gs.mark_world_changed()
+    gs.memoize('double', compute, 5)
+    assert calls == [3, 4, 5]
+
+
+def test_memoized_analysis():
+    """Tests analysis results follow position and refbox updates"""
+    gs = GameState()
+    gs.update_ball_position(np.array([0, 0]), timestamp=0)
+    gs.update_ball_position(np.array([1000, 0]), timestamp=1)
+    velocity = gs.get_ball_velocity()
+    velocity[:] = 0  # callers get their own copy
+    assert gs.get_ball_velocity()[0] > 0
+    gs.update_ball_position(np.array([1000, 0]), timestamp=2)
+    assert not gs.get_ball_velocity().any()
+    assert gs.is_pos_legal(np.array([1000, 300]), 'blue', 1)
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.command = SSL_Referee.STOP
+    gs._latest_refbox_message_string = msg.SerializeToString()
+    assert not gs.is_pos_legal(np.array([1000, 300]), 'blue', 1)
@@ -0,0 +1,49 @@
+# pylint: disable=import-error
+import numpy as np
+from ..gamestate import GameState
+from ..occupancy_grid import OccupancyGrid
+
+
+def test_grid_kept_until_robot_changes_cell():
+    """Tests the grid is only rebuilt when robots move to another cell,
+    and then only for the robots that moved
+    """
+    gs = GameState()
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    gs.update_robot_position('yellow', 1, np.array([1010, 10, 0]))
+    grid = gs.get_occupancy_grid('blue', 1, 370)
+    assert gs.get_occupancy_grid('blue', 2, 370) is grid
+    gs.update_robot_position('yellow', 1, np.array([1020, 20, 0]))
+    assert gs.get_occupancy_grid('blue', 1, 370) is grid
+    gs.update_robot_position('yellow', 1, np.array([1120, 20, 0]))
+    new_grid = gs.get_occupancy_grid('blue', 1, 370)
+    assert new_grid is not grid and new_grid.legal is grid.legal
+    assert new_grid._discs[('blue', 1)] is grid._discs[('blue', 1)]
+    gs.remove_robot('blue', 1)
+    updated_grid = gs.get_occupancy_grid('blue', 1, 370)
+    fresh_grid = OccupancyGrid(gs, 'blue', 1, 370)
+    assert (updated_grid.counts == fresh_grid.counts).all()
+    assert (updated_grid.contacts == fresh_grid.contacts).all()
+    # the other team plans on its own grid
+    assert gs.get_occupancy_grid('yellow', 1, 370) is not new_grid
+
+
+def test_blocked_for_leaves_out_robot():
+    """Tests robots aren't blocked by themselves, and only by contact with
+    others around their start
+    """
+    gs = GameState()
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    gs.update_robot_position('yellow', 1, np.array([330, 0, 0]))
+    grid = gs.get_occupancy_grid('blue', 1, 370)
+    blocked = grid.blocked_for('blue', 1, [0, 0], [-2000, 0]).reshape(
+        grid.shape)
+
+    def is_blocked(pos):
+        return blocked[grid.cell_index(pos)]
+    assert not is_blocked([0, 0]) and not is_blocked([-200, 0])
+    # in the other robot's clearance, but not touching it
+    assert not is_blocked([-50, 0]) and is_blocked([250, 0])
+    assert is_blocked([650, 0]) and not is_blocked([780, 0])
+    # (as are the defense areas)
+    assert is_blocked([-4000, 0]) and is_blocked([4000, 0])
@@ -0,0 +1,35 @@
+# pylint: disable=import-error
+import pickle
+import numpy as np
+from ..position_history import PositionHistory
+
+
+def test_ring_buffer_wraps():
+    """Tests that the history keeps the most recent entries, newest first"""
+    history = PositionHistory(3, 2)
+    for t in range(5):
+        history.append(t, np.array([t, -t]))
+    assert len(history) == 3
+    assert history.latest_time() == 4
+    assert (history.latest_position() == [4, -4]).all()
+    assert (history.times() == [4, 3, 2]).all()
+    assert (history.positions(2) == [[4, -4], [3, -3]]).all()
+    # the latest position is a copy, not a view into the buffer
+    history.latest_position()[0] = 100
+    assert history.positions()[0, 0] == 4
+
+
+def test_lookback_and_pickle():
+    """Tests windowed lookups and that pickling keeps the entries in order"""
+    history = PositionHistory(10, 3)
+    for t in [0, .5, .9, 1]:
+        history.append(t, np.array([t, t, t]))
+    assert history.lookback_index(.05) == 1
+    assert history.lookback_index(.4) == 2
+    assert history.lookback_index(5) == 3
+    copy = pickle.loads(pickle.dumps(history))
+    assert copy.capacity() == 10
+    assert (copy.times() == history.times()).all()
+    assert (copy.positions() == history.positions()).all()
+    copy.append(2, np.array([2, 2, 2]))
+    assert (copy.times() == [2, 1, .9, .5, 0]).all()
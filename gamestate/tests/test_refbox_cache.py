@@ -0,0 +1,26 @@
+# pylint: disable=import-error
+from refbox import SSL_Referee
+from ..gamestate import GameState
+
+
+def test_refbox_message_cached_until_replaced():
+    """Tests the refbox message is only decoded again when it changes"""
+    gs = GameState()
+    msg = gs.get_latest_refbox_message()
+    assert gs.get_latest_refbox_message() is msg
+    assert gs.is_blue_defense_side_left()
+    new_msg = SSL_Referee()
+    new_msg.CopyFrom(msg)
+    new_msg.command = SSL_Referee.STOP
+    new_msg.blue.goalie = 3
+    new_msg.blueTeamOnPositiveHalf = True
+    # providers replace the string directly
+    gs._latest_refbox_message_string = new_msg.SerializeToString()
+    assert gs.get_refbox_command() == SSL_Referee.STOP
+    assert gs.get_goalie_id('blue') == 3
+    assert gs.is_goalie('blue', 3) and not gs.is_goalie('yellow', 3)
+    assert not gs.is_blue_defense_side_left()
+    new_msg.command = SSL_Referee.NORMAL_START
+    gs.update_latest_refbox_message(new_msg.SerializeToString())
+    assert gs.get_latest_refbox_message().command == SSL_Referee.NORMAL_START
+    assert gs.game_info["most_recent_start_pos"] is not None
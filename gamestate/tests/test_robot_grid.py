@@ -0,0 +1,32 @@
+# pylint: disable=import-error
+import numpy as np
+from ..robot_grid import RobotGrid
+
+
+def brute_force(positions, point, radius):
+    return np.linalg.norm(positions - point, axis=1) <= radius
+
+
+def test_query_radius_matches_brute_force():
+    """Tests radius queries against checking every robot"""
+    rng = np.random.RandomState(0)
+    positions = rng.uniform(-4500, 4500, (22, 2))
+    grid = RobotGrid(positions)
+    points = rng.uniform(-5000, 5000, (200, 2))
+    for radius in (0, 135, 370, 5000):
+        mask = grid.query_radius_batch(points, radius)
+        for point, row in zip(points, mask):
+            expected = brute_force(positions, point, radius)
+            assert (row == expected).all()
+            rows = grid.query_radius(point, radius)
+            assert list(rows) == list(np.flatnonzero(expected))
+
+
+def test_query_edges():
+    """Tests inclusive radius, 3d points and empty grids"""
+    grid = RobotGrid(np.array([[0, 0], [499, 0], [500, 0]]))
+    assert list(grid.query_radius(np.array([0, 0, 1]), 499)) == [0, 1]
+    assert list(grid.query_radius([1000, 1000], 10)) == []
+    empty = RobotGrid(np.empty((0, 2)))
+    assert len(empty.query_radius([0, 0], 100)) == 0
+    assert empty.query_radius_batch(np.zeros((3, 2)), 100).shape == (3, 0)
@@ -0,0 +1,82 @@
+# pylint: disable=import-error
+import logging
+import numpy as np
+from ..gamestate import GameState
+from ..shared_gamestate import SharedGameState, MAX_WAYPOINTS
+
+
+def make_gamestate():
+    gs = GameState()
+    gs.update_ball_position(np.array([10, 20]), timestamp=1)
+    gs.update_ball_position(np.array([30, 40]), timestamp=2)
+    gs.update_robot_position('blue', 1, np.array([100, 200, 1]))
+    gs.update_robot_position('yellow', 4, np.array([-100, -200, 2]))
+    commands = gs.get_robot_commands('blue', 1)
+    commands.is_dribbling = True
+    commands.set_waypoints([np.array([1000, 0, 0]), np.array([0, 1000, 1])],
+                           gs.get_robot_position('blue', 1))
+    gs.get_robot_status('blue', 1).charge_level = 42
+    gs._vision_time = 3
+    gs._frame_id = 7
+    return gs
+
+
+def test_round_trip():
+    """Tests that positions, commands and status survive shared memory."""
+    gs = make_gamestate()
+    shared = SharedGameState()
+    shared.write(gs)
+    new_gs = GameState()
+    shared.read_into(new_gs)
+    assert (new_gs.get_ball_position() == [30, 40]).all()
+    assert new_gs.get_ball_last_update_time() == 2
+    assert len(new_gs._ball_position) == 2
+    assert new_gs.get_robot_ids('blue') == (1,)
+    assert (new_gs.get_robot_position('yellow', 4) == [-100, -200, 2]).all()
+    commands = new_gs.get_robot_commands('blue', 1)
+    assert commands.is_dribbling and not commands.is_kicking
+    assert np.allclose(commands.waypoints,
+                       gs.get_robot_commands('blue', 1).waypoints)
+    assert new_gs.get_robot_status('blue', 1).charge_level == 42
+    assert new_gs._vision_time == 3
+    assert new_gs._frame_id == 7 and new_gs._frame_publish_time is None
+
+
+def test_read_skips_excluded_and_unchanged():
+    """Tests that owned fields and already read versions are left alone."""
+    shared = SharedGameState()
+    shared.write(make_gamestate())
+    new_gs = GameState()
+    version = shared.read_into(new_gs, exclude=['_blue_robot_positions'])
+    assert version == shared.version()
+    assert new_gs.get_robot_ids('blue') == ()
+    assert new_gs.get_robot_ids('yellow') == (4,)
+    new_gs.remove_robot('yellow', 4)
+    assert shared.read_into(new_gs, since=version) == version
+    assert new_gs.get_robot_ids('yellow') == ()
+
+
+def test_waypoints_truncated_with_warning(caplog):
+    """Tests that up to MAX_WAYPOINTS waypoints are shared as they are, and
+    that longer paths keep their destination and warn once."""
+    gs = make_gamestate()
+    commands = gs.get_robot_commands('blue', 1)
+    shared = SharedGameState(logging.getLogger('test_shared_gamestate'))
+    new_gs = GameState()
+    waypoints = [np.array([i, 0, 0]) for i in range(MAX_WAYPOINTS + 1)]
+    with caplog.at_level(logging.WARNING):
+        commands.waypoints = waypoints[:MAX_WAYPOINTS]
+        shared.write(gs)
+        shared.read_into(new_gs)
+        assert np.array_equal(new_gs.get_robot_commands('blue', 1).waypoints,
+                              waypoints[:MAX_WAYPOINTS])
+        assert not caplog.records
+        commands.waypoints = waypoints
+        shared.write(gs)
+        shared.write(gs)
+        shared.read_into(new_gs)
+    shared_waypoints = new_gs.get_robot_commands('blue', 1).waypoints
+    assert len(shared_waypoints) == MAX_WAYPOINTS
+    assert np.array_equal(shared_waypoints[-1], waypoints[-1])
+    assert len(caplog.records) == 1
+    assert f"{MAX_WAYPOINTS} of the {MAX_WAYPOINTS + 1}" in caplog.text
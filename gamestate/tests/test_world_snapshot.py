@@ -0,0 +1,40 @@
+# pylint: disable=import-error
+import numpy as np
+from ..gamestate import GameState
+
+
+def test_snapshot_arrays():
+    """Tests the snapshot stacks poses in get_all_robot_positions order"""
+    gs = GameState()
+    gs.update_robot_position('yellow', 2, np.array([0, 1000, np.pi / 2]))
+    gs.update_robot_position('blue', 5, np.array([100, 0, 0]))
+    gs.update_ball_position(np.array([10, 20]))
+    snapshot = gs.get_world_snapshot()
+    keys = [key for key, _ in gs.get_all_robot_positions()]
+    assert list(snapshot.keys) == keys == [('blue', 5), ('yellow', 2)]
+    assert snapshot.index[('yellow', 2)] == 1
+    assert (snapshot.robot_pose('blue', 5) == [100, 0, 0]).all()
+    assert snapshot.robot_pose('blue', 1) is None
+    assert np.allclose(snapshot.robot_heading('yellow', 2), [0, 1])
+    assert (snapshot.team_mask('yellow') == [False, True]).all()
+    assert (snapshot.others_mask('blue', 5) == [False, True]).all()
+    assert np.allclose(snapshot.distances_to([100, 1000]), [1000, 100])
+    assert (snapshot.ball_position == [10, 20]).all()
+    assert not snapshot.poses.flags.writeable
+
+
+def test_snapshot_rebuilt_after_changes():
+    """Tests the snapshot is shared until positions change"""
+    gs = GameState()
+    gs.update_robot_position('blue', 1, np.array([0, 0, 0]))
+    snapshot = gs.get_world_snapshot()
+    assert gs.get_world_snapshot() is snapshot
+    gs.update_robot_position('blue', 1, np.array([500, 0, 0]))
+    assert gs.get_world_snapshot().robot_pose('blue', 1)[0] == 500
+    assert not gs.is_position_open(np.array([600, 0]), 'yellow', 1)
+    assert gs.is_position_open(np.array([600, 0]), 'blue', 1)
+    assert gs.robot_at_position(np.array([550, 0])) == ('blue', 1)
+    gs.remove_robot('blue', 1)
+    assert len(gs.get_world_snapshot()) == 0
+    assert gs.robot_at_position(np.array([550, 0])) is None
+    assert gs.is_position_open(np.array([600, 0]), 'yellow', 1)
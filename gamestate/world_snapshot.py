@@ -0,0 +1,90 @@
+"""
+Read only arrays of the robot and ball positions at one point in time.
+
+Analysis functions that look at every robot (collision checks, open paths,
+nearest robots...) would otherwise rebuild the same lists from the
+gamestate's position histories on every call. The gamestate builds one
+WorldSnapshot after its positions change (see GameState.get_world_snapshot)
+and every analysis call until the next change shares it.
+"""
+import numpy as np
+
+try:
+    from robot_grid import RobotGrid
+except (SystemError, ImportError):
+    from .robot_grid import RobotGrid
+
+TEAMS = ('blue', 'yellow')
+
+
+class WorldSnapshot(object):
+    """
+    Robot poses stacked into contiguous arrays, one row per robot, ordered
+    like GameState.get_all_robot_positions (blue ids, then yellow ids).
+
+    Attributes:
+        version: the gamestate world version the snapshot was built from
+        keys: tuple of (team, robot_id) for each row
+        index: dict of (team, robot_id): row
+        poses: (n, 3) array of [x, y, w]
+        positions: (n, 2) view of the [x, y] columns of poses
+        headings: (n, 2) array of unit vectors the robots are facing
+        teams: (n,) array of team indices into TEAMS
+        ball_position: [x, y] of the ball, (0, 0) if it was never seen
+        ball_velocity: [x, y] velocity of the ball
+        grid: RobotGrid of the positions, for radius queries
+
+    The arrays are read only, since they are shared between callers.
+    """
+    def __init__(self, gs, version=None):
+        self.version = version
+        keys = []
+        poses = []
+        for team in TEAMS:
+            for robot_id in gs.get_robot_ids(team):
+                keys.append((team, robot_id))
+                poses.append(gs.get_robot_position(team, robot_id))
+        self.keys = tuple(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.poses = np.array(poses, dtype=float).reshape(len(keys), 3)
+        self.positions = self.poses[:, :2]
+        w = self.poses[:, 2]
+        self.headings = np.stack((np.cos(w), np.sin(w)), axis=1)
+        self.teams = np.array([TEAMS.index(team) for team, _ in keys],
+                              dtype=int)
+        self.ball_position = np.array(gs.get_ball_position(), dtype=float)
+        self.ball_velocity = np.array(gs.get_ball_velocity(), dtype=float)
+        for array in (self.poses, self.positions, self.headings, self.teams,
+                      self.ball_position, self.ball_velocity):
+            array.flags.writeable = False
+        self.grid = RobotGrid(self.positions)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def team_mask(self, team):
+        """Boolean mask of the rows belonging to the team"""
+        return self.teams == TEAMS.index(team)
+
+    def others_mask(self, team, robot_id):
+        """Boolean mask of every row except the given robot's"""
+        mask = np.ones(len(self.keys), dtype=bool)
+        i = self.index.get((team, robot_id))
+        if i is not None:
+            mask[i] = False
+        return mask
+
+    def robot_pose(self, team, robot_id):
+        """Returns the [x, y, w] pose of the robot, or None if not seen"""
+        i = self.index.get((team, robot_id))
+        return None if i is None else self.poses[i]
+
+    def robot_heading(self, team, robot_id):
+        """Returns the unit vector the robot faces, or None if not seen"""
+        i = self.index.get((team, robot_id))
+        return None if i is None else self.headings[i]
+
+    def distances_to(self, pos):
+        """Distances from an [x, y(, w)] position to each robot's center"""
+        delta = self.positions - np.asarray(pos, dtype=float)[:2]
+        return np.hypot(delta[:, 0], delta[:, 1])
@@ -13,7 +13,7 @@ from strategy import Strategy
 from visualization import Visualizer
 from comms import Comms
 from simulator import Simulator
-from coordinator import Coordinator
+from coordinator import Coordinator, InlineCoordinator, LockstepCoordinator
 import os
 
 # Remove pygame's annoying welcome message
@@ -32,6 +32,29 @@ parser.add_argument('-s', '--simulate',
 parser.add_argument('-ss', '--simulator_setup',
                     default='full_teams',
                     help='The setup to use for the simulator.')
+parser.add_argument('-i', '--inline',
+                    action="store_true",
+                    help='run all providers in this process instead of one '
+                         'process each, e.g. for profiling (implies '
+                         '--simulate)')
+parser.add_argument('-l', '--lockstep',
+                    action="store_true",
+                    help='run the simulator and strategy in lockstep in one '
+                         'process, as fast as possible and reproducibly '
+                         '(implies --simulate, no visualization)')
+parser.add_argument('-ldt', '--lockstep_dt',
+                    type=float,
+                    default=1/60,
+                    help='Simulated seconds per lockstep step.')
+parser.add_argument('-ld', '--lockstep_duration',
+                    type=float,
+                    default=None,
+                    help='Simulated seconds to run in lockstep mode before '
+                         'exiting (default: until Ctrl-C).')
+parser.add_argument('--seed',
+                    type=int,
+                    default=0,
+                    help='Random seed for lockstep mode.')
 parser.add_argument('-nra', '--no_radio',
                     action="store_true",
                     help='Turns off command sending. No cmds go over radio.')
@@ -52,13 +75,31 @@ parser.add_argument('-hs', '--home_strategy',
 parser.add_argument('-as', '--away_strategy',
                     default='UI',
                     help="The strategy the away team should use to play.")
+parser.add_argument('--division',
+                    choices=['A', 'B'],
+                    default='B',
+                    help='The SSL division, which sets the field dimensions.')
 parser.add_argument('-d', '--debug',
                     action="store_true",
                     help='Uses more verbose logging for debugging.')
+parser.add_argument('-t', '--trace',
+                    nargs='?',
+                    const='logs/trace.json',
+                    default=None,
+                    help='Saves a timeline of all processes to the given '
+                         'file (default logs/trace.json) in Chrome trace '
+                         'format, open it in chrome://tracing or Perfetto. '
+                         'Only with the multiprocess coordinator.')
 command_line_args = parser.parse_args()
+if command_line_args.trace is not None and \
+        (command_line_args.inline or command_line_args.lockstep):
+    # (only the multiprocess coordinator merges the trace parts)
+    parser.error('--trace can not be used with --inline or --lockstep')
 
 # Create globals
-IS_SIMULATION = command_line_args.simulate
+IS_LOCKSTEP = command_line_args.lockstep
+IS_INLINE = command_line_args.inline or IS_LOCKSTEP
+IS_SIMULATION = command_line_args.simulate or IS_INLINE
 NO_RADIO = command_line_args.no_radio
 NO_REFBOX = command_line_args.no_refbox
 CONTROL_BOTH_TEAMS = command_line_args.control_both_teams
@@ -67,6 +108,8 @@ AWAY_TEAM = 'yellow' if HOME_TEAM == 'blue' else 'blue'
 SIMULATOR_SETUP = command_line_args.simulator_setup
 HOME_STRATEGY = command_line_args.home_strategy
 AWAY_STRATEGY = command_line_args.away_strategy
+TRACE_PATH = command_line_args.trace
+DIVISION = command_line_args.division
 
 
 def setup_logging():
@@ -83,8 +126,13 @@ if __name__ == '__main__':
     print('RFC Cambridge Robocup Software')
     print('------------------------------')
     print(f'Running in simulator mode: {IS_SIMULATION}')
+    print(f'Running in inline mode: {IS_INLINE}')
+    print(f'Running in lockstep mode: {IS_LOCKSTEP}')
     print(f'Running in no radio mode: {NO_RADIO}')
     print(f'Running in no refbox mode: {NO_REFBOX}')
+    print(f'Playing in division: {DIVISION}')
+    if TRACE_PATH is not None:
+        print(f'Saving a trace to: {TRACE_PATH}')
     print('Open cutelog separately to see logging!')
 
     # Initialize providers and pass to coordinator
@@ -96,7 +144,8 @@ if __name__ == '__main__':
     else:
         providers += [SSLVisionDataProvider()]
 
-    if not NO_REFBOX:
+    # refbox blocks waiting for packets, so it can't share a process
+    if not NO_REFBOX and not IS_INLINE:
         providers += [RefboxDataProvider()]
 
     if not NO_RADIO:
@@ -109,10 +158,23 @@ if __name__ == '__main__':
     if CONTROL_BOTH_TEAMS:
         providers += [Strategy(AWAY_TEAM, AWAY_STRATEGY)]
 
-    providers += [Visualizer()]
-
     # Pass the providers to the coordinator
-    c = Coordinator(providers)
+    if IS_LOCKSTEP:
+        c = LockstepCoordinator(providers,
+                                dt=command_line_args.lockstep_dt,
+                                seed=command_line_args.seed,
+                                duration=command_line_args.lockstep_duration)
+    elif IS_INLINE:
+        providers += [Visualizer()]
+        c = InlineCoordinator(providers)
+    else:
+        providers += [Visualizer()]
+        c = Coordinator(providers, trace_path=TRACE_PATH)
+
+    # Every gamestate needs the field dimensions before the game starts
+    c.gamestate.set_division(DIVISION)
+    for provider in providers:
+        provider.gs.set_division(DIVISION)
 
     # Setup the exit handler
     def stop_it(signum, frame):
@@ -24,10 +24,13 @@ class Simulator(Provider):
             '_ball_position',
             '_blue_robot_positions',
             '_yellow_robot_positions',
+            '_vision_time',
             # also act as robot feedback
             '_blue_robot_status',
             '_yellow_robot_status',
         ]
+        # run at the frame rate of ssl-vision
+        self._target_rate = 60
 
     def put_fake_robot(self, team: str,
                        robot_id: int,
@@ -47,8 +50,9 @@ class Simulator(Provider):
         # use small dt to minimize deceleration correction
         dt = .05
         prev_pos = position - velocity * dt
-        self.gs.update_ball_position(prev_pos, time.time() - dt)
-        self.gs.update_ball_position(position, time.time())
+        now = self.gs.current_time()
+        self.gs.update_ball_position(prev_pos, now - dt)
+        self.gs.update_ball_position(position, now)
 
     def pre_run(self):
         if self.logger is None:
@@ -128,6 +132,11 @@ class Simulator(Provider):
             new_ball_pos = self.gs.predict_ball_pos(self.delta_time)
             self.gs.update_ball_position(new_ball_pos)
 
+        # robots are only pushed apart by up to a robot radius at a time, so
+        # the ones that can collide are found from the positions before the
+        # collisions are handled (with some slack)
+        snapshot = self.gs.get_world_snapshot()
+        collision_search_radius = self.gs.ROBOT_RADIUS * 4
         for (team, robot_id), pos in \
                 self.gs.get_all_robot_positions():
             # refresh positions of all robots
@@ -135,8 +144,9 @@ class Simulator(Provider):
             self.gs.update_robot_position(team, robot_id, pos)
 
             # handle collisions with other robots
-            for (team2, robot_id2), pos2 in \
-                    self.gs.get_all_robot_positions():
+            for i in snapshot.grid.query_radius(pos, collision_search_radius):
+                team2, robot_id2 = snapshot.keys[i]
+                pos2 = self.gs.get_robot_position(team2, robot_id2)
                 if ((team2, robot_id2) != (team, robot_id) and
                         self.gs.robot_overlap(pos, pos2).any()):
                     overlap = self.gs.robot_overlap(pos, pos2)
@@ -214,3 +224,5 @@ class Simulator(Provider):
                     new_pos = ball_pos + new_velocity * self.delta_time
                     self.put_fake_ball(new_pos, new_velocity)
                 robot_status.simulate_kick()
+        # the simulated "camera frame" is ready
+        self.gs._vision_time = time.time()
@@ -1,6 +1,5 @@
 # pylint: disable=maybe-no-member
 import numpy as np
-import time
 from typing import Tuple
 
 
@@ -109,6 +108,9 @@ class Actions:
             goal_pos = self.find_legal_pos(robot_id, goal_pos)
 
         start_pos = self.gs.get_robot_position(self._team, robot_id)
+        # keep the robot's plans while it is path finding, whichever planner
+        # ends up used this tick (see drop_unused_plans)
+        self._planned_robots.add(robot_id)
 
         # always check if we can just go straight
         if not self.is_path_blocked(start_pos, goal_pos, robot_id,
@@ -119,6 +121,16 @@ class Actions:
                               robot_id, start_pos, goal_pos)
             return self.is_done_moving(robot_id)
 
+        # the grid planner goes first: it is deterministic and keeps the same
+        # path until it is blocked, so the robot doesn't switch between
+        # random paths from tick to tick. The RRT* tree below is only grown
+        # on the ticks the grid fails (its coarse cells close some gaps, and
+        # its search is bounded), and kept in between for as long as the
+        # goal and the rules stay the same (see RRT_star_path_find)
+        if self.grid_path_find(start_pos, goal_pos, robot_id,
+                               allow_illegal=allow_illegal):
+            return self.is_done_moving(robot_id)
+
         # now check if current waypoints are already going where we want
         current_goal = self.get_goal_pos(robot_id)
         SAME_GOAL_THRESHOLD = 100  # TODO
@@ -133,23 +145,25 @@ class Actions:
                                     allow_illegal=allow_illegal):
                 current_path_collides = True
 
-        # avoid rerunning too often so we don't crash the system
-        # RRT_MIN_INTERVAL = .1
-        # recently_called = robot_id in self._last_pathfind_times and \
-        #  time.time() - self._last_pathfind_times[robot_id] < RRT_MIN_INTERVAL
-        # only rerun for same goal if long time has elapsed or path collides
-        # mainly in case something very strange has happened
-        MIN_REFRESH_INTERVAL = 3
-        need_refresh = robot_id not in self._last_pathfind_times or \
-            time.time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL  # noqa
         self.logger.debug("Robot: %s Start: %s Goal: %s Waypoints: %s",
                           robot_id, start_pos, goal_pos, current_waypoints)
-        if (current_path_collides or not is_same_goal or need_refresh):
-            self._last_pathfind_times[robot_id] = time.time()
+        # the RRT* tree is kept between ticks, so improving it a bit every
+        # tick is cheaper than replanning from scratch once in a while
+        is_success = self.RRT_star_path_find(
+            start_pos, goal_pos, robot_id, allow_illegal=allow_illegal)
+        # replanning from scratch is expensive, so don't do it every tick
+        # (e.g. for a goal that can't be reached)
+        MIN_REFRESH_INTERVAL = .1
+        need_refresh = robot_id not in self._last_pathfind_times or \
+            self.gs.current_time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL  # noqa
+        if not is_success and need_refresh and \
+                (current_path_collides or not is_same_goal):
+            # no path in the tree yet, and the current one won't do
+            self._last_pathfind_times[robot_id] = self.gs.current_time()
             is_success = self.RRT_path_find(
                 start_pos, goal_pos, robot_id, allow_illegal=allow_illegal)
             if not is_success:
-                self.logger.debug(f"Robot {robot_id} RRT path find failed")
+                self.logger.debug("Robot %s RRT path find failed", robot_id)
                 return False
         return self.is_done_moving(robot_id)
 
@@ -195,11 +209,11 @@ class Actions:
         # need frequent refreshes since we do not have full path planning
         MIN_REFRESH_INTERVAL = .1
         need_refresh = robot_id not in self._last_pathfind_times or \
-            time.time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL  # noqa
+            self.gs.current_time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL  # noqa
 
         if (fst_segmt_collides or not is_same_goal or \
             (need_refresh and not SAME_GOAL_THRESHOLD < fst_segmt_len < TRIVIAL_DISTANCE)):  # noqa
-            self._last_pathfind_times[robot_id] = time.time()
+            self._last_pathfind_times[robot_id] = self.gs.current_time()
             is_success = self.greedy_path_find(start_pos, goal_pos, robot_id,
                                                allow_illegal=allow_illegal)
             if not is_success:
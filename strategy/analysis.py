@@ -1,8 +1,16 @@
 # pylint: disable=maybe-no-member
-import numpy as np
 import time
+import numpy as np
 from typing import Tuple
 import logging
+from gamestate import Segments  # pylint: disable=import-error
+
+try:
+    from rrt import RRT, RRTStar, informed_samples, points_clear
+    from grid_planner import theta_star
+except (SystemError, ImportError, ModuleNotFoundError):
+    from .rrt import RRT, RRTStar, informed_samples, points_clear
+    from .grid_planner import theta_star
 
 logger = logging.getLogger(__name__)
 
@@ -16,24 +24,52 @@ class Analysis(object):
         Samples incrementally to return array of
         future predicted ball positions
         """
-        ball_pos = self.gs.get_ball_position()
+        # the samples only depend on the positions, so they are shared by
+        # every call until the positions change
+        samples = self.gs.memoize('future_ball_samples',
+                                  self._future_ball_samples)
+        now = self.gs.current_time()
+        return [(t + now, ball_pos) for t, ball_pos in samples]
+
+    def _future_ball_samples(self):
+        """
+        Returns list of (time from now, predicted ball position)
         """
-        this definition of new_ball_pos guarentees that
-        they are not the same intitally
-        """
-        new_ball_pos = ball_pos - np.array([1, 1])
-        now = time.time()
-        t = 0
-        delta_t = .1
-        future_ball_array = []
-        while (((ball_pos != new_ball_pos).any() or t == 0)
-                and self.gs.is_in_field(new_ball_pos)):
-            # here we make the previously generated point the reference
-            ball_pos = new_ball_pos
-            new_ball_pos = self.gs.predict_ball_pos(t)
-            future_ball_array.append((t + now, new_ball_pos))
-            t += delta_t
-        return future_ball_array
+        bounds = (self.gs.FIELD_MIN_X, self.gs.FIELD_MAX_X,
+                  self.gs.FIELD_MIN_Y, self.gs.FIELD_MAX_Y)
+        # every .1s until the ball stops (last two samples) or leaves the field
+        times, positions = self.gs.get_ball_trajectory().sample(.1, bounds)
+        return list(zip(times, positions))
+
+    def intercepts(self, team=None):
+        """
+        Solves intercepts with the predicted ball trajectory for every robot
+        of a team (our team by default) at once, see solve_intercepts.
+        Also returns the robot ids, in the same order as the arrays.
+        Treat the arrays as read only.
+        """
+        if team is None:
+            team = self._team
+        return self.gs.memoize(('intercepts', team),
+                               self._solve_team_intercepts, team)
+
+    def _solve_team_intercepts(self, team):
+        robot_ids = self.gs.get_robot_ids(team)
+        snapshot = self.gs.get_world_snapshot()
+        robot_positions = np.array(
+            [snapshot.positions[snapshot.index[(team, robot_id)]]
+             for robot_id in robot_ids]).reshape(-1, 2)
+        max_speeds = np.array([self.gs.robot_max_speed(team, robot_id)
+                               for robot_id in robot_ids], dtype=float)
+        samples = self.get_future_ball_array()
+        now = self.gs.current_time()
+        times = np.array([t - now for t, _ in samples], dtype=float)
+        ball_positions = np.array([pos for _, pos in samples],
+                                  dtype=float).reshape(-1, 2)
+        intercepts = solve_intercepts(times, ball_positions,
+                                      robot_positions, max_speeds)
+        intercepts['robot_ids'] = robot_ids
+        return intercepts
 
     def intercept_range(self,
                         robot_id: int
@@ -44,79 +80,32 @@ class Analysis(object):
             returns the positions between which robots can intercept the ball.
             returns None if interception is not possible
         """
-        future_ball_array = self.get_future_ball_array()
-        if len(future_ball_array) == 0:
+        intercepts = self.intercepts()
+        if robot_id not in intercepts['robot_ids'] or \
+                not intercepts['possible'].any():
             return None
-        max_index = len(future_ball_array) - 1
-        robot_pos = self.gs.get_robot_position(self._team, robot_id)
-        max_speed = self.gs.robot_max_speed(self._team, robot_id)
-
-        def buffer_time(data):
-            timestamp, ball_pos = data
-            ball_travel_time = timestamp - time.time()
-            dist_robot_needs_to_travel = np.linalg.norm(ball_pos
-                                                        - robot_pos[:2])
-            robot_travel_time = dist_robot_needs_to_travel / max_speed
-            return ball_travel_time - robot_travel_time
-        index = 0
-        while(index < max_index and buffer_time(future_ball_array[index]) < 0):
-            index += 1
-        """
-        This "if/elif" covers the cases when we've exhausted the
-        future_ball_array and haven't found an last_intercept_point
-        if the last two pos entries are equal, the ball is stopped
-        and we can get there in a time longer than the
-        scope of the array, otherwise there is no intercept pos.
-        """
-        if index >= max_index:
-            if ((future_ball_array[max_index][1] ==
-                    future_ball_array[max_index - 1][1]).all):
-                return (future_ball_array[max_index][1],
-                        future_ball_array[max_index][1])
-            else:
-                return None
-        first_intercept_point = future_ball_array[index][1]
-        while ((index < max_index and
-                buffer_time(future_ball_array[index]) >= 0)):
-            index += 1
-        last_intercept_point = future_ball_array[index-1][1]
-        return first_intercept_point, last_intercept_point
+        i = intercepts['robot_ids'].index(robot_id)
+        return (intercepts['point'][i].copy(),
+                intercepts['last_point'][i].copy())
 
     def safest_intercept_point(self, robot_id: int) -> Tuple[float, float]:
         """determine the point in the ball's trajectory that the robot can reach
         soonest relative to the ball (even if it's too late)
         """
-        future_ball_array = self.get_future_ball_array()
-        robot_pos = self.gs.get_robot_position(self._team, robot_id)
-        max_speed = self.gs.robot_max_speed(self._team, robot_id)
-
-        def buffer_time(data):
-            timestamp, ball_pos = data
-            ball_travel_time = timestamp - time.time()
-            distance_robot_needs_to_travel = np.linalg.norm(ball_pos
-                                                            - robot_pos[:2])
-            robot_travel_time = distance_robot_needs_to_travel / max_speed
-            return ball_travel_time - robot_travel_time
-        if len(future_ball_array) > 0:
-            buffer_time, safest_pos = max(future_ball_array, key=buffer_time)
-        else:
-            # if the ball is not visible, return current position
-            safest_pos = robot_pos
-        return safest_pos
+        intercepts = self.intercepts()
+        if robot_id in intercepts['robot_ids'] and \
+                intercepts['possible'].any():
+            i = intercepts['robot_ids'].index(robot_id)
+            return intercepts['safest_point'][i].copy()
+        # if the ball is not visible, return current position
+        return self.gs.get_robot_position(self._team, robot_id)
 
     def intercept_distances(self, other_team=False):
         """Returns intercept distances for a team as a dictionary"""
-        dists = {}
         team = self.gs.other_team(self._team) if other_team else self._team
-        for robot_id in self.gs.get_robot_ids(team):
-            intercept_range = self.intercept_range(robot_id)
-            if intercept_range:
-                intercept_path = intercept_range[0] \
-                    - self.gs.get_robot_position(team, robot_id)[:2]
-                dists[robot_id] = np.linalg.norm(intercept_path)
-            else:
-                dists[robot_id] = np.inf
-        return dists
+        intercepts = self.intercepts(team)
+        return dict(zip(intercepts['robot_ids'],
+                        intercepts['distance'].tolist()))
 
     def rank_intercept_distances(self, other_team=False):
         """
@@ -149,8 +138,7 @@ class Analysis(object):
             ball_pos = self.gs.get_ball_position()
         if not self.gs.is_in_field(ball_pos):
             return np.array([])
-        goal_top, goal_bottom = self.gs.get_defense_goal(team)
-        goal_center = (goal_top + goal_bottom) / 2
+        goal_center = self.gs.get_defense_goal_center(team)
         ball_distance = np.linalg.norm(ball_pos - goal_center)
         distance_from_goal = min(max_distance_from_goal, ball_distance
                                  - self.gs.ROBOT_RADIUS)
@@ -173,56 +161,63 @@ class Analysis(object):
 
     # finds a legal position for robot to move to
     def find_legal_pos(self, robot_id: int, position=None,
-                       perpendicular=False) -> Tuple[float, float, float]:
+                       perpendicular=False, use_clearance_field=False
+                       ) -> Tuple[float, float, float]:
         """
         Returns a nearby legal and open position by searching around the robot.
         Searches perpendicular to the path to the goal first if
         perpendicular is set to True.
         Returns the current position if it is legal.
+        use_clearance_field is passed on to is_position_open_batch.
         """
-        if position is not None and perpendicular:
+        robot_pos = self.gs.get_robot_position(self._team, robot_id)[:2]
+        # (no direction to be perpendicular to if it's at the position)
+        if position is not None and perpendicular and \
+                (np.asarray(position)[:2] != robot_pos).any():
             position = position[:2]
-            path = position - self.gs.get_robot_position(self._team,
-                                                         robot_id)[:2]
+            path = position - robot_pos
             norm_path = path / np.linalg.norm(path)
             STEP_SIZE = self.gs.ROBOT_RADIUS
             direction = np.array([norm_path[1], -norm_path[0]])
-            for i in range(0, 2000, int(STEP_SIZE)):
-                if self.gs.is_pos_legal(position + i * direction, self._team,
-                                        robot_id) and \
-                   self.gs.is_position_open(position + i * direction,
-                                            self._team, robot_id):
-                    return position + i * direction
-                if self.gs.is_pos_legal(position - i * direction, self._team,
-                                        robot_id) and \
-                   self.gs.is_position_open(position - i * direction,
-                                            self._team, robot_id):
-                    return position - i * direction
+            # alternate sides of the path, getting further away
+            offsets = np.repeat(np.arange(0, 2000, int(STEP_SIZE)), 2)
+            offsets[1::2] *= -1
+            candidates = position + offsets[:, np.newaxis] * direction
+            valid = np.flatnonzero(self.valid_positions(
+                candidates, robot_id, use_clearance_field))
+            if len(valid):
+                return candidates[valid[0]]
             self.logger.debug("No legal perpeudicular position found")
         if position is None:
             position = self.gs.get_robot_position(self._team, robot_id)
         if len(position) == 2:
             position = (position[0], position[1], None)
         x, y, w = position
-        delta = 0
-        for delta in range(0, 1000, 10):
-            positions_to_try = [
-                np.array([x, y + delta, w]),
-                np.array([x, y - delta, w]),
-                np.array([x + delta, y, w]),
-                np.array([x - delta, y, w]),
-                np.array([x + delta, y + delta, w]),
-                np.array([x - delta, y + delta, w]),
-                np.array([x + delta, y - delta, w]),
-                np.array([x - delta, y - delta, w])
-            ]
-            for pos in positions_to_try:
-                if self.gs.is_pos_legal(pos, self._team, robot_id) and \
-                   self.gs.is_position_open(pos, self._team, robot_id):
-                    return pos
+        # try 8 directions at each distance, getting further away
+        directions = np.array([[0, 1], [0, -1], [1, 0], [-1, 0],
+                               [1, 1], [-1, 1], [1, -1], [-1, -1]])
+        deltas = np.arange(0, 1000, 10)
+        candidates = np.array([x, y]) + \
+            (deltas[:, np.newaxis, np.newaxis] * directions).reshape(-1, 2)
+        valid = np.flatnonzero(self.valid_positions(
+            candidates, robot_id, use_clearance_field))
+        if len(valid):
+            return np.array([*candidates[valid[0]], w])
         self.logger.debug("No legal position found open")
         return np.array([0, 0, 0])
 
+    def valid_positions(self, positions, robot_id: int,
+                        use_clearance_field=False):
+        """
+        Boolean mask of which rows of an (N, 2+) array of positions are
+        legal and open for one of our robots
+        """
+        legality = self.gs.get_legality_grid(self._team, robot_id)
+        return legality.are_legal(positions) & \
+            self.gs.is_position_open_batch(
+                positions, self._team, robot_id,
+                use_clearance_field=use_clearance_field)
+
     # def rate_attack_formation(self, psns) -> float:
     #     """ Rates
     #     """
@@ -233,44 +228,61 @@ class Analysis(object):
     #     return 0.0
 
     def rate_attacker_pos(self, pos: Tuple[float, float, float],
-                          robot_id: int) -> float:
+                          robot_id: int, use_clearance_field=False) -> float:
         """ Function that scores how good a position is for the attacker to
         get open for a pass. Higher ratings should indicate better positions
         """
+        return self.rate_attacker_positions([pos[:2]], robot_id,
+                                            use_clearance_field)[0]
+
+    def rate_attacker_positions(self, positions, robot_id: int,
+                                use_clearance_field=False):
+        """
+        rate_attacker_pos for each row of an (N, 2+) array of positions.
+        With use_clearance_field, the distances to the nearest opponent are
+        looked up in the gamestate's ClearanceField, which is only close to
+        exact (see ClearanceField.tolerance), and open positions are found
+        with it as in is_position_open_batch.
+        """
+        positions = np.array([p[:2] for p in positions],
+                             dtype=float).reshape(-1, 2)
         ball_pos = self.gs.get_ball_position()
-        if not self.gs.is_pos_legal(pos, self._team, robot_id) \
-                or not self.gs.is_position_open(pos, self._team, robot_id):
-            return np.NINF
+        ratings = np.full(len(positions), -np.inf)
         # TODO: Handle cases where path is blocked
-        if not self.is_straight_path_open(
-            ball_pos, pos,
-            ignore_ids=[robot_id, self.which_teammate_has_ball()],
-            buffer=0
-           ):
-            return np.NINF
+        candidates = np.flatnonzero(
+            self.valid_positions(positions, robot_id, use_clearance_field) &
+            self.straight_paths_open(
+                ball_pos, positions,
+                ignore_ids=[robot_id, self.which_teammate_has_ball()]))
+        positions = positions[candidates]
+        snapshot = self.gs.get_world_snapshot()
+
+        def distances(mask):
+            # (positions, robots) distances to the robots in mask
+            delta = positions[:, np.newaxis] - \
+                snapshot.positions[mask][np.newaxis]
+            return np.hypot(delta[..., 0], delta[..., 1])
         # Calculate the passing distance
-        pass_dist = np.linalg.norm(ball_pos - pos[:2])
+        pass_dist = np.hypot(*(ball_pos - positions).T)
         # Calculate the distance to the center of the goal
-        goal = self.gs.get_attack_goal(self._team)
-        center_of_goal = (goal[0] + goal[1]) / 2
-        goal_dist = np.linalg.norm(center_of_goal - pos[:2])
+        center_of_goal = self.gs.get_attack_goal_center(self._team)
+        goal_dist = np.hypot(*(center_of_goal - positions).T)
         # Measure of proximity to opposing robots
-        nearest_opponent_dist = self.gs.FIELD_X_LENGTH + self.gs.FIELD_Y_LENGTH
-        for opponent in self.gs.get_robot_ids(self.gs.other_team(self._team)):
-            opponent_pos = self.gs.get_robot_position(self.gs.other_team(
-                self._team), opponent)
-            opponent_dist = np.linalg.norm(opponent_pos[:2] - pos[:2])
-            nearest_opponent_dist = min(nearest_opponent_dist, opponent_dist)
+        max_dist = self.gs.FIELD_X_LENGTH + self.gs.FIELD_Y_LENGTH
+        other_team = self.gs.other_team(self._team)
+        if use_clearance_field:
+            nearest_opponent_dist = np.minimum(
+                self.gs.get_clearance_field().robot_distances(
+                    positions, other_team), max_dist)
+        else:
+            nearest_opponent_dist = np.min(
+                distances(snapshot.team_mask(other_team)), axis=1,
+                initial=max_dist)
         # Measure of the spread of a formation
-        teammate_sum = 0
-        # nearest_teammate_dist = self.gs.FIELD_X_LENGTH + self.gs.FIELD_Y_LENGTH  # noqa
-        for teammate in self.gs.get_robot_ids(self._team):
-            if teammate != robot_id:
-                teammate_pos = self.gs.get_robot_position(self._team, teammate)
-                teammate_dist = np.linalg.norm(teammate_pos[:2] - pos[:2])
-                # nearest_teammate_dist = min(nearest_teammate_dist,
-                #                             teammate_dist)
-                teammate_sum += 1000 * np.exp(- (teammate_dist / 1200) ** 2)
+        teammates = snapshot.team_mask(self._team) & \
+            snapshot.others_mask(self._team, robot_id)
+        teammate_sum = np.sum(
+            1000 * np.exp(- (distances(teammates) / 1200) ** 2), axis=1)
         # Rate the position based on metrics
         # TODO: come up with a better metric to use
         pass_rtg = 3000 * np.exp(- (pass_dist / 2500) ** 2)
@@ -279,12 +291,14 @@ class Analysis(object):
         # team_rtg = 2 * nearest_teammate_dist
         team_rtg = teammate_sum
         # also consider off-centeredness
-        goal_offctr = abs((pos[1] - center_of_goal[1]) /
-                          (pos[0] - center_of_goal[0]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            goal_offctr = np.abs((positions[:, 1] - center_of_goal[1]) /
+                                 (positions[:, 0] - center_of_goal[0]))
         ctr_rtg = -50 * goal_offctr
         # Add together considerations
-        parameters = [pass_rtg, goal_rtg, oppt_rtg, team_rtg, ctr_rtg]
-        return (sum(parameters))
+        ratings[candidates] = pass_rtg + goal_rtg + oppt_rtg + team_rtg + \
+            ctr_rtg
+        return ratings
 
     def attacker_get_open(self, robot_id: int) -> Tuple[float, float, float]:
         """Sends the attacker to a locally optimal position."""
@@ -294,8 +308,8 @@ class Analysis(object):
         test_posns = [(robot_x + dx * STEP_SIZE,
                        robot_y + dy * STEP_SIZE)
                       for dx in steps for dy in steps]
-        return max(test_posns, key=lambda p: self.rate_attacker_pos(p,
-                                                                    robot_id))
+        ratings = self.rate_attacker_positions(test_posns, robot_id)
+        return test_posns[int(np.argmax(ratings))]
 
     def find_attacker_pos(self, robot_id: int) -> Tuple[float, float, float]:
         """
@@ -305,25 +319,16 @@ class Analysis(object):
         """
         # TODO: Make it select positions that attacker would shoot from
         best_pos = self.gs.get_robot_position(self._team, robot_id)
-        best_rating = self.rate_attacker_pos(best_pos, robot_id)
         ball_x, ball_y = self.gs.get_ball_position()
         RANGE = 1500
         STEP_SIZE = 300
-        x = ball_x - RANGE
-        while x <= ball_x + RANGE:
-            y = ball_y - RANGE
-            while y <= ball_y + RANGE:
-                new_pos = [x, y, None]
-                new_rating = self.rate_attacker_pos(new_pos, robot_id)
-                if new_rating > best_rating:
-                    best_pos = new_pos
-                    best_rating = new_rating
-                y += STEP_SIZE
-            x += STEP_SIZE
-        return best_pos
-
-    # TODO: speed up first_path_obstacle
-    # and is_path_blocked using approach of is_straight_path_open
+        offsets = np.arange(-RANGE, RANGE + 1, STEP_SIZE)
+        test_posns = [best_pos] + [[ball_x + dx, ball_y + dy, None]
+                                   for dx in offsets for dy in offsets]
+        # only move if a position is strictly better than the current one
+        ratings = self.rate_attacker_positions(test_posns, robot_id)
+        return test_posns[int(np.argmax(ratings))]
+
     def first_path_obstacle(self, s_pos, g_pos, robot_id,
                             buffer_dist=0, allow_illegal=False):
         "finds first obstacle in a linear robot trajectory"
@@ -333,24 +338,29 @@ class Analysis(object):
         if (g_pos == s_pos).all():
             return None
 
-        def legal(pos):
-            return self.gs.is_pos_legal(pos,
-                                        self._team, robot_id) or allow_illegal
+        # where the path first touches a robot or breaks a rule
+        contact = self.path_contacts(s_pos, g_pos, robot_id, buffer_dist,
+                                     allow_illegal)[0]
         path = g_pos - s_pos
-        norm_path = path / np.linalg.norm(path)
-        STEP_SIZE = self.gs.ROBOT_RADIUS
+        length = np.linalg.norm(path)
+        if contact > length:
+            return None
+        return s_pos + path / length * contact
 
-        # step along the path and look for a blocked point
-        steps = int(np.floor(np.linalg.norm(path) / STEP_SIZE))
-        for i in range(1, steps + 1):
-            intermediate_pos = s_pos + norm_path * STEP_SIZE * i
-            np.append(intermediate_pos, 0)
-            if not self.gs.is_position_open(intermediate_pos,
-                                            self._team,
-                                            robot_id, buffer_dist) \
-                    or not legal(intermediate_pos):
-                return intermediate_pos
-        return None
+    def path_contacts(self, s_positions, g_positions, robot_id,
+                      buffer_dist=0, allow_illegal=False):
+        """
+        Distance along each straight path from s_positions to g_positions
+        at which the robot first hits another robot (or its buffer) or
+        breaks a rule, or inf if it never does (see gamestate.collision)
+        """
+        segments = Segments(s_positions, g_positions)
+        contacts = self.gs.first_robot_contact(segments, self._team,
+                                               robot_id, buffer_dist)
+        if not allow_illegal:
+            contacts = np.minimum(contacts, self.gs.first_illegal_distance(
+                segments, self._team, robot_id))
+        return contacts
 
     def is_path_blocked(self, s_pos, g_pos, robot_id,
                         buffer_dist=0, allow_illegal=False):
@@ -363,8 +373,8 @@ class Analysis(object):
         # Check endpoint first to avoid worrying about step size in the loop
 
         def legal(pos):
-            return self.gs.is_pos_legal(pos,
-                                        self._team, robot_id) or allow_illegal
+            legality = self.gs.get_legality_grid(self._team, robot_id)
+            return allow_illegal or legality.is_legal(pos)
         if not self.gs.is_position_open(g_pos, self._team,
                                         robot_id) or not legal(g_pos):
             return True
@@ -384,40 +394,51 @@ class Analysis(object):
         about whether it is legal for robots.
         Should be used when finding a path to send the ball.
         """
+        return bool(self.straight_paths_open(
+            s_pos, [g_pos[:2]], ignore_ids, ignore_opp_ids, buffer)[0])
+
+    def straight_paths_open(self, s_pos, g_positions, ignore_ids=[],
+                            ignore_opp_ids=[], buffer=None):
+        """
+        is_straight_path_open from s_pos to each row of an (N, 2) array of
+        goal positions, as a boolean mask
+        """
         if buffer is None:
             buffer = 2 * self.gs.ROBOT_RADIUS
-        robot_positions = self.gs.get_all_robot_positions()
-        s_pos = s_pos[:2]
-        g_pos = g_pos[:2]
-        if (s_pos == g_pos).all():
-            return True
-        x1, y1 = s_pos[:2]
-        x2, y2 = g_pos[:2]
-        line_unit_vector = (s_pos - g_pos) / np.linalg.norm(s_pos - g_pos)
-        for pos in robot_positions:
-            if pos[0][0] == self._team and pos[0][1] in ignore_ids \
-                or pos[0][0] == self.gs.other_team(self._team) and \
-                    pos[0][1] in ignore_opp_ids:
-                continue
-            pos = pos[1][:2]
-            self.logger.debug(f"{pos}")
-            x3, y3 = pos[:2]
-            if np.dot(line_unit_vector, (s_pos - pos)) > 0 and \
-                    np.dot(line_unit_vector,
-                           (pos - g_pos)) > -1 * self.gs.ROBOT_RADIUS:
-                distance_from_line = abs((-(y2-y1)*x3 + (x2-x1)*y3 - y1*(x2-x1)
-                                         + x1*(y2-y1)) /
-                                         np.linalg.norm(g_pos-s_pos))
-                if distance_from_line < 2 * self.gs.ROBOT_RADIUS:
-                    return False
-        return True
+        snapshot = self.gs.get_world_snapshot()
+        s_pos = np.asarray(s_pos, dtype=float)[:2]
+        g_positions = np.asarray(g_positions, dtype=float).reshape(-1, 2)
+        considered = np.ones(len(snapshot), dtype=bool)
+        ignored = [(self._team, i) for i in ignore_ids] + \
+            [(self.gs.other_team(self._team), i) for i in ignore_opp_ids]
+        for key in ignored:
+            if key in snapshot.index:
+                considered[snapshot.index[key]] = False
+        # (goals, robots) arrays
+        positions = snapshot.positions[considered][np.newaxis]
+        paths = (g_positions - s_pos)[:, np.newaxis]
+        path_lengths = np.hypot(paths[..., 0], paths[..., 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            line_unit_vectors = -paths / path_lengths[..., np.newaxis]
+            # robots between the start and (just past) the goal
+            between = (np.sum((s_pos - positions) * line_unit_vectors,
+                              axis=2) > 0) & \
+                (np.sum((positions - g_positions[:, np.newaxis]) *
+                        line_unit_vectors, axis=2) >
+                 -1 * self.gs.ROBOT_RADIUS)
+            offsets = positions - s_pos
+            distances_from_line = np.abs(
+                paths[..., 0] * offsets[..., 1] -
+                paths[..., 1] * offsets[..., 0]) / path_lengths
+        blocked = between & (distances_from_line < 2 * self.gs.ROBOT_RADIUS)
+        # paths of length 0 are always open
+        return ~blocked.any(axis=1) | (path_lengths[:, 0] == 0)
 
     def within_shooting_range(self, team, robot_id):
         # shooting range
         shoot_range = 2000
         # get center goal and robot positions
-        goal = self.gs.get_attack_goal(team)
-        center_of_goal = (goal[0] + goal[1]) / 2
+        center_of_goal = self.gs.get_attack_goal_center(team)
         robot_pos = self.gs.get_robot_position(team, robot_id)[:2]
         return np.linalg.norm(robot_pos - center_of_goal) < shoot_range
 
@@ -426,51 +447,47 @@ class Analysis(object):
         """generate RRT waypoints"""
         goal_pos = np.array(goal_pos)
         start_pos = np.array(start_pos)
-        graph = {tuple(start_pos): []}
-        prev = {tuple(start_pos): None}
-        cnt = 0
+        STEP_SIZE = self.gs.ROBOT_RADIUS
+
+        # new edges keep a buffer from the other robots
+        def segment_contact(starts, ends):
+            return self.path_contacts(starts, ends, robot_id, buffer_dist=100,
+                                      allow_illegal=allow_illegal)
+        tree = RRT(start_pos, STEP_SIZE, segment_contact=segment_contact)
         success = False
-        for _ in range(lim):
-            # use gamestate.random_position()
-            new_pos = np.array(
-                [np.random.randint(self.gs.FIELD_MIN_X, self.gs.FIELD_MAX_X),
-                 np.random.randint(self.gs.FIELD_MIN_Y, self.gs.FIELD_MAX_Y),
-                 0.0])
-            if np.random.random() < 0.05:
-                new_pos = goal_pos
-
-            if not self.gs.is_position_open(new_pos, self._team,
-                                            robot_id, buffer_dist=0) \
-               or tuple(new_pos) in graph:
+        # draw all of the samples (and check if they are open) at once
+        samples = np.zeros((lim, 3))
+        samples[:, 0] = np.random.randint(self.gs.FIELD_MIN_X,
+                                          self.gs.FIELD_MAX_X, lim)
+        samples[:, 1] = np.random.randint(self.gs.FIELD_MIN_Y,
+                                          self.gs.FIELD_MAX_Y, lim)
+        use_goal = np.random.random(lim) < 0.05
+        is_open = self.gs.is_position_open_batch(samples, self._team,
+                                                 robot_id, buffer_dist=0)
+        legality = self.gs.get_legality_grid(self._team, robot_id)
+        is_open &= legality.are_legal(samples)
+        if use_goal.any():
+            is_open[use_goal] = self.gs.is_position_open(
+                goal_pos, self._team, robot_id, buffer_dist=0) and \
+                legality.is_legal(goal_pos)
+        for i in range(lim):
+            if not is_open[i]:
                 continue
-
-            nearest_pos = self.get_nearest_pos(graph, tuple(new_pos))
-            extend_pos = self.extend(nearest_pos, new_pos, robot_id=robot_id)
-            if extend_pos is None:
+            new_pos = goal_pos if use_goal[i] else samples[i]
+            row = tree.extend(new_pos)
+            if row is None:
                 continue
-
-            graph[tuple(extend_pos)] = [nearest_pos]
-            graph[nearest_pos].append(tuple(extend_pos))
-            prev[tuple(extend_pos)] = nearest_pos
-
-            if np.linalg.norm(extend_pos[:2]
+            if np.linalg.norm(tree.nodes[row]
                               - goal_pos[:2]) < self.gs.ROBOT_RADIUS:
                 success = True
                 break
 
-            cnt += 1
-
         if not success:
             self.logger.debug("RRT path find failing")
             return success
 
-        pos = self.get_nearest_pos(graph, goal_pos)
-        # get nearest position to goal in graph
-        path = []
-        while not (pos[:2] == start_pos[:2]).all():
-            path.append(pos)
-            pos = prev[pos]
-        path.reverse()
+        # the nodes leading to the one that reached the goal
+        path = [tuple(pos) for pos in tree.path(row)[1:]]
 
         # Smooth path to reduce zig zagging
         i = 0
@@ -491,45 +508,171 @@ class Analysis(object):
         self.set_waypoints(robot_id, path + [goal_pos])
         return success
 
-    # RRT helper
-    def get_nearest_pos(self, graph, new_pos):
-        rtn = None
-        min_dist = float('inf')
-        for pos in graph:
-            dist = np.sqrt((new_pos[0] - pos[0]) ** 2
-                           + (new_pos[1] - pos[1]) ** 2)
-            if dist < min_dist:
-                min_dist = dist
-                rtn = pos
-        return rtn
-
-    # RRT helper
-    def extend(self, s_pos, g_pos, robot_id=None):
-        s_pos = np.array(s_pos)[:2]
-        g_pos = np.array(g_pos)[:2]
-
-        if (g_pos == s_pos).all():
+    def RRT_star_path_find(self, start_pos, goal_pos, robot_id,
+                           allow_illegal=False, samples_per_tick=300,
+                           time_budget=.005):
+        """
+        Improve the robot's RRT* tree, which is kept between calls, with up
+        to samples_per_tick samples (or time_budget seconds, outside of
+        lockstep), and set waypoints along its best path to the goal.
+        The tree is keyed on the goal and the version of the map it was
+        grown on (the legality rules and refbox command), and started afresh
+        when either changes; moving robots are pruned from it instead.
+        Returns whether the tree has a path to the goal yet.
+        """
+        goal_pos = np.array(goal_pos)
+        start_pos = np.array(start_pos)
+        self._planned_robots.add(robot_id)
+        # keep the same buffer from the other robots as RRT_path_find
+        snapshot = self.gs.get_world_snapshot()
+        obstacles = snapshot.positions[
+            snapshot.others_mask(self._team, robot_id)]
+        clearance = self.gs.ROBOT_RADIUS * 2 + 100
+        legality = self.gs.get_legality_grid(self._team, robot_id)
+
+        def is_free(points):
+            free = points_clear(points, obstacles, clearance)
+            if not allow_illegal:
+                free &= legality.are_legal(points)
+            return free
+
+        # edges are checked exactly
+        def segment_contact(starts, ends):
+            return self.path_contacts(starts, ends, robot_id, buffer_dist=100,
+                                      allow_illegal=allow_illegal)
+
+        # a tree grown towards another goal has its samples in the wrong
+        # place (see informed_samples), and one grown under other rules has
+        # its edges through what may now be illegal
+        SAME_GOAL_THRESHOLD = 100
+        map_version = (legality.key, self.gs.get_refbox_command(),
+                       allow_illegal)
+        tree_goal, tree_map_version, tree = self._rrt_star_trees.get(
+            robot_id, (None, None, None))
+        if tree is not None and (
+                tree_map_version != map_version or np.linalg.norm(
+                    goal_pos[:2] - tree_goal[:2]) >= SAME_GOAL_THRESHOLD):
+            tree = None
+        # drop what the obstacles moved onto and follow the robot
+        if tree is not None:
+            tree.segment_contact = segment_contact
+            tree.prune(is_free)
+            if not tree.reroot(start_pos, is_free):
+                tree = None
+        if tree is None:
+            tree = RRTStar(start_pos, self.gs.ROBOT_RADIUS,
+                           segment_contact=segment_contact)
+            tree_goal = goal_pos
+        self._rrt_star_trees[robot_id] = (tree_goal, map_version, tree)
+
+        deadline = None
+        if not self.gs.is_clock_simulated():
+            deadline = time.perf_counter() + time_budget
+        _, best_cost = tree.best_path(goal_pos, is_free)
+        if len(tree) >= tree.max_nodes:
+            tree.make_room(goal_pos, best_cost)
+        bounds = (self.gs.FIELD_MIN_X, self.gs.FIELD_MAX_X,
+                  self.gs.FIELD_MIN_Y, self.gs.FIELD_MAX_Y)
+        samples = informed_samples(start_pos, goal_pos, best_cost,
+                                   samples_per_tick, bounds)
+        tree.grow(samples, is_free, deadline)
+
+        row, _ = tree.best_path(goal_pos, is_free)
+        if row is None:
+            self.logger.debug("RRT* path find failing")
             return False
+        path = [tuple(pos) for pos in tree.path(row)[1:]]
+        self.set_waypoints(robot_id, path + [goal_pos])
+        return True
 
-        path = g_pos - s_pos
-        norm_path = path / np.linalg.norm(path)
-        STEP_SIZE = self.gs.ROBOT_RADIUS
+    def grid_path_find(self, start_pos, goal_pos, robot_id,
+                       allow_illegal=False, buffer_dist=100,
+                       max_expansions=1000, time_budget=.005):
+        """
+        Set waypoints along a Theta* path over the team's occupancy grid,
+        keeping buffer_dist from the other robots. The robot keeps following
+        its last path to the same goal cell until that path is blocked (see
+        follow_grid_path), and only then searches again, expanding up to
+        max_expansions cells (for up to time_budget seconds, outside of
+        lockstep).
+        Returns whether there is a path.
+        """
+        goal_pos = np.array(goal_pos)
+        start_pos = np.array(start_pos)
+        self._planned_robots.add(robot_id)
+        clearance = self.gs.ROBOT_RADIUS * 2 + buffer_dist
+        grid = self.gs.get_occupancy_grid(self._team, robot_id, clearance,
+                                          allow_illegal)
+        start_cell = grid.cell_index(start_pos)
+        goal_cell = grid.cell_index(goal_pos)
+        if start_cell is None or goal_cell is None:
+            self.logger.debug("Grid path find outside of the field")
+            self._grid_paths.pop(robot_id, None)
+            return False
+        turns = None
+        last_goal_cell, last_turns = self._grid_paths.get(robot_id,
+                                                          (None, None))
+        if last_goal_cell == goal_cell:
+            turns = self.follow_grid_path(start_pos, last_turns, goal_pos,
+                                          robot_id, buffer_dist / 2,
+                                          allow_illegal)
+        if turns is None:
+            deadline = None
+            if not self.gs.is_clock_simulated():
+                deadline = time.perf_counter() + time_budget
+            blocked = grid.blocked_for(self._team, robot_id, start_pos,
+                                       goal_pos)
+            cells = theta_star(blocked, grid.shape, start_cell, goal_cell,
+                               max_expansions, deadline)
+            if cells is None:
+                self.logger.debug("Grid path find failing")
+                self._grid_paths.pop(robot_id, None)
+                return False
+            # (the cells the path turns at, between the exact start and goal)
+            cells = np.array(cells[1:-1], dtype=float).reshape(-1, 2)
+            corner = np.array([grid.min_x, grid.min_y])
+            turns = corner + (cells + .5) * grid.resolution
+        self._grid_paths[robot_id] = (goal_cell, turns)
+        self.set_waypoints(robot_id,
+                           [tuple(pos) for pos in turns] + [goal_pos])
+        return True
 
-        # step along the path and check if any points are blocked
-        poses = [None]
-        steps = int(np.floor(np.linalg.norm(path) / STEP_SIZE))
-        for i in range(1, steps + 1):
-            intermediate_pos = s_pos + norm_path * STEP_SIZE * i
-            np.append(intermediate_pos, 0)
-            if not self.gs.is_position_open(intermediate_pos, self._team,
-                                            robot_id, buffer_dist=100) or \
-               not self.gs.is_pos_legal(g_pos, self._team, robot_id):
-                break
-            if np.linalg.norm(intermediate_pos - s_pos) > 4 * STEP_SIZE:
-                break
-            poses.append(intermediate_pos)
+    def follow_grid_path(self, start_pos, turns, goal_pos, robot_id,
+                         buffer_dist, allow_illegal=False):
+        """
+        The turns of an earlier path to the goal that are still ahead of a
+        robot which has moved along it: it heads straight for the furthest
+        turn (or the goal) it can reach without coming within buffer_dist of
+        another robot or breaking a rule, and the path from there on has to
+        be clear in the same way.
+        Returns the remaining turns as an (n, 2) array, or None if the path
+        is blocked.
+        """
+        points = np.vstack((turns, goal_pos[:2]))
+        starts = np.repeat([start_pos[:2]], len(points), axis=0)
+        in_reach = np.isinf(self.path_contacts(
+            starts, points, robot_id, buffer_dist, allow_illegal))
+        if not in_reach.any():
+            return None
+        k = np.flatnonzero(in_reach)[-1]
+        if not np.isinf(self.path_contacts(
+                points[k:-1], points[k + 1:], robot_id, buffer_dist,
+                allow_illegal)).all():
+            return None
+        return turns[k:]
 
-        return poses[-1]
+    def drop_unused_plans(self):
+        """
+        Forget the grid paths and RRT* trees of the robots that didn't path
+        find this tick, so that a robot coming back to path finding
+        later (from somewhere else) starts afresh rather than from a stale
+        plan. Called at the end of every tick.
+        """
+        for plans in (self._grid_paths, self._rrt_star_trees):
+            for robot_id in list(plans):
+                if robot_id not in self._planned_robots:
+                    del plans[robot_id]
+        self._planned_robots.clear()
 
     def greedy_path_find(self, start_pos, goal_pos,
                          robot_id, lim=10, allow_illegal: bool = False):
@@ -572,11 +715,81 @@ class Analysis(object):
         other_team = self.gs.other_team(our_team)
         enemy_robot_ids = self.gs.get_robot_ids(other_team)
         enemy_robot_distances = []
-        goal_top, goal_bottom = self.gs.get_defense_goal(self._team)
-        goal_center = (goal_top + goal_bottom) / 2
+        goal_center = self.gs.get_defense_goal_center(self._team)
         for id in enemy_robot_ids:
             distance = np.linalg.norm(self.gs.get_robot_position(id)
                                       - goal_center)
             enemy_robot_distances.append((id, distance))
         threats = enemy_robot_distances.sort(key=lambda x: x[-1])
         return threats
+
+
+def solve_intercepts(times, ball_positions, robot_positions, max_speeds):
+    """
+    Finds where each robot can intercept the ball along its predicted
+    trajectory, for all robots at once.
+
+    Args:
+        times: (n,) seconds from now of each trajectory sample, increasing
+        ball_positions: (n, 2) ball position at each sample, the ball is
+            assumed to stay at the last one
+        robot_positions: (r, 2) current robot positions
+        max_speeds: (r,) robot max speeds
+
+    Returns a dict of arrays, one row per robot:
+        possible: whether there was a trajectory to intercept (the same for
+            every robot, False if the ball is not in the field)
+        time: earliest time the robot can meet the ball
+        point: the first trajectory point the robot can reach before the
+            ball, or the final one if it can't reach any before the ball
+        last_point: the last point of the first stretch of trajectory the
+            robot can reach before the ball
+        margin: how much earlier than the ball the robot gets to point
+            (negative if it gets there later)
+        safest_point: the point the robot reaches soonest relative to the
+            ball
+        distance: how far the robot is from point (inf if not possible)
+    """
+    num_robots = len(robot_positions)
+    num_samples = len(times)
+    if num_samples == 0:
+        nan_points = np.full((num_robots, 2), np.nan)
+        return {
+            'possible': np.zeros(num_robots, dtype=bool),
+            'time': np.full(num_robots, np.inf),
+            'point': nan_points,
+            'last_point': nan_points.copy(),
+            'margin': np.full(num_robots, -np.inf),
+            'safest_point': nan_points.copy(),
+            'distance': np.full(num_robots, np.inf),
+        }
+    # (robots, samples) how long each robot takes to get to each sample
+    offsets = ball_positions[np.newaxis] - robot_positions[:, np.newaxis]
+    robot_times = np.hypot(offsets[..., 0], offsets[..., 1]) / \
+        max_speeds[:, np.newaxis]
+    margins = times[np.newaxis] - robot_times
+    rows = np.arange(num_robots)
+    # the final sample isn't searched - if the ball couldn't be reached
+    # earlier it is where it ends up (stopped or leaving the field)
+    max_index = num_samples - 1
+    reachable = margins[:, :max_index] >= 0
+    has_intercept = reachable.any(axis=1)
+    # (a True column at max_index makes argmax fall back to it)
+    end_column = np.ones((num_robots, 1), dtype=bool)
+    first = np.hstack((reachable, end_column)).argmax(axis=1)
+    # the intercept stretch ends before the next unreachable sample
+    sample_indices = np.arange(max_index)
+    unreachable_after = ~reachable & \
+        (sample_indices[np.newaxis] > first[:, np.newaxis])
+    last = np.hstack((unreachable_after, end_column)).argmax(axis=1) - 1
+    last = np.where(has_intercept, last, max_index)
+    point = ball_positions[first]
+    return {
+        'possible': np.ones(num_robots, dtype=bool),
+        'time': np.maximum(times[first], robot_times[rows, first]),
+        'point': point,
+        'last_point': ball_positions[last],
+        'margin': margins[rows, first],
+        'safest_point': ball_positions[margins.argmax(axis=1)],
+        'distance': np.hypot(*(point - robot_positions).T),
+    }
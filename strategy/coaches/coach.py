@@ -77,7 +77,7 @@ class Coach(object):
             current_pos = self.gs.get_robot_position(self._team, robot_id)
             # Get out of illegal positions immediately
             if not self.gs.is_pos_legal(current_pos, self._team, robot_id):
-                self.logger.debug(f"Illegal position for robot {robot_id}")
+                self.logger.debug("Illegal position for robot %s", robot_id)
                 new_pos = self._strategy.find_legal_pos(robot_id, current_pos)
                 self._strategy.path_find(robot_id, new_pos, allow_illegal=True)
 
@@ -0,0 +1,132 @@
+"""
+Any-angle path planning over a grid of blocked cells (Lazy Theta*).
+
+Unlike the random trees in rrt.py, the same grid, start and goal always
+give the same path, and a search never expands more than every cell of the
+grid once, so it doesn't fail or switch between paths by chance. Theta* is
+A* where a cell's parent can be any earlier cell on the path in straight
+line of sight, which gives paths that aren't restricted to the 8 grid
+directions. The lazy version only checks line of sight when a cell is
+expanded rather than for every neighbour.
+
+Searches can be bounded by a number of expansions or a deadline.
+"""
+import heapq
+import math
+import time
+
+# (di, dj) of the 8 neighbours of a cell
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1),
+              (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def line_of_sight(blocked, ny, a, b):
+    """
+    Whether the straight line between the centers of the cells at flat
+    indices a and b of a grid with ny columns only crosses open cells
+    (where it goes exactly through a corner, both cells beside it must be
+    open). blocked is a flat sequence of booleans.
+    """
+    i, j = divmod(a, ny)
+    bi, bj = divmod(b, ny)
+    di, dj = abs(bi - i), abs(bj - j)
+    si = 1 if bi > i else -1
+    sj = 1 if bj > j else -1
+    # the line crosses the i borders at (2 ci + 1) / (2 di) of the way and
+    # the j borders at (2 cj + 1) / (2 dj), compared without dividing
+    ci = cj = 1
+    while i != bi or j != bj:
+        cross_i, cross_j = ci * dj, cj * di
+        if cross_i < cross_j:
+            i += si
+            ci += 2
+        elif cross_j < cross_i:
+            j += sj
+            cj += 2
+        else:
+            if blocked[(i + si) * ny + j] or blocked[i * ny + j + sj]:
+                return False
+            i += si
+            j += sj
+            ci += 2
+            cj += 2
+        if blocked[i * ny + j]:
+            return False
+    return True
+
+
+def theta_star(blocked, shape, start, goal, max_expansions=None,
+               deadline=None):
+    """
+    Shortest any-angle path from the start cell to the goal cell ((i, j)
+    indices) through the open cells of a grid of the given shape, as a list
+    of the (i, j) cells where it turns, including the start and goal.
+    blocked is a flat boolean array or list (see OccupancyGrid.blocked_for).
+    Returns None if the goal can't be reached, or isn't reached within
+    max_expansions cells or before time.perf_counter() passes the deadline.
+    """
+    nx, ny = shape
+    if hasattr(blocked, 'tolist'):
+        blocked = blocked.tolist()
+    s = start[0] * ny + start[1]
+    g = goal[0] * ny + goal[1]
+    if blocked[s] or blocked[g]:
+        return None
+    gi, gj = goal
+
+    def heuristic(n):
+        i, j = divmod(n, ny)
+        return math.hypot(i - gi, j - gj)
+
+    def distance(a, b):
+        ai, aj = divmod(a, ny)
+        bi, bj = divmod(b, ny)
+        return math.hypot(ai - bi, aj - bj)
+
+    def neighbours(n):
+        i, j = divmod(n, ny)
+        for di, dj in NEIGHBOURS:
+            ni, nj = i + di, j + dj
+            if not (0 <= ni < nx and 0 <= nj < ny) or \
+                    blocked[ni * ny + nj]:
+                continue
+            # (no cutting corners diagonally)
+            if di and dj and (blocked[ni * ny + j] or blocked[i * ny + nj]):
+                continue
+            yield ni * ny + nj, math.hypot(di, dj)
+
+    costs = {s: 0.}
+    parents = {s: s}
+    closed = set()
+    heap = [(heuristic(s), s)]
+    while heap:
+        _, n = heapq.heappop(heap)
+        if n in closed:
+            continue
+        parent = parents[n]
+        if not line_of_sight(blocked, ny, parent, n):
+            # go through the best expanded neighbour instead
+            costs[n], parents[n] = min(
+                (costs[m] + step, m) for m, step in neighbours(n)
+                if m in closed)
+        if n == g:
+            break
+        closed.add(n)
+        if max_expansions is not None and len(closed) >= max_expansions or \
+                deadline is not None and time.perf_counter() > deadline:
+            return None
+        parent = parents[n]
+        for m, _ in neighbours(n):
+            if m in closed:
+                continue
+            cost = costs[parent] + distance(parent, m)
+            if cost < costs.get(m, math.inf):
+                costs[m] = cost
+                parents[m] = parent
+                heapq.heappush(heap, (cost + heuristic(m), m))
+    else:
+        return None
+    path = [g]
+    while path[-1] != s:
+        path.append(parents[path[-1]])
+    return [divmod(n, ny) for n in reversed(path)]
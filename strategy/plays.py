@@ -90,8 +90,7 @@ class Plays:
         goal and centered on that line.
         """
         ball_pos = self.gs.get_ball_position()
-        goal_top, goal_bottom = self.gs.get_defense_goal(self._team)
-        goal_center = (goal_top + goal_bottom) / 2
+        goal_center = self.gs.get_defense_goal_center(self._team)
         distance_from_goal = np.linalg.norm(ball_pos - goal_center)
         # TODO: Choose legal position
         block_pos = self.block_goal_center_pos(
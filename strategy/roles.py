@@ -1,7 +1,6 @@
 # pylint: disable=maybe-no-member
 import numpy as np
 from random import random
-import time
 
 
 class Roles:
@@ -63,8 +62,7 @@ class Roles:
         team = self._team
         # Shooting velocity
         shoot_velocity = 1200
-        goal = self.gs.get_attack_goal(team)
-        center_of_goal = (goal[0] + goal[1]) / 2
+        center_of_goal = self.gs.get_attack_goal_center(team)
         robot_pos = self.gs.get_robot_position(team, robot_id)
         # TODO: Movement and receive ball
         # Shoots if has the ball
@@ -80,7 +78,7 @@ class Roles:
                 team_position_data = self.gs.get_team_positions(team)
                 team_posns = {}
                 for id, pos_data in team_position_data.items():
-                    team_posns[id] = pos_data[0][1]
+                    team_posns[id] = pos_data.latest_position()
                 best_teammates = sorted(
                     team_posns.items(),
                     key=lambda x: self.rate_attacker_pos(x[1], x[0]),
@@ -89,7 +87,7 @@ class Roles:
                 for teammate in best_teammates:
                     teammate_id, teammate_pos = teammate
                     if teammate_id == robot_id:
-                        self.logger.debug(f"{robot_id} not passing")
+                        self.logger.debug("%s not passing", robot_id)
                         break
                     # if self.rate_attacker_pos(robot_pos, robot_id) \
                     #    < self.rate_attacker_pos(teammate_pos, teammate_id):
@@ -99,14 +97,15 @@ class Roles:
                         #         ignore_ids=[robot_id, teammate_id],
                         #         buffer=0
                         #    ):
-                        self.logger.debug(f"{robot_id} pass to {teammate_id}")
+                        self.logger.debug("%s pass to %s",
+                                          robot_id, teammate_id)
                         self.pass_ball(robot_id, teammate_id)
                         break
                 # self.set_dribbler(robot_id, True)
                 # self.set_waypoints(robot_id,
                 #     [self.attacker_get_open(robot_id)])
         else:
-            self.logger.debug(f"{robot_id} trying to get ball")
+            self.logger.debug("%s trying to get ball", robot_id)
             ball_pos = self.gs.get_ball_position()
             if self.gs.is_pos_legal(ball_pos, team, robot_id):
                 self.get_ball(robot_id, charge_during=shoot_velocity)
@@ -118,7 +117,7 @@ class Roles:
         """Commands a given robot id to play as attacker without a ball"""
         MIN_REFRESH_INTERVAL = .1
         if robot_id not in self._last_pathfind_times or \
-           time.time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL:  # noqa
+           self.gs.current_time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL:  # noqa
             pos_x, pos_y = self.attacker_get_open(robot_id)
             ball_pos = self.gs.get_ball_position()
             pos_w = self.face_pos([pos_x, pos_y], ball_pos)
@@ -129,7 +128,7 @@ class Roles:
         """Commands a given robot id to play as attacker without a ball"""
         MIN_REFRESH_INTERVAL = .1
         if robot_id not in self._last_pathfind_times or \
-           time.time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL:  # noqa
+           self.gs.current_time() - self._last_pathfind_times[robot_id] > MIN_REFRESH_INTERVAL:  # noqa
             pos_x, pos_y = self.attacker_get_open(robot_id)
             ball_pos = self.gs.get_ball_position()
             pos_w = self.face_pos([pos_x, pos_y], ball_pos)
@@ -138,8 +137,7 @@ class Roles:
     def defender(self, robot_id):
         ball_pos = self.gs.get_ball_position()
         curr_pos = self.gs.get_robot_position(self._team, robot_id)[0:2]
-        goal_top, goal_bottom = self.gs.get_defense_goal(self._team)
-        goal_center = (goal_top + goal_bottom) / 2
+        goal_center = self.gs.get_defense_goal_center(self._team)
         maxDistance = np.linalg.norm(curr_pos - goal_center)
         interceptPos = self.block_goal_center_pos(
             maxDistance, ball_pos, team=self._team
@@ -0,0 +1,601 @@
+"""
+Rapidly exploring random trees with array backed nodes.
+
+RRT path finding used to keep its tree in a dict of position tuples, scan
+every node in Python to find the nearest one to each sample, and step along
+each new edge checking the gamestate one point at a time, which made a
+single search quadratic in the number of samples. Here the nodes live in
+growing numpy arrays, an incremental grid answers nearest node queries by
+only looking at the cells around the sample, and the points along a new
+edge are checked against every obstacle in one numpy expression.
+
+RRTStar trees can also be kept from one strategy tick to the next: they
+drop the nodes that obstacles have moved onto, move their root to where the
+robot is now, and keep lowering the cost of their paths with more samples.
+"""
+import time
+import numpy as np
+
+
+class NodeGrid(object):
+    """
+    Incremental uniform grid over the nodes of a tree, for nearest node
+    queries. Nodes are referred to by their row in the tree's arrays.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = dict()  # (cell x, cell y): list of rows
+        # bounds of the occupied cells, [min x, min y, max x, max y]
+        self._bounds = None
+
+    def _cell(self, pos):
+        return (int(np.floor(pos[0] / self.cell_size)),
+                int(np.floor(pos[1] / self.cell_size)))
+
+    def insert(self, row, pos):
+        cell = self._cell(pos)
+        self._cells.setdefault(cell, []).append(row)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self._bounds = [min(self._bounds[0], cell[0]),
+                            min(self._bounds[1], cell[1]),
+                            max(self._bounds[2], cell[0]),
+                            max(self._bounds[3], cell[1])]
+
+    def _ring(self, cell, ring):
+        """Rows in the cells at a chebyshev distance of ring from cell"""
+        x, y = cell
+        if ring == 0:
+            return list(self._cells.get(cell, ()))
+        rows = []
+        for dx in range(-ring, ring + 1):
+            rows.extend(self._cells.get((x + dx, y - ring), ()))
+            rows.extend(self._cells.get((x + dx, y + ring), ()))
+        for dy in range(-ring + 1, ring):
+            rows.extend(self._cells.get((x - ring, y + dy), ()))
+            rows.extend(self._cells.get((x + ring, y + dy), ()))
+        return rows
+
+    def _beyond(self, cell, ring):
+        """Rows in the cells at a chebyshev distance of ring or more"""
+        x, y = cell
+        rows = []
+        for (cell_x, cell_y), cell_rows in self._cells.items():
+            if max(abs(cell_x - x), abs(cell_y - y)) >= ring:
+                rows.extend(cell_rows)
+        return rows
+
+    def query_radius(self, pos, radius, nodes):
+        """
+        Rows of the nodes within radius of pos (inclusive), in increasing
+        order. nodes is the (n, 2) array of node positions, as in nearest.
+        """
+        x, y = float(pos[0]), float(pos[1])
+        rows = []
+        for cell_x in range(int(np.floor((x - radius) / self.cell_size)),
+                            int(np.floor((x + radius) / self.cell_size)) + 1):
+            for cell_y in range(
+                    int(np.floor((y - radius) / self.cell_size)),
+                    int(np.floor((y + radius) / self.cell_size)) + 1):
+                rows.extend(self._cells.get((cell_x, cell_y), ()))
+        if not rows:
+            return np.empty(0, dtype=int)
+        rows = np.array(sorted(rows))
+        delta = nodes[rows] - (x, y)
+        return rows[np.hypot(delta[:, 0], delta[:, 1]) <= radius]
+
+    def nearest(self, pos, nodes):
+        """
+        Row of the node nearest to pos (the first one inserted on ties),
+        or None if the grid is empty.
+
+        Args:
+            pos: [x, y(, w)] position to search around
+            nodes: (n, 2) array of the node positions, indexed by row
+        """
+        if self._bounds is None:
+            return None
+        cell = self._cell(pos)
+        min_x, min_y, max_x, max_y = self._bounds
+        last_ring = max(cell[0] - min_x, max_x - cell[0],
+                        cell[1] - min_y, max_y - cell[1], 0)
+        best_row, best_dist = None, np.inf
+        for ring in range(last_ring + 1):
+            if 8 * ring > len(self._cells):
+                # sparse tree, cheaper to go through the occupied cells
+                rows = self._beyond(cell, ring)
+                last = True
+            else:
+                rows = self._ring(cell, ring)
+                last = False
+            if rows:
+                rows = np.array(sorted(rows))
+                delta = nodes[rows] - np.asarray(pos, dtype=float)[:2]
+                dists = np.hypot(delta[:, 0], delta[:, 1])
+                i = np.argmin(dists)
+                if dists[i] < best_dist or \
+                        (dists[i] == best_dist and rows[i] < best_row):
+                    best_row, best_dist = int(rows[i]), dists[i]
+            # anything in the next rings is at least this far away
+            if last or best_dist <= ring * self.cell_size:
+                break
+        return best_row
+
+
+class RRT(object):
+    """
+    Tree grown from start towards random samples, each new edge being at
+    most max_steps steps of step_size long. Nodes are rows of the nodes
+    (positions) and parents arrays, the start is row 0 and has parent -1.
+
+    Edges are checked with the is_free function given to each call, at
+    every step_size along them, unless a segment_contact function is given:
+    a function of (m, 2) arrays of starts and ends returning the distance
+    along each segment to its first obstacle (see gamestate.collision),
+    which checks them exactly.
+    """
+    def __init__(self, start, step_size, max_steps=4, capacity=256,
+                 segment_contact=None):
+        self.step_size = step_size
+        self.max_steps = max_steps
+        self.segment_contact = segment_contact
+        self._nodes = np.empty((capacity, 2))
+        self._parents = np.empty(capacity, dtype=int)
+        self._count = 0
+        self._grid = NodeGrid(step_size * max_steps)
+        self.add(start, -1)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nodes(self):
+        """(n, 2) array of the node positions"""
+        return self._nodes[:self._count]
+
+    @property
+    def parents(self):
+        """(n,) array of the row of each node's parent"""
+        return self._parents[:self._count]
+
+    def add(self, pos, parent):
+        """Add a node at pos, returns its row"""
+        row = self._count
+        if row == len(self._nodes):
+            # double the capacity
+            self._nodes = np.concatenate((self._nodes,
+                                          np.empty_like(self._nodes)))
+            self._parents = np.concatenate((self._parents,
+                                            np.empty_like(self._parents)))
+        self._nodes[row] = np.asarray(pos, dtype=float)[:2]
+        self._parents[row] = parent
+        self._count += 1
+        self._grid.insert(row, self._nodes[row])
+        return row
+
+    def nearest(self, pos):
+        """Row of the node nearest to pos"""
+        return self._grid.nearest(pos, self._nodes)
+
+    def steer(self, row, target):
+        """
+        (k, 2) array of the points every step_size from the node towards
+        target, at most max_steps of them and none past target.
+        """
+        start = self._nodes[row]
+        path = np.asarray(target, dtype=float)[:2] - start
+        length = np.linalg.norm(path)
+        steps = min(int(np.floor(length / self.step_size)), self.max_steps)
+        if not steps:
+            return np.empty((0, 2))
+        distances = np.arange(1, steps + 1) * self.step_size
+        return start + np.outer(distances, path / length)
+
+    def extend(self, target, is_free=None):
+        """
+        Grow the tree from the node nearest to target towards it, up to
+        the last free point before the first blocked one.
+
+        Args:
+            target: [x, y(, w)] position to grow towards
+            is_free: function of a (k, 2) array of points returning a
+                boolean mask of which of them the robot can be at
+                (not needed with a segment_contact function)
+
+        Returns:
+            the row of the new node, or None if the first step is blocked
+        """
+        row = self.nearest(target)
+        points = self.steer(row, target)
+        if not len(points):
+            return None
+        free_steps = self._free_steps(row, points, is_free)
+        if not free_steps:
+            return None
+        return self.add(points[free_steps - 1], row)
+
+    def _free_steps(self, row, points, is_free):
+        """How many of the points steered to from the node are reachable"""
+        if self.segment_contact is not None:
+            contact = self.segment_contact(self._nodes[row][np.newaxis],
+                                           points[-1:])[0]
+            distances = np.arange(1, len(points) + 1) * self.step_size
+            return int((distances < contact).sum())
+        blocked = np.flatnonzero(~is_free(points))
+        return blocked[0] if len(blocked) else len(points)
+
+    def segments_free(self, starts, ends, is_free):
+        """
+        Boolean mask of which segments from the rows of starts to the rows
+        of ends ((m, 2) arrays, or a single [x, y] for all of them) are free
+        """
+        if self.segment_contact is not None:
+            starts, ends = np.broadcast_arrays(
+                np.asarray(starts, dtype=float)[..., :2].reshape(-1, 2),
+                np.asarray(ends, dtype=float)[..., :2].reshape(-1, 2))
+            delta = ends - starts
+            return self.segment_contact(starts, ends) > \
+                np.hypot(delta[:, 0], delta[:, 1])
+        return segments_free(starts, ends, is_free, self.step_size)
+
+    def path(self, row):
+        """(k, 2) array of the nodes from the start to the node at row"""
+        rows = []
+        while row != -1:
+            rows.append(row)
+            row = self._parents[row]
+        return self._nodes[rows[::-1]]
+
+
+class RRTStar(RRT):
+    """
+    RRT* tree, where each new node is connected to the neighbour (within
+    rewire_radius) giving it the shortest path from the root, and becomes
+    the parent of the neighbours it gives a shorter path to. The root is
+    the row in root, costs are the path lengths from it.
+
+    To keep a tree between ticks, prune it with the current obstacles, then
+    reroot it at the robot's position, before growing it some more (making
+    room first if it has max_nodes).
+    """
+    def __init__(self, start, step_size, max_steps=4, capacity=256,
+                 segment_contact=None, rewire_radius=None, max_nodes=2000):
+        self._costs = np.empty(capacity)
+        self._children = []  # rows of each node's children
+        if rewire_radius is None:
+            rewire_radius = 2 * step_size * max_steps
+        self.rewire_radius = rewire_radius
+        self.max_nodes = max_nodes
+        super().__init__(start, step_size, max_steps, capacity,
+                         segment_contact)
+        self.root = 0
+
+    @property
+    def costs(self):
+        """(n,) array of the path length from the root to each node"""
+        return self._costs[:self._count]
+
+    def add(self, pos, parent, cost=0.0):
+        """Add a node at pos with a path of cost, returns its row"""
+        row = super().add(pos, parent)
+        if len(self._costs) < len(self._nodes):
+            self._costs = np.concatenate((
+                self._costs, np.empty(len(self._nodes) - len(self._costs))))
+        self._costs[row] = cost
+        self._children.append([])
+        if parent != -1:
+            self._children[parent].append(row)
+        return row
+
+    def extend(self, target, is_free):
+        """
+        Like RRT.extend, but the new node is connected and rewired as in
+        RRT*
+        """
+        row = self.nearest(target)
+        points = self.steer(row, target)
+        if not len(points):
+            return None
+        free_steps = self._free_steps(row, points, is_free)
+        if not free_steps:
+            return None
+        new_pos = points[free_steps - 1]
+        near = self._grid.query_radius(new_pos, self.rewire_radius,
+                                       self._nodes)
+        delta = self._nodes[near] - new_pos
+        dists = np.hypot(delta[:, 0], delta[:, 1])
+        free = self.segments_free(self._nodes[near], new_pos, is_free)
+        # (already checked while steering)
+        free[near == row] = True
+        costs = np.where(free, self._costs[near] + dists, np.inf)
+        best = np.argmin(costs)
+        new_row = self.add(new_pos, near[best], costs[best])
+        self._rewire(new_row, near[free], dists[free])
+        return new_row
+
+    def _rewire(self, row, near, dists):
+        """
+        Make row the parent of the near nodes (with free segments to it, at
+        dists) that it gives a shorter path to
+        """
+        new_costs = self._costs[row] + dists
+        # (the margin keeps rounding from rewiring a node to a descendant)
+        better = new_costs < self._costs[near] - 1e-6
+        for near_row, cost in zip(near[better], new_costs[better]):
+            self._children[self._parents[near_row]].remove(near_row)
+            self._children[row].append(near_row)
+            self._parents[near_row] = row
+            self._shift_costs(near_row, cost - self._costs[near_row])
+
+    def _shift_costs(self, row, delta):
+        """Add delta to the cost of row and of all of its descendants"""
+        stack = [row]
+        while stack:
+            row = stack.pop()
+            self._costs[row] += delta
+            stack.extend(self._children[row])
+
+    def _keep(self, mask):
+        """Drop the nodes outside of the boolean mask, renumbering rows"""
+        rows = np.flatnonzero(mask)
+        new_rows = np.full(self._count, -1, dtype=int)
+        new_rows[rows] = np.arange(len(rows))
+        parents = self._parents[rows]
+        self._nodes[:len(rows)] = self._nodes[rows]
+        self._parents[:len(rows)] = np.where(
+            parents == -1, -1, new_rows[np.maximum(parents, 0)])
+        self._costs[:len(rows)] = self._costs[rows]
+        self._count = len(rows)
+        self.root = int(new_rows[self.root])
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Rebuild the node grid and the children lists from the arrays"""
+        self._grid = NodeGrid(self._grid.cell_size)
+        self._children = [[] for _ in range(self._count)]
+        for row, (pos, parent) in enumerate(zip(self.nodes, self.parents)):
+            self._grid.insert(row, pos)
+            if parent != -1:
+                self._children[parent].append(row)
+
+    def _update_costs(self):
+        """Recompute the costs of every node from the root down"""
+        nodes, parents = self.nodes, self.parents
+        has_parent = parents != -1
+        parent_rows = np.where(has_parent, parents, 0)
+        delta = nodes - nodes[parent_rows]
+        lengths = np.hypot(delta[:, 0], delta[:, 1])
+        known = ~has_parent
+        costs = self.costs
+        costs[known] = 0
+        while True:
+            # the nodes whose parents' costs are known, one level at a time
+            todo = ~known & known[parent_rows]
+            if not todo.any():
+                break
+            costs[todo] = costs[parent_rows[todo]] + lengths[todo]
+            known |= todo
+
+    def prune(self, is_free):
+        """
+        Drop the nodes that are no longer free, or whose path from the root
+        is no longer free. Returns how many nodes were dropped.
+        """
+        nodes, parents = self.nodes, self.parents
+        has_parent = parents != -1
+        # (the root is always kept, it is where the robot was)
+        valid = is_free(nodes)
+        valid[has_parent] &= self.segments_free(
+            nodes[parents[has_parent]], nodes[has_parent], is_free)
+        return self._drop_subtrees(valid)
+
+    def prune_informed(self, goal, best_cost):
+        """
+        Drop the nodes that can't be on a path to goal shorter than
+        best_cost, even in a straight line (outside of the informed RRT*
+        ellipse), to make room when the tree is full. Returns how many
+        nodes were dropped.
+        """
+        goal = np.asarray(goal, dtype=float)[:2]
+        nodes = self.nodes
+        to_root = nodes - self._nodes[self.root]
+        to_goal = nodes - goal
+        bound = np.hypot(to_root[:, 0], to_root[:, 1]) + \
+            np.hypot(to_goal[:, 0], to_goal[:, 1])
+        return self._drop_subtrees(bound <= best_cost)
+
+    def make_room(self, goal, best_cost, room=None):
+        """
+        Drop the nodes that can't be on a shorter path to goal (see
+        prune_informed), then if there still isn't room for room more nodes
+        (max_nodes / 10 by default), the leaves farthest from the goal. A
+        full tree without a path would otherwise never grow again, e.g.
+        when the goal moves away from it. Returns how many nodes were
+        dropped.
+        """
+        if room is None:
+            room = self.max_nodes // 10
+        dropped = self.prune_informed(goal, best_cost)
+        return dropped + self._drop_leaves(
+            goal, self._count + room - self.max_nodes)
+
+    def _drop_leaves(self, pos, count):
+        """
+        Drop up to count of the nodes without children (never the root),
+        farthest from pos first. Returns how many were dropped.
+        """
+        if count <= 0:
+            return 0
+        parents = self.parents
+        is_leaf = np.ones(self._count, dtype=bool)
+        is_leaf[parents[parents != -1]] = False
+        is_leaf[self.root] = False
+        leaves = np.flatnonzero(is_leaf)
+        delta = self.nodes[leaves] - np.asarray(pos, dtype=float)[:2]
+        dists = np.hypot(delta[:, 0], delta[:, 1])
+        dropped = leaves[np.argsort(-dists)[:count]]
+        if not len(dropped):
+            return 0
+        keep = np.ones(self._count, dtype=bool)
+        keep[dropped] = False
+        self._keep(keep)
+        return len(dropped)
+
+    def _drop_subtrees(self, valid):
+        """
+        Drop the nodes outside of the boolean mask along with all of their
+        descendants (never the root), returns how many were dropped
+        """
+        valid = valid.copy()
+        valid[self.root] = True
+        parents = self.parents
+        parent_rows = np.where(parents != -1, parents,
+                               np.arange(self._count))
+        while True:
+            # invalid nodes invalidate their children, one level at a time
+            new_valid = valid & valid[parent_rows]
+            if (new_valid == valid).all():
+                break
+            valid = new_valid
+        dropped = int((~valid).sum())
+        if dropped:
+            self._keep(valid)
+        return dropped
+
+    def reroot(self, pos, is_free):
+        """
+        Make a new node at pos the root, connected to the nearest node it
+        has a free segment to (reversing the edges from that node to the old
+        root). Returns False if no node within rewire_radius can be reached,
+        in which case the tree should be replaced by a new one. Makes room
+        for the new root if the tree has max_nodes.
+        """
+        pos = np.asarray(pos, dtype=float)[:2]
+        if (self._nodes[self.root] != pos).any():
+            self._drop_leaves(pos, self._count + 1 - self.max_nodes)
+        near = self._grid.query_radius(pos, self.rewire_radius, self._nodes)
+        delta = self._nodes[near] - pos
+        dists = np.hypot(delta[:, 0], delta[:, 1])
+        free = self.segments_free(self._nodes[near], pos, is_free)
+        if not free.any():
+            return False
+        near, dists = near[free], dists[free]
+        attach = near[np.argmin(dists)]
+        if attach == self.root and not dists.min():
+            # hasn't moved
+            return True
+        # attach <- ... <- old root becomes attach -> ... -> old root
+        chain = [attach]
+        while self._parents[chain[-1]] != -1:
+            chain.append(self._parents[chain[-1]])
+        for child, parent in zip(chain[1:], chain[:-1]):
+            self._children[child].remove(parent)
+            self._children[parent].append(child)
+            self._parents[child] = parent
+        self.root = self.add(pos, -1)
+        self._parents[attach] = self.root
+        self._children[self.root].append(attach)
+        self._update_costs()
+        self._rewire(self.root, near, dists)
+        return True
+
+    def best_path(self, goal, is_free):
+        """
+        Row of the node within rewire_radius of goal with a free segment to
+        it and the shortest path through it, and the length of that path,
+        or (None, inf) if there is no such node.
+        """
+        goal = np.asarray(goal, dtype=float)[:2]
+        near = self._grid.query_radius(goal, self.rewire_radius, self._nodes)
+        if not len(near):
+            return None, np.inf
+        delta = self._nodes[near] - goal
+        costs = self._costs[near] + np.hypot(delta[:, 0], delta[:, 1])
+        costs[~self.segments_free(self._nodes[near], goal, is_free)] = np.inf
+        best = np.argmin(costs)
+        if np.isinf(costs[best]):
+            return None, np.inf
+        return int(near[best]), float(costs[best])
+
+    def grow(self, samples, is_free, deadline=None):
+        """
+        Extend the tree towards each sample in turn, until there are
+        max_nodes nodes or time.perf_counter() passes the deadline
+        """
+        for target in samples:
+            if self._count >= self.max_nodes or (
+                    deadline is not None and time.perf_counter() > deadline):
+                break
+            self.extend(target, is_free)
+
+
+def informed_samples(start, goal, best_cost, num_samples, bounds,
+                     goal_bias=.05):
+    """
+    Random targets to grow a tree from start towards goal: the goal itself
+    with probability goal_bias, otherwise uniformly within bounds (min_x,
+    max_x, min_y, max_y), or if a path of best_cost is already known, within
+    the ellipse of the points that could be on a shorter path (as in
+    informed RRT*). Samples outside of bounds are dropped.
+    """
+    start = np.asarray(start, dtype=float)[:2]
+    goal = np.asarray(goal, dtype=float)[:2]
+    min_x, max_x, min_y, max_y = bounds
+    samples = np.empty((num_samples, 2))
+    direct_cost = np.linalg.norm(goal - start)
+    if np.isfinite(best_cost) and best_cost > direct_cost:
+        # uniform in the unit disk, stretched into the ellipse with foci
+        # start and goal whose points have a path of best_cost through them
+        radii = np.sqrt(np.random.random(num_samples))
+        angles = np.random.random(num_samples) * 2 * np.pi
+        disk = np.stack((radii * np.cos(angles), radii * np.sin(angles)),
+                        axis=1)
+        axes = np.array([best_cost,
+                         np.sqrt(best_cost ** 2 - direct_cost ** 2)]) / 2
+        direction = (goal - start) / direct_cost if direct_cost else \
+            np.array([1., 0.])
+        rotation = np.array([direction, [-direction[1], direction[0]]])
+        samples[:] = (start + goal) / 2 + (disk * axes).dot(rotation)
+    else:
+        samples[:, 0] = np.random.uniform(min_x, max_x, num_samples)
+        samples[:, 1] = np.random.uniform(min_y, max_y, num_samples)
+    samples[np.random.random(num_samples) < goal_bias] = goal
+    inside = (samples[:, 0] >= min_x) & (samples[:, 0] <= max_x) & \
+        (samples[:, 1] >= min_y) & (samples[:, 1] <= max_y)
+    return samples[inside]
+
+
+def segments_free(starts, ends, is_free, step_size):
+    """
+    Boolean mask of which segments from the rows of starts to the rows of
+    ends ((m, 2) arrays, or a single [x, y] for all of them) are free,
+    checking with is_free every step_size along them and at their ends.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    ends = np.broadcast_to(np.asarray(ends, dtype=float)[..., :2],
+                           starts.shape)
+    if not len(starts):
+        return np.ones(0, dtype=bool)
+    delta = ends - starts
+    lengths = np.hypot(delta[:, 0], delta[:, 1])
+    counts = np.maximum(np.ceil(lengths / step_size), 1)
+    fractions = np.minimum(
+        np.arange(1, int(counts.max()) + 1) / counts[:, np.newaxis], 1)
+    points = starts[:, np.newaxis] + \
+        fractions[..., np.newaxis] * delta[:, np.newaxis]
+    return is_free(points.reshape(-1, 2)).reshape(fractions.shape).all(
+        axis=1)
+
+
+def points_clear(points, centers, radius):
+    """
+    Boolean mask of which rows of an (N, 2) array of points are farther
+    than radius from all of the (n, 2) obstacle centers.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    if not len(centers):
+        return np.ones(len(points), dtype=bool)
+    delta = points[:, np.newaxis] - centers[np.newaxis]
+    return (np.hypot(delta[..., 0], delta[..., 1]) > radius).all(axis=1)
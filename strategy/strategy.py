@@ -1,8 +1,10 @@
+import time
 import numpy as np
 
 
 # pylint: disable=import-error
 from coordinator import Provider
+from tracing import commands_frame_field
 
 # import lower-level strategy logic that we've separated for readability
 try:
@@ -33,10 +35,22 @@ class Strategy(Provider, Utils, Analysis, Actions, Routines, Roles, Plays):
         self._strategy_name = strategy_name
         self._owned_fields = ['_blue_robot_commands'] if team == 'blue' \
             else ['_yellow_robot_commands']
+        # trace which frame the commands were computed from
+        self._owned_fields.append(commands_frame_field(team))
+        # decide once per vision frame
+        self._target_rate = 60
+        # comms reads our commands directly, without waiting on coordinator
+        self._direct_out_fields = list(self._owned_fields)
 
         # state for reducing frequency of expensive calls
         # (this also helps reduce oscillation)
         self._last_pathfind_times = {}  # robot_id : timestamp
+        # RRT* trees kept between ticks
+        self._rrt_star_trees = {}  # robot_id : (goal, map version, RRTStar)
+        # grid paths followed until they are blocked
+        self._grid_paths = {}  # robot_id : (goal cell, turns)
+        # robots that planned a path this tick
+        self._planned_robots = set()
 
     def pre_run(self):
         # print info + initial state for the mode that is running
@@ -69,9 +83,10 @@ class Strategy(Provider, Utils, Analysis, Actions, Routines, Roles, Plays):
             self.logger.info("default strategy for playing a full game")
 
     def run(self):
+        start_time = time.time()
         ref = self.gs.get_latest_refbox_message()
         if ref is not None:
-            self.logger.debug(f"Stage: {ref.stage} Command: {ref.command}")
+            self.logger.debug("Stage: %s Command: %s", ref.stage, ref.command)
         # run the strategy corresponding to the given mode
         if self._strategy_name == "UI":
             self.UI()
@@ -96,6 +111,14 @@ class Strategy(Provider, Utils, Analysis, Actions, Routines, Roles, Plays):
             robot_status = self.gs.get_robot_status(self._team, robot_id)
             if robot_status.charge_level == 0:
                 commands.is_kicking = False
+        self.drop_unused_plans()
+        setattr(self.gs, commands_frame_field(self._team), {
+            'frame_id': self.gs._frame_id,
+            'vision': self.gs._vision_time,
+            'publish': self.gs._frame_publish_time,
+            'strategy_start': start_time,
+            'strategy_end': time.time(),
+        })
 
     # follow the user-input commands through visualizer
     def UI(self):
@@ -206,8 +229,7 @@ class Strategy(Provider, Utils, Analysis, Actions, Routines, Roles, Plays):
                 self.logger.info("Moving to video phase %s", self.video_phase)
         elif self.video_phase == 4:
             # robot 1 moves to best kick pos to shoot
-            goal = self.gs.get_attack_goal(self._team)
-            center_of_goal = (goal[0] + goal[1]) / 2
+            center_of_goal = self.gs.get_attack_goal_center(self._team)
             shot = self.prepare_and_kick(robot_id_1,
                                          center_of_goal,
                                          shoot_velocity)
@@ -232,8 +254,7 @@ class Strategy(Provider, Utils, Analysis, Actions, Routines, Roles, Plays):
                 self.logger.info("Moving to video phase %s", self.video_phase)
         elif self.video_phase == 8:
             # Robot 1 moves to best kick pos to shoot
-            goal = self.gs.get_attack_goal(self._team)
-            center_of_goal = (goal[0] + goal[1]) / 2
+            center_of_goal = self.gs.get_attack_goal_center(self._team)
             shot = self.prepare_and_kick(robot_id_0,
                                          center_of_goal,
                                          shoot_velocity)
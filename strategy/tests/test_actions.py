@@ -1,7 +1,9 @@
+import logging
 import numpy as np
 from ..actions import Actions  # noqa
 from ..strategy import Strategy
 from simulator.simulator import Simulator
+from gamestate import GameState, SimulatedClock
 
 
 team = "blue"
@@ -54,3 +56,26 @@ def test_path_find_surrounded():
     strategy.path_find(1, [0, 0, 0])
     goal_pos = strategy.get_goal_pos(1)
     assert goal_pos is None
+
+
+def test_full_path_find_surrounded_replans_at_intervals():
+    """ Tests full_path_find when the robot is surrounded and cannot find
+    a path. Passes if the robot doesn't replan with RRT from scratch every
+    tick, only once per refresh interval.
+    """
+    clock = SimulatedClock()
+    simulator = Simulator("surrounded_by_opponents_test")
+    simulator.gs = GameState(clock)
+    # (no log file)
+    simulator.logger = logging.getLogger(__name__)
+    simulator.pre_run()
+    strategy = Strategy(team, strategy_name)
+    strategy.gs = simulator.gs
+    strategy.logger = logging.getLogger(__name__)
+    rrt_calls = []
+    strategy.RRT_path_find = lambda *args, **kwargs: rrt_calls.append(args)
+    for _ in range(12):
+        strategy.full_path_find(1, np.array([0, 0, 0]))
+        strategy.drop_unused_plans()
+        clock.advance(1 / 60)
+    assert len(rrt_calls) == 2
@@ -0,0 +1,222 @@
+import logging
+import numpy as np
+from ..analysis import solve_intercepts
+from ..grid_planner import theta_star
+from ..strategy import Strategy
+from gamestate import GameState, SimulatedClock
+from refbox import SSL_Referee
+
+
+def test_solve_intercepts():
+    """Tests intercepts with a ball rolling along the x axis, for a robot
+    that gets there first, one that is too far away and one in between.
+    """
+    times = np.arange(5) * 1.
+    ball_positions = np.array([[0, 0], [1000, 0], [2000, 0], [2500, 0],
+                               [2500, 0]])
+    robot_positions = np.array([[1000, 500], [2500, 9000], [3000, 0]])
+    intercepts = solve_intercepts(times, ball_positions, robot_positions,
+                                  np.array([1000, 1000, 1000]))
+    assert intercepts['possible'].all()
+    assert (intercepts['point'][0] == [1000, 0]).all()
+    assert intercepts['time'][0] == 1
+    assert intercepts['margin'][0] == .5
+    assert (intercepts['last_point'][0] == [2500, 0]).all()
+    # can't reach any point before the ball, so goes to where it stops
+    assert (intercepts['point'][1] == [2500, 0]).all()
+    assert intercepts['time'][1] == 9
+    assert intercepts['margin'][1] < 0
+    assert (intercepts['point'][2] == [2000, 0]).all()
+    assert intercepts['distance'][2] == 1000
+    empty = solve_intercepts(times[:0], ball_positions[:0],
+                             robot_positions, np.array([1000, 1000, 1000]))
+    assert not empty['possible'].any() and np.isinf(empty['distance']).all()
+
+
+def test_intercept_distances_other_team():
+    """Tests intercept distances use the positions of the team asked for"""
+    gs = GameState()
+    gs.update_ball_position(np.array([0, 0]))
+    gs.update_robot_position('blue', 1, np.array([1000, 0, 0]))
+    gs.update_robot_position('yellow', 2, np.array([0, 3000, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    assert np.isclose(strategy.intercept_distances()[1], 1000)
+    assert np.isclose(strategy.intercept_distances(other_team=True)[2], 3000)
+    assert strategy.rank_intercept_distances() == [(1, 1000)]
+
+
+def test_clearance_field_callers_match_exact_scans():
+    """Tests find_legal_pos and rate_attacker_positions give the same
+    answers with the clearance field as with exact scans
+    """
+    gs = GameState()
+    gs.update_ball_position(np.array([0, 0]))
+    gs.update_robot_position('blue', 1, np.array([1000, 0, 0]))
+    gs.update_robot_position('blue', 2, np.array([1100, 200, 0]))
+    gs.update_robot_position('yellow', 1, np.array([1000, 300, 0]))
+    gs.update_robot_position('yellow', 2, np.array([2500, -1000, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    position = strategy.find_legal_pos(1)
+    assert (strategy.find_legal_pos(1, use_clearance_field=True) ==
+            position).all()
+    assert (position != [1000, 0, 0]).any()
+    positions = np.random.RandomState(0).uniform(-2000, 3000, (200, 2))
+    exact = strategy.rate_attacker_positions(positions, 1)
+    ratings = strategy.rate_attacker_positions(positions, 1,
+                                               use_clearance_field=True)
+    assert (np.isinf(exact) == np.isinf(ratings)).all()
+    # (the opponent rating is 5000 at most, and changes by at most 5000 *
+    # sqrt(2 / e) / 800 per mm)
+    tolerance = gs.get_clearance_field().tolerance * 5000 * .86 / 800
+    finite = np.isfinite(exact)
+    assert finite.sum() > 100
+    assert np.allclose(ratings[finite], exact[finite], atol=tolerance)
+
+
+def test_rrt_star_path_find_keeps_tree():
+    """Tests the RRT* tree goes around a robot, and is reused next tick"""
+    np.random.seed(0)
+    gs = GameState(SimulatedClock())
+    gs.update_ball_position(np.array([0, 2000]))
+    gs.update_robot_position('blue', 1, np.array([-2000, 0, 0]))
+    gs.update_robot_position('yellow', 2, np.array([-1500, 0, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    strategy.logger = logging.getLogger(__name__)
+    found = False
+    for _ in range(10):
+        found = found or strategy.RRT_star_path_find(
+            np.array([-2000, 0, 0]), np.array([-1000, 0, 0]), 1)
+    tree = strategy._rrt_star_trees[1][-1]
+    assert found and len(tree) > 1
+    waypoints = np.array(gs.get_robot_commands('blue', 1).waypoints)[:, :2]
+    path = np.vstack(([-2000, 0], waypoints))
+    # every waypoint stays clear of the yellow robot
+    assert (np.hypot(*(path - [-1500, 0]).T) > gs.ROBOT_RADIUS * 2).all()
+    gs.update_robot_position('blue', 1, np.array([-1990, 0, 0]))
+    strategy.RRT_star_path_find(np.array([-1990, 0, 0]),
+                                np.array([-1000, 0, 0]), 1)
+    assert strategy._rrt_star_trees[1][-1] is tree
+    assert (tree.nodes[tree.root] == [-1990, 0]).all()
+    # a new goal, or a tick without path finding, starts a new tree
+    strategy.RRT_star_path_find(np.array([-1990, 0, 0]),
+                                np.array([-1000, 1000, 0]), 1)
+    assert strategy._rrt_star_trees[1][-1] is not tree
+    strategy.drop_unused_plans()
+    assert 1 in strategy._rrt_star_trees
+    strategy.drop_unused_plans()
+    assert not strategy._rrt_star_trees
+
+
+def test_rrt_star_tree_kept_across_grid_ticks():
+    """Tests the RRT* tree survives ticks where the grid planner found the
+    path, and is only started afresh when the rules change
+    """
+    np.random.seed(0)
+    gs = GameState(SimulatedClock())
+    gs.update_ball_position(np.array([0, 2000]))
+    gs.update_robot_position('blue', 1, np.array([-2000, 0, 0]))
+    gs.update_robot_position('yellow', 2, np.array([-1500, 0, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    strategy.logger = logging.getLogger(__name__)
+    start, goal = np.array([-2000, 0, 0]), np.array([-1000, 0, 0])
+    strategy.RRT_star_path_find(start, goal, 1)
+    strategy.drop_unused_plans()
+    tree = strategy._rrt_star_trees[1][-1]
+    for _ in range(3):
+        assert strategy.full_path_find(1, goal) is not None
+        strategy.drop_unused_plans()
+    assert 1 in strategy._grid_paths
+    strategy.RRT_star_path_find(start, goal, 1)
+    assert strategy._rrt_star_trees[1][-1] is tree
+    msg = SSL_Referee()
+    msg.CopyFrom(gs.get_latest_refbox_message())
+    msg.command = SSL_Referee.STOP
+    gs._latest_refbox_message_string = msg.SerializeToString()
+    strategy.RRT_star_path_find(start, goal, 1)
+    assert strategy._rrt_star_trees[1][-1] is not tree
+
+
+def test_grid_path_find_goes_around_robot():
+    """Tests the grid path keeps clear of a robot in the way, and is
+    followed until it's blocked
+    """
+    gs = GameState()
+    gs.update_ball_position(np.array([0, 2000]))
+    gs.update_robot_position('blue', 1, np.array([-2000, 0, 0]))
+    gs.update_robot_position('yellow', 2, np.array([-1500, 0, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    strategy.logger = logging.getLogger(__name__)
+    assert strategy.grid_path_find(np.array([-2000, 0, 0]),
+                                   np.array([-1000, 0, 0]), 1)
+    waypoints = np.array(gs.get_robot_commands('blue', 1).waypoints)[:, :2]
+    path = np.vstack(([-2000, 0], waypoints))
+    assert len(path) > 2 and (path[-1] == [-1000, 0]).all()
+    # none of the legs come within a buffer of the yellow robot
+    contacts = strategy.path_contacts(path[:-1], path[1:], 1, buffer_dist=50)
+    assert np.isinf(contacts).all()
+    gs.update_robot_position('blue', 1, np.array([-1990, 10, 0]))
+    strategy.grid_path_find(np.array([-1990, 10, 0]),
+                            np.array([-1000, 0, 0]), 1)
+    assert np.array_equal(gs.get_robot_commands('blue', 1).waypoints[0][:2],
+                          waypoints[0])
+    # a robot moving onto the path makes it search again
+    gs.update_robot_position('yellow', 3, np.append(waypoints[0], 0))
+    strategy.grid_path_find(np.array([-1990, 10, 0]),
+                            np.array([-1000, 0, 0]), 1)
+    assert not np.array_equal(
+        gs.get_robot_commands('blue', 1).waypoints[0][:2], waypoints[0])
+    strategy.drop_unused_plans()
+    strategy.drop_unused_plans()
+    assert not strategy._grid_paths
+
+
+def test_grid_path_find_full_team_searches_once(monkeypatch):
+    """Tests a full team planning around moving opponents every tick only
+    searches the grid again when a robot's path is blocked
+    """
+    from .. import analysis
+    searches = []
+
+    def counting_theta_star(*args, **kwargs):
+        searches.append(args[2])
+        return theta_star(*args, **kwargs)
+    monkeypatch.setattr(analysis, 'theta_star', counting_theta_star)
+    clock = SimulatedClock()
+    gs = GameState(clock)
+    gs.update_ball_position(np.array([0, 0]))
+    strategy = Strategy('blue', '')
+    strategy.gs = gs
+    strategy.logger = logging.getLogger(__name__)
+    robot_ids = range(6)
+    ys = np.linspace(-2500, 2500, 6)
+    for robot_id, y in zip(robot_ids, ys):
+        gs.update_robot_position('blue', robot_id, np.array([-3000, y, 0]))
+    # a wall of opponents with a gap in the middle
+    for robot_id, y in zip(robot_ids, [-2800, -2100, -1400, 1400, 2100,
+                                       2800]):
+        gs.update_robot_position('yellow', robot_id, np.array([0, y, 0]))
+    for _ in range(60):
+        clock.advance(1 / 60)
+        for robot_id, y in zip(robot_ids, ys):
+            # opponents drift, crossing cells now and then
+            opponent = gs.get_robot_position('yellow', robot_id)
+            gs.update_robot_position('yellow', robot_id,
+                                     opponent + [0, 5 * np.sign(y), 0])
+        for robot_id, y in zip(robot_ids, ys):
+            start = gs.get_robot_position('blue', robot_id)
+            assert strategy.grid_path_find(start, np.array([3000, -y, 0]),
+                                           robot_id)
+            # move 30mm (1.8 m/s) along the path
+            waypoint = gs.get_robot_commands('blue', robot_id).waypoints[0]
+            step = waypoint[:2] - start[:2]
+            step *= min(30 / np.linalg.norm(step), 1)
+            gs.update_robot_position('blue', robot_id,
+                                     start + [step[0], step[1], 0])
+        strategy.drop_unused_plans()
+    # one search per robot, and a few more when an opponent got in the way
+    assert len(searches) < 2 * len(robot_ids)
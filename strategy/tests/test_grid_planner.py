@@ -0,0 +1,58 @@
+# pylint: disable=import-error
+import numpy as np
+from ..grid_planner import line_of_sight, theta_star
+
+
+def wall_grid():
+    """10 x 10 grid with a wall at i = 5 from j = 0 to 7"""
+    blocked = np.zeros((10, 10), dtype=bool)
+    blocked[5, :8] = True
+    return blocked
+
+
+def test_line_of_sight():
+    """Tests lines are blocked by any cell they cross, and by corners"""
+    blocked = wall_grid().ravel()
+    assert line_of_sight(blocked, 10, 0 * 10 + 9, 9 * 10 + 9)
+    assert not line_of_sight(blocked, 10, 0 * 10 + 0, 9 * 10 + 0)
+    assert not line_of_sight(blocked, 10, 0 * 10 + 0, 9 * 10 + 9)
+    # diagonally through the corner between two blocked cells
+    corner = np.zeros((3, 3), dtype=bool)
+    corner[1, 0] = corner[0, 1] = True
+    assert not line_of_sight(corner.ravel(), 3, 0, 4)
+    corner[0, 1] = False
+    assert not line_of_sight(corner.ravel(), 3, 0, 4)
+    corner[1, 0] = False
+    assert line_of_sight(corner.ravel(), 3, 0, 8)
+
+
+def test_theta_star_any_angle():
+    """Tests paths go straight when they can, and around walls otherwise"""
+    blocked = np.zeros((10, 10), dtype=bool)
+    assert theta_star(blocked.ravel(), (10, 10), (0, 0), (9, 3)) == \
+        [(0, 0), (9, 3)]
+    blocked = wall_grid()
+    path = theta_star(blocked.ravel(), (10, 10), (0, 0), (9, 0))
+    assert path[0] == (0, 0) and path[-1] == (9, 0)
+    for a, b in zip(path[:-1], path[1:]):
+        assert line_of_sight(blocked.ravel(), 10, a[0] * 10 + a[1],
+                             b[0] * 10 + b[1])
+    # close to going over the end of the wall and straight back down
+    length = np.hypot(*np.diff(path, axis=0).T).sum()
+    assert length < 2 * np.hypot(5, 8) + 1
+    # same input, same path
+    assert theta_star(blocked.ravel(), (10, 10), (0, 0), (9, 0)) == path
+
+
+def test_theta_star_unreachable():
+    """Tests None is returned when the goal is walled off or blocked, or
+    the search runs out of expansions
+    """
+    blocked = wall_grid()
+    blocked[5, :] = True
+    assert theta_star(blocked.ravel(), (10, 10), (0, 0), (9, 0)) is None
+    assert theta_star(blocked.ravel(), (10, 10), (0, 0), (5, 0)) is None
+    # not enough expansions to get around the wall
+    blocked = wall_grid()
+    assert theta_star(blocked.ravel(), (10, 10), (0, 0), (9, 0),
+                      max_expansions=10) is None
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from logging.handlers import QueueHandler
+from ..strategy import Strategy
+from simulator.simulator import Simulator
+from coordinator import InlineCoordinator, LockstepCoordinator
+
+
+@pytest.fixture(autouse=True)
+def logs_in_tmp_path(tmp_path, monkeypatch):
+    """ Keeps the providers' log files out of the repo's logs/ """
+    (tmp_path / 'logs').mkdir()
+    monkeypatch.chdir(tmp_path)
+
+
+def play_lockstep(seed):
+    coordinator = LockstepCoordinator(
+        [Simulator("full_teams"), Strategy("blue", "random_robot")],
+        dt=.1, seed=seed, duration=1)
+    coordinator.start_game()
+    assert coordinator.steps == 10
+    return coordinator.gamestate
+
+
+def test_lockstep_is_deterministic():
+    """ Tests that lockstep games with the same seed play out the same,
+    in simulated time.
+    """
+    gs = play_lockstep(0)
+    same_gs = play_lockstep(0)
+    other_gs = play_lockstep(1)
+    assert abs(gs.current_time() - 1) < 1e-9
+    assert gs.get_robot_last_update_time("blue", 1) == gs.current_time() - .1
+    positions = [pos for _, pos in gs.get_all_robot_positions()]
+    same_positions = [pos for _, pos in same_gs.get_all_robot_positions()]
+    other_positions = [pos for _, pos in other_gs.get_all_robot_positions()]
+    assert np.array_equal(positions, same_positions)
+    assert not np.array_equal(positions, other_positions)
+
+
+class StepLimitedCoordinator(InlineCoordinator):
+    def is_done(self):
+        return self.steps >= 3
+
+
+def test_inline_shares_gamestate():
+    """ Tests that inline providers run in turn on one shared gamestate.
+    """
+    simulator = Simulator("clear_field_test")
+    strategy = Strategy("blue", "UI")
+    coordinator = StepLimitedCoordinator([simulator, strategy])
+    coordinator.start_game()
+    assert simulator.gs is strategy.gs is coordinator.gamestate
+    assert coordinator.gamestate.get_robot_ids("blue") == (1,)
+    assert strategy.last_run_time is not None
+    # queue logging is torn down, so running again doesn't log twice
+    assert not any(isinstance(handler, QueueHandler)
+                   for handler in strategy.logger.handlers)
@@ -0,0 +1,149 @@
+# pylint: disable=import-error
+import numpy as np
+from ..rrt import NodeGrid, RRT, RRTStar, informed_samples, \
+    points_clear, segments_free
+
+
+def test_nearest_matches_brute_force():
+    """Tests grid nearest node queries against a scan of every node"""
+    random = np.random.RandomState(0)
+    nodes = random.uniform(-4500, 4500, (300, 2))
+    grid = NodeGrid(360)
+    assert grid.nearest([0, 0], nodes) is None
+    for row, pos in enumerate(nodes):
+        grid.insert(row, pos)
+    for pos in random.uniform(-6000, 6000, (200, 2)):
+        expected = np.argmin(np.hypot(*(nodes - pos).T))
+        assert grid.nearest(pos, nodes) == expected
+
+
+def test_extend_stops_before_obstacle():
+    """Tests edges are cut at the last free step, and paths lead back"""
+    tree = RRT([0, 0], 90, capacity=1)
+    obstacles = np.array([[300, 0]])
+
+    def is_free(points):
+        return points_clear(points, obstacles, 100)
+    row = tree.extend([1000, 0, 0], is_free)
+    assert (tree.nodes[row] == [180, 0]).all()
+    # the first step is blocked
+    assert tree.extend([1000, 0], is_free) is None
+    # too close for a single step
+    assert tree.extend([0, 50], is_free) is None
+    up = tree.extend([180, 1000], is_free)
+    assert (tree.nodes[up] == [180, 360]).all() and len(tree) == 3
+    assert (tree.path(up) == [[0, 0], [180, 0], [180, 360]]).all()
+    assert (tree.parents == [-1, 0, 1]).all()
+
+
+def test_points_clear():
+    """Tests points exactly at the clearance radius count as blocked"""
+    points = np.array([[0, 0], [100, 0], [101, 0]])
+    clear = points_clear(points, [[0, 0]], 100)
+    assert (clear == [False, False, True]).all()
+    assert points_clear(points, np.empty((0, 2)), 100).all()
+
+
+def free_everywhere(points):
+    return np.ones(len(points), dtype=bool)
+
+
+def test_rrt_star_rewires_to_shorter_paths():
+    """Tests nodes connect through whichever neighbour is closest to root"""
+    tree = RRTStar([0, 0], 100, max_steps=1, rewire_radius=300)
+    a = tree.extend([100, 0], free_everywhere)
+    b = tree.extend([100, 100], free_everywhere)
+    # b connects straight to the root rather than through a
+    assert tree.parents[b] == 0
+    assert np.isclose(tree.costs[b], np.hypot(100, 100))
+    tree.grow(np.random.RandomState(0).uniform(-500, 500, (200, 2)),
+              free_everywhere)
+    delta = tree.nodes - tree.nodes[tree.root]
+    straight = np.hypot(delta[:, 0], delta[:, 1])
+    # every cost is a real path length, and close to the straight line
+    for row in range(len(tree)):
+        path = tree.path(row)
+        length = np.hypot(*np.diff(path, axis=0).T).sum()
+        assert np.isclose(tree.costs[row], length)
+    assert (tree.costs <= straight * 1.2 + 1e-9).all() and a == 1
+
+
+def test_rrt_star_prune_and_reroot():
+    """Tests blocked branches are dropped and the root follows the robot"""
+    tree = RRTStar([0, 0], 100, max_steps=1, rewire_radius=150)
+    for x in range(100, 600, 100):
+        tree.extend([x, 0], free_everywhere)
+    tree.extend([0, 100], free_everywhere)
+    assert len(tree) == 7
+
+    def is_free(points):
+        return points_clear(points, [[300, 0]], 50)
+    # [300, 0] and everything past it goes
+    assert tree.prune(is_free) == 3 and len(tree) == 4
+    assert tree.reroot([100, 50], is_free)
+    assert (tree.nodes[tree.root] == [100, 50]).all()
+    # the old root now hangs off the node the new one attached to
+    for row in range(len(tree)):
+        assert (tree.path(row)[0] == [100, 50]).all()
+    row, cost = tree.best_path([200, 0], is_free)
+    assert (tree.nodes[row] == [200, 0]).all() and np.isclose(
+        cost, np.hypot(100, 50))
+    assert not tree.reroot([2000, 0], is_free)
+
+
+def test_rrt_star_full_tree_finds_new_goal():
+    """Tests a full tree without a path makes room when the goal opens"""
+    np.random.seed(0)
+    tree = RRTStar([0, 0], 100, max_nodes=200)
+    goal = [2000, 0]
+    bounds = (-2500, 2500, -1000, 1000)
+
+    def walled(points):
+        return points[:, 0] < 1000
+
+    def tick(is_free):
+        tree.prune(is_free)
+        _, best_cost = tree.best_path(goal, is_free)
+        if len(tree) >= tree.max_nodes:
+            tree.make_room(goal, best_cost)
+        tree.grow(informed_samples([0, 0], goal, best_cost, 100, bounds),
+                  is_free)
+        return tree.best_path(goal, is_free)[0]
+    while len(tree) < tree.max_nodes:
+        assert tick(walled) is None
+    # the nearest nodes are too far from the goal to connect to it
+    assert tick(walled) is None and len(tree) == tree.max_nodes
+    assert any(tick(free_everywhere) is not None for _ in range(10))
+    assert len(tree) <= tree.max_nodes
+    # rerooting a full tree keeps it at max_nodes
+    while len(tree) < tree.max_nodes:
+        tick(free_everywhere)
+    assert tree.reroot([10, 10], free_everywhere)
+    assert len(tree) == tree.max_nodes
+    assert (tree.nodes[tree.root] == [10, 10]).all()
+
+
+def test_informed_samples_stay_in_ellipse():
+    """Tests samples only fall where a shorter path could go through"""
+    np.random.seed(0)
+    bounds = (-4500, 4500, -3000, 3000)
+    samples = informed_samples([-1000, 0], [1000, 0], 2500, 500, bounds,
+                               goal_bias=0)
+    lengths = np.hypot(*(samples - [-1000, 0]).T) + \
+        np.hypot(*(samples - [1000, 0]).T)
+    assert len(samples) == 500 and (lengths <= 2500 + 1e-6).all()
+    # (the goal is off the field, so those samples are dropped)
+    uniform = informed_samples([0, 0], [9000, 0], np.inf, 500, bounds)
+    assert (uniform[:, 0] <= 4500).all() and 400 < len(uniform) < 500
+
+
+def test_segments_free():
+    """Tests segments are blocked by an obstacle between the samples"""
+    starts = np.array([[0, 0], [0, 100], [0, 0]])
+    ends = np.array([[1000, 0], [1000, 100], [0, 0]])
+
+    def is_free(points):
+        return points_clear(points, [[500, 0]], 60)
+    assert (segments_free(starts, ends, is_free, 100) ==
+            [False, True, True]).all()
+    assert len(segments_free(starts[:0], [0, 0], is_free, 100)) == 0
@@ -0,0 +1,3 @@
+# pylint: disable=import-error
+from .latency import LatencyStats, commands_frame_field  # noqa
+from .chrome_trace import ChromeTracer, NullTracer, merge_traces  # noqa
@@ -0,0 +1,134 @@
+"""
+Timeline tracing in the Chrome "Trace Event Format" (JSON), which can be
+opened in chrome://tracing or https://ui.perfetto.dev
+
+Every process appends its events to its own part file, one JSON event per
+line, so nothing is shared between processes and a process that gets
+killed only loses its last few events. The coordinator merges the part
+files into a single trace once the game stops.
+"""
+import json
+import os
+import time
+
+
+def _now_us():
+    # wall clock, so that timestamps line up across processes
+    return time.time() * 1e6
+
+
+class ChromeTracer(object):
+    """
+    Records spans and instant events of one process to a part file.
+    The file is opened on first use, so the tracer can be created before
+    the process it traces is started.
+    """
+    def __init__(self, path, process_name):
+        self.path = path
+        self._process_name = process_name
+        self._file = None
+        self._pid = None
+
+    def __getstate__(self):
+        # never send an open file to another process
+        state = self.__dict__.copy()
+        state['_file'] = None
+        return state
+
+    def _write(self, event):
+        if self._file is None:
+            self._pid = os.getpid()
+            self._file = open(self.path, 'w')
+            self._write({'name': 'process_name', 'ph': 'M',
+                         'args': {'name': self._process_name}})
+        event['pid'] = self._pid
+        event['tid'] = 0
+        self._file.write(json.dumps(event) + '\n')
+
+    def span(self, name, **args):
+        """
+        Returns a context manager recording the time spent inside it.
+
+        Usage:
+
+        with tracer.span('run'):
+            # Do stuff here
+        """
+        return _Span(self, name, args)
+
+    def complete(self, name, start, end, args=None):
+        """Records a span from start to end (time.time() timestamps)"""
+        self._write({'name': name, 'ph': 'X', 'ts': start * 1e6,
+                     'dur': (end - start) * 1e6, 'args': args or {}})
+
+    def instant(self, name, **args):
+        """Records something that happened at this moment, e.g. a drop"""
+        self._write({'name': name, 'ph': 'i', 's': 'p', 'ts': _now_us(),
+                     'args': args})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class NullTracer(object):
+    """Same interface as ChromeTracer, for when tracing is turned off"""
+    def span(self, name, **args):
+        return _NULL_SPAN
+
+    def complete(self, name, start, end, args=None):
+        pass
+
+    def instant(self, name, **args):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Span(object):
+    def __init__(self, tracer, name, args):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.time()
+
+    def __exit__(self, type, value, traceback):
+        self._tracer.complete(self._name, self._start, time.time(),
+                              self._args)
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def merge_traces(part_paths, path):
+    """
+    Merges the part files written by ChromeTracers into a single trace file
+    at path, and removes the parts. Missing parts (e.g. from a provider
+    that crashed before tracing anything) and cut off lines are skipped.
+    """
+    events = []
+    for part_path in part_paths:
+        if not os.path.exists(part_path):
+            continue
+        with open(part_path) as part:
+            for line in part:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass
+        os.remove(part_path)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
@@ -0,0 +1,76 @@
+"""
+Latency tracing through the provider pipeline.
+
+Every time the coordinator publishes new positions it stamps them with an
+increasing frame id. Strategy records which frame its commands were
+computed from, together with the time each stage handled it, in a frame
+trace dict:
+
+    {'frame_id': int,
+     'vision': time the vision data was received,
+     'publish': time the coordinator published the frame,
+     'strategy_start': time strategy started computing the commands,
+     'strategy_end': time strategy finished,
+     'radio': time comms sent the commands to the robots}
+
+Comms adds the radio time and keeps LatencyStats on them.
+All times are time.time() timestamps, comparable across processes.
+"""
+import numpy as np
+from collections import deque
+
+# stages of the pipeline, in the order the data goes through them
+STAGES = ('vision', 'publish', 'strategy_start', 'strategy_end', 'radio')
+
+
+def commands_frame_field(team):
+    """Name of the GameState field tracing the frame of the team commands"""
+    assert(team in ['blue', 'yellow'])
+    return f'_{team}_commands_frame'
+
+
+class LatencyStats(object):
+    """
+    Keeps the latency of the most recent frame traces, end to end and
+    between every pair of consecutive stages.
+    """
+    def __init__(self, max_samples=1000):
+        # (from stage, to stage): deque of latencies in seconds
+        self._samples = {
+            (start, end): deque([], max_samples)
+            for start, end in zip(STAGES[:-1], STAGES[1:])
+        }
+        self._samples[(STAGES[0], STAGES[-1])] = deque([], max_samples)
+
+    def add(self, frame_trace):
+        """Records the latencies of a frame trace, skipping missing stages"""
+        for (start, end), samples in self._samples.items():
+            if frame_trace.get(start) is not None and \
+                    frame_trace.get(end) is not None:
+                samples.append(frame_trace[end] - frame_trace[start])
+
+    def __len__(self):
+        return len(self._samples[(STAGES[0], STAGES[-1])])
+
+    def percentiles(self, start=STAGES[0], end=STAGES[-1],
+                    q=(50, 90, 99)):
+        """
+        Returns the given percentiles of the latency from start to end
+        (in seconds), or None if there are no samples yet.
+        """
+        samples = self._samples[(start, end)]
+        if not samples:
+            return None
+        return np.percentile(samples, q)
+
+    def report(self):
+        """Returns a readable summary of the latency percentiles in ms"""
+        lines = []
+        for start, end in self._samples:
+            percentiles = self.percentiles(start, end)
+            if percentiles is None:
+                continue
+            p50, p90, p99 = percentiles * 1000
+            lines.append(f"{start} -> {end}: p50 {p50:.1f}ms, "
+                         f"p90 {p90:.1f}ms, p99 {p99:.1f}ms")
+        return "\n".join(lines)
@@ -0,0 +1,25 @@
+# pylint: disable=import-error
+import json
+from ..chrome_trace import ChromeTracer, merge_traces
+
+
+def test_merge_traces(tmp_path):
+    """Tests that spans and instants from every part end up in the trace"""
+    tracers = [ChromeTracer(str(tmp_path / f'{name}.part'), name)
+               for name in ('Coordinator', 'Strategy')]
+    with tracers[0].span('publish_new_gamestate'):
+        pass
+    tracers[1].instant('commands_out_q full', fields=['viz_inputs'])
+    for tracer in tracers:
+        tracer.close()
+    part_paths = [tracer.path for tracer in tracers]
+    path = tmp_path / 'trace.json'
+    # metadata event naming each process + one event each
+    assert merge_traces(part_paths + ['missing.part'], str(path)) == 4
+    events = json.loads(path.read_text())['traceEvents']
+    names = [event['name'] for event in events]
+    assert names == ['process_name', 'publish_new_gamestate',
+                     'process_name', 'commands_out_q full']
+    assert events[1]['ph'] == 'X' and events[1]['dur'] >= 0
+    assert events[3]['args'] == {'fields': ['viz_inputs']}
+    assert not (tmp_path / 'Strategy.part').exists()
@@ -0,0 +1,21 @@
+# pylint: disable=import-error
+from ..latency import LatencyStats
+
+
+def test_latency_percentiles():
+    """Tests latencies are measured end to end and between stages"""
+    stats = LatencyStats()
+    for i in range(100):
+        stats.add({'frame_id': i, 'vision': 0, 'publish': .01,
+                   'strategy_start': .02, 'strategy_end': .03 + i / 1000,
+                   'radio': .04 + i / 1000})
+    # frames that are missing stages are only counted where they can be
+    stats.add({'frame_id': 100, 'vision': None, 'publish': .01,
+               'strategy_start': .02})
+    assert len(stats) == 100
+    p50, p99 = stats.percentiles(q=(50, 99))
+    assert abs(p50 - .0895) < 1e-9 and abs(p99 - .13801) < 1e-9
+    assert (stats.percentiles('publish', 'strategy_start') == .01).all()
+    assert stats.percentiles('vision', 'publish') is not None
+    assert "vision -> radio: p50 89.5ms" in stats.report()
+    assert LatencyStats().report() == ""
@@ -0,0 +1,33 @@
+import logging
+import threading
+from coordinator import start_queue_logging, stop_queue_logging, \
+    LOG_RATE_LIMIT
+
+
+class ThreadRecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def emit(self, record):
+        self.threads.append(threading.current_thread())
+
+
+def test_root_handlers_written_from_listener():
+    """Tests records reach the root logger's handlers (as set up by
+    logging.basicConfig in main.py) only through the rate limited queue,
+    and never from the thread that logs
+    """
+    root_handler = ThreadRecordingHandler()
+    logging.getLogger().addHandler(root_handler)
+    logger = logging.getLogger('test_queue_logging')
+    logger.setLevel(1)
+    try:
+        listener = start_queue_logging(logger, [])
+        for _ in range(3 * LOG_RATE_LIMIT):
+            logger.debug("hot loop")
+        stop_queue_logging(logger, listener)
+    finally:
+        logging.getLogger().removeHandler(root_handler)
+    assert len(root_handler.threads) == LOG_RATE_LIMIT
+    assert threading.current_thread() not in root_handler.threads
@@ -2,6 +2,7 @@
 '''A class to provide robot position data from the cameras'''
 import sslclient
 import threading
+import time
 import numpy as np
 from collections import Counter
 from typing import Tuple
@@ -28,8 +29,13 @@ class SSLVisionDataProvider(Provider):
         self._owned_fields = [
             '_ball_position',
             '_blue_robot_positions',
-            '_yellow_robot_positions'
+            '_yellow_robot_positions',
+            '_vision_time',
         ]
+        # time the latest camera data was received
+        self._last_receive_time = None
+        # ssl-vision cameras send at around 60 fps
+        self._target_rate = 60
 
     def pre_run(self):
         """Starts listen to SSL-vision and updating gamestate with new data"""
@@ -57,6 +63,7 @@ class SSLVisionDataProvider(Provider):
             if data.HasField('detection'):
                 cid = data.detection.camera_id
                 self._raw_camera_data[cid] = data.detection
+                self._last_receive_time = time.time()
 
     def run(self):
         # update positions of all robots seen by data feed
@@ -69,6 +76,7 @@ class SSLVisionDataProvider(Provider):
         ball_data = self._get_ball_position()
         if ball_data is not None:
             self.gs.update_ball_position(ball_data)
+        self.gs._vision_time = self._last_receive_time
 
     def get_robot_positions(self, team='blue'):
         robot_positions = {}
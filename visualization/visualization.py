@@ -1,5 +1,4 @@
 import math
-import time
 import numpy as np
 from coordinator import Provider
 import pygame
@@ -54,9 +53,13 @@ class Visualizer(Provider):
         self.user_click_up = None
 
         self._owned_fields = ['viz_inputs']
+        # frames per second to draw
+        self._target_rate = 20
 
     def initialize(self):
-        self.gs = self.data_in_q.get()
+        # don't wait on the coordinator, it may not be publishing yet (or
+        # at all if running inline)
+        self._update_gamestate(block=False)
 
         # derive screen dimentions from field dimensions
         self._TOTAL_SCREEN_WIDTH = \
@@ -209,7 +212,6 @@ class Visualizer(Provider):
         self._viewer.fill(FIELD_COLOR)
         self.render()
         pygame.display.flip()
-        time.sleep(0.05)
 
     def select_ball(self):
         self.gs.viz_inputs['user_selected_ball'] = True